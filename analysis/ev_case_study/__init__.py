@@ -1,7 +1,8 @@
 """
 This package includes all necessary modules to perform the ev case study.
 """
-from .calc_ev_flex_offers import calc_ev_flex_offers, calc_ev_flex_offers_parallel
+from .calc_ev_flex_offers import calc_ev_flex_offers, calc_ev_flex_offers_parallel, calc_ev_flex_offers_sweep, \
+    SweepManifest
 from .aggregate_ev_opt_flex import aggregate_ev_flex
 from .plot_timeseries_results import plot_opt_flex_timeseries, plot_n_avail_veh
 from .plot_flex_heatmap import plot_flex_heatmap
@@ -16,17 +16,31 @@ from tqdm import tqdm
 import pandas as pd
 import os
 import numpy as np
+from joblib import Parallel, delayed
 import opentumflex
 import forecast
 
+# Folders of the pricing strategies and the suffixes of their aggregated columns
+PRICING_SUFFIXES = {'ToU': 'tou', 'ToU_mi': 'tou_mi', 'Constant': 'con', 'Con_mi': 'con_mi', 'RTP': 'rtp'}
+# Aggregated columns and the result columns they sum up
+OPT_SUM_COLUMNS = {'P_ev_opt_sum_{}': 'optplan/EV_power'}
+FLEX_SUM_COLUMNS = {'P_pos_sum_{}': 'flexopts/ev/Pos_P',
+                    'P_neg_sum_{}': 'flexopts/ev/Neg_P',
+                    'E_pos_sum_{}': 'flexopts/ev/Pos_E',
+                    'E_neg_sum_{}': 'flexopts/ev/Neg_E'}
 
-def aggregate_ev_flex(veh_availabilities, output_path='../output/', rtp_input_data_path='../input/RTP/'):
+
+def aggregate_ev_flex(veh_availabilities, output_path='../output/', rtp_input_data_path='../input/RTP/', n_jobs=1,
+                      result_store=None):
     """
     This function aggregates the flexibility offers to data frame for weekdays and weekends in 15 minute resolution
 
     :param veh_availabilities: vehicle availabilities
     :param output_path: path where aggregated results shall be stored
     :param rtp_input_data_path: real time prices input file in h5 file format
+    :param n_jobs: number of processes summing shards of the result files, their partial sums are added up
+    :param result_store: folder of the result store with the results, otherwise the json files of the results in the
+                         output path are aggregated
     :return: None
     """
     # Extract min and max time
@@ -39,20 +53,19 @@ def aggregate_ev_flex(veh_availabilities, output_path='../output/', rtp_input_da
     # Preparation ###################################################
     #################################################################
     """
-    # List all power levels
-    power_levels = os.listdir(output_path)
+    if result_store is None:
+        # List all power levels, other files like the manifest of the sweep are skipped
+        power_levels = [power for power in os.listdir(output_path) if os.path.isdir(output_path + power)]
+    else:
+        # List all power levels of the keys 'power/pricing/ev_avail_i' of the results
+        result_store = opentumflex.ResultStore(result_store)
+        power_levels = sorted({key.split('/')[0] for key in result_store.keys()})
     days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
 
     # Go through all power levels
     for power in tqdm(power_levels):
         # Create folder for aggregated data
         Path(output_path + str(power) + '/Aggregated Data').mkdir(parents=True, exist_ok=True)
-        # List all pricing strategies
-        pricing_strategies = os.listdir(output_path + power)
-        if 'Aggregated Data' in pricing_strategies:
-            pricing_strategies.remove('Aggregated Data')
-        # List all ev flex offer files
-        file_names = os.listdir(output_path + power + '/' + pricing_strategies[0])
         # Create df for sum of optimal charging plans
         opt_sum_df = pd.DataFrame(0, index=t_range, columns={'P_ev_opt_sum_tou',
                                                              'P_ev_opt_sum_con',
@@ -116,112 +129,46 @@ def aggregate_ev_flex(veh_availabilities, output_path='../output/', rtp_input_da
         # Create a daytime identifier for weekday and time for heat map
         opt_sum_df['Daytime_ID'] = opt_sum_df.index.day_name().array + ', ' + opt_sum_df.index.strftime('%H:%M').array
         flex_sum_df['Daytime_ID'] = opt_sum_df.index.day_name().array + ', ' + opt_sum_df.index.strftime('%H:%M').array
-        # Go through all files
-        for result_name in file_names:
-            my_ems_tou_mi = opentumflex.init_ems_js(path=output_path + str(power) + '/ToU_mi/' + result_name)
-            my_ems_tou = opentumflex.init_ems_js(path=output_path + str(power) + '/ToU/' + result_name)
-            my_ems_con_mi = opentumflex.init_ems_js(path=output_path + str(power) + '/Con_mi/' + result_name)
-            my_ems_con = opentumflex.init_ems_js(path=output_path + str(power) + '/Constant/' + result_name)
-            my_ems_rtp = opentumflex.init_ems_js(path=output_path + str(power) + '/RTP/' + result_name)
-
-            opt_result_df = pd.DataFrame({'P_ev_opt_tou_mi': my_ems_tou_mi['optplan']['EV_power'],
-                                          'P_ev_opt_tou': my_ems_tou['optplan']['EV_power'],
-                                          'P_ev_opt_con_mi': my_ems_con_mi['optplan']['EV_power'],
-                                          'P_ev_opt_con': my_ems_con['optplan']['EV_power'],
-                                          'P_ev_opt_rtp': my_ems_rtp['optplan']['EV_power']},
-                                         index=pd.date_range(start=my_ems_tou_mi['time_data']['time_slots'][0],
-                                                             end=my_ems_tou_mi['time_data']['time_slots'][-1],
-                                                             freq='15Min'))
-            flex_result_df = pd.DataFrame({'P_pos_tou': my_ems_tou['flexopts']['ev']['Pos_P'],
-                                           'P_pos_tou_mi': my_ems_tou_mi['flexopts']['ev']['Pos_P'],
-                                           'P_pos_con': my_ems_con['flexopts']['ev']['Pos_P'],
-                                           'P_pos_con_mi': my_ems_con_mi['flexopts']['ev']['Pos_P'],
-                                           'P_pos_rtp': my_ems_rtp['flexopts']['ev']['Pos_P'],
-                                           'P_neg_tou': my_ems_tou['flexopts']['ev']['Neg_P'],
-                                           'P_neg_tou_mi': my_ems_tou_mi['flexopts']['ev']['Neg_P'],
-                                           'P_neg_con': my_ems_con['flexopts']['ev']['Neg_P'],
-                                           'P_neg_con_mi': my_ems_con_mi['flexopts']['ev']['Neg_P'],
-                                           'P_neg_rtp': my_ems_rtp['flexopts']['ev']['Neg_P'],
-                                           'E_pos_tou': my_ems_tou['flexopts']['ev']['Pos_E'],
-                                           'E_pos_tou_mi': my_ems_tou_mi['flexopts']['ev']['Pos_E'],
-                                           'E_pos_con': my_ems_con['flexopts']['ev']['Pos_E'],
-                                           'E_pos_con_mi': my_ems_con_mi['flexopts']['ev']['Pos_E'],
-                                           'E_pos_rtp': my_ems_rtp['flexopts']['ev']['Pos_E'],
-                                           'E_neg_tou': my_ems_tou['flexopts']['ev']['Neg_E'],
-                                           'E_neg_tou_mi': my_ems_tou_mi['flexopts']['ev']['Neg_E'],
-                                           'E_neg_con': my_ems_con['flexopts']['ev']['Neg_E'],
-                                           'E_neg_con_mi': my_ems_con_mi['flexopts']['ev']['Neg_E'],
-                                           'E_neg_rtp': my_ems_rtp['flexopts']['ev']['Neg_E']
-                                           },
-                                          index=pd.date_range(start=my_ems_tou_mi['time_data']['time_slots'][0],
-                                                              end=my_ems_tou_mi['time_data']['time_slots'][-1],
-                                                              freq='15Min'))
-            # Optimal charging power addition
-            opt_sum_df.loc[opt_result_df.index[0]:opt_result_df.index[-1], 'P_ev_opt_sum_tou_mi'] \
-                += opt_result_df['P_ev_opt_tou_mi']
-            opt_sum_df.loc[opt_result_df.index[0]:opt_result_df.index[-1], 'P_ev_opt_sum_tou'] \
-                += opt_result_df['P_ev_opt_tou']
-            opt_sum_df.loc[opt_result_df.index[0]:opt_result_df.index[-1], 'P_ev_opt_sum_con_mi'] \
-                += opt_result_df['P_ev_opt_con_mi']
-            opt_sum_df.loc[opt_result_df.index[0]:opt_result_df.index[-1], 'P_ev_opt_sum_con'] \
-                += opt_result_df['P_ev_opt_con']
-            opt_sum_df.loc[opt_result_df.index[0]:opt_result_df.index[-1], 'P_ev_opt_sum_rtp'] \
-                += opt_result_df['P_ev_opt_rtp']
-            opt_sum_df.loc[opt_result_df.index[0]:opt_result_df.index[-1], 'n_veh_avail'] += 1
-            # Flexible power addition
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_pos_sum_tou'] \
-                += flex_result_df['P_pos_tou']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_pos_sum_tou_mi'] \
-                += flex_result_df['P_pos_tou_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_pos_sum_con'] \
-                += flex_result_df['P_pos_con']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_pos_sum_con_mi'] \
-                += flex_result_df['P_pos_con_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_pos_sum_rtp'] \
-                += flex_result_df['P_pos_rtp']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_neg_sum_tou'] \
-                += flex_result_df['P_neg_tou']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_neg_sum_tou_mi'] \
-                += flex_result_df['P_neg_tou_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_neg_sum_con'] \
-                += flex_result_df['P_neg_con']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_neg_sum_con_mi'] \
-                += flex_result_df['P_neg_con_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'P_neg_sum_rtp'] \
-                += flex_result_df['P_neg_rtp']
-            # Flexible energy addition
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_pos_sum_tou'] \
-                += flex_result_df['E_pos_tou']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_pos_sum_tou_mi'] \
-                += flex_result_df['E_pos_tou_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_pos_sum_con'] \
-                += flex_result_df['E_pos_con']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_pos_sum_con_mi'] \
-                += flex_result_df['E_pos_con_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_pos_sum_rtp'] \
-                += flex_result_df['E_pos_rtp']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_neg_sum_tou'] \
-                += flex_result_df['E_neg_tou']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_neg_sum_tou_mi'] \
-                += flex_result_df['E_neg_tou_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_neg_sum_con'] \
-                += flex_result_df['E_neg_con']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_neg_sum_con_mi'] \
-                += flex_result_df['E_neg_con_mi']
-            flex_sum_df.loc[flex_result_df.index[0]:flex_result_df.index[-1], 'E_neg_sum_rtp'] \
-                += flex_result_df['E_neg_rtp']
+        # Sum the optimal charging plans and flexibility offers of all results
+        if result_store is None:
+            # List all pricing strategies
+            pricing_strategies = os.listdir(output_path + power)
+            if 'Aggregated Data' in pricing_strategies:
+                pricing_strategies.remove('Aggregated Data')
+            # List all ev flex offer files
+            file_names = os.listdir(output_path + power + '/' + pricing_strategies[0])
+            if n_jobs == 1:
+                sums = _sum_ev_results(output_path + str(power) + '/', file_names, t_range)
+            else:
+                # Map: sum shards of the files in parallel, reduce: add the partial sums
+                partial_sums = Parallel(n_jobs=n_jobs)(
+                    delayed(_sum_ev_results)(output_path + str(power) + '/', file_names[i::n_jobs], t_range)
+                    for i in range(n_jobs))
+                sums = {col: sum(partial[col] for partial in partial_sums) for col in partial_sums[0]}
+        else:
+            # Map: sum the shards of the result store in parallel, reduce: add the partial sums and count every
+            # vehicle availability once
+            shards = result_store.shards()
+            partial_sums = Parallel(n_jobs=n_jobs)(
+                delayed(_sum_ev_store_results)(result_store.path, power, shards[i::n_jobs], t_range)
+                for i in range(n_jobs))
+            sums = {col: sum(partial[col] for partial, _ in partial_sums) for col in partial_sums[0][0]}
+            sums['n_veh_avail'] = np.zeros(len(t_range), dtype=int)
+            for start, end in dict(item for _, vehicles in partial_sums for item in vehicles.items()).values():
+                sums['n_veh_avail'][start:end] += 1
+        for col in OPT_SUM_COLUMNS:
+            for suffix in PRICING_SUFFIXES.values():
+                opt_sum_df[col.format(suffix)] = sums[col.format(suffix)]
+        for col in FLEX_SUM_COLUMNS:
+            for suffix in PRICING_SUFFIXES.values():
+                flex_sum_df[col.format(suffix)] = sums[col.format(suffix)]
+        opt_sum_df['n_veh_avail'] = sums['n_veh_avail']
 
         # Calculate energy costs
-        opt_sum_df['c_tou_energy'] = opt_sum_df['c_tou_kwh'] * opt_sum_df['P_ev_opt_sum_tou'] \
-                                     / my_ems_tou['time_data']['ntsteps']
-        opt_sum_df['c_tou_mi_energy'] = opt_sum_df['c_tou_mi_kwh'] * opt_sum_df['P_ev_opt_sum_tou_mi'] \
-                                        / my_ems_tou_mi['time_data']['ntsteps']
-        opt_sum_df['c_con_energy'] = opt_sum_df['c_con_kwh'] * opt_sum_df['P_ev_opt_sum_con'] \
-                                     / my_ems_con['time_data']['ntsteps']
-        opt_sum_df['c_con_mi_energy'] = opt_sum_df['c_con_mi_kwh'] * opt_sum_df['P_ev_opt_sum_con_mi'] \
-                                        / my_ems_con_mi['time_data']['ntsteps']
-        opt_sum_df['c_rtp_energy'] = opt_sum_df['c_rtp_kwh'] * opt_sum_df['P_ev_opt_sum_rtp'] \
-                                     / my_ems_rtp['time_data']['ntsteps']
+        ntsteps = pd.Timedelta('1h') / t_range.freq
+        for suffix in PRICING_SUFFIXES.values():
+            opt_sum_df['c_' + suffix + '_energy'] = opt_sum_df['c_' + suffix + '_kwh'] \
+                                                    * opt_sum_df['P_ev_opt_sum_' + suffix] / ntsteps
 
         # Save data to hdf files for further analysis
         flex_sum_df.to_hdf(output_path + str(power) + '/Aggregated Data/flex_sum_data.h5', mode='w', key='df')
@@ -362,6 +309,72 @@ def aggregate_ev_flex(veh_availabilities, output_path='../output/', rtp_input_da
         n_avail_veh_hm.to_hdf(output_path + str(power) + '/Aggregated Data/n_veh_avail_hm_data.h5', mode='w', key='df')
 
 
+def _sum_ev_results(power_path, file_names, t_range):
+    """
+    This function sums the optimal charging plans and flexibility offers of the result files of one power level. Each
+    result is added to all aggregated columns at once at the offset of its first time step.
+
+    :param power_path: path of the results of one power level
+    :param file_names: names of the result files, the same in each pricing strategy folder
+    :param t_range: time steps of the aggregated columns
+    :return: dict of aggregated columns and their sums, including the number of available vehicles
+    """
+    sum_columns = [(col.format(suffix), pricing, path) for col, path in {**OPT_SUM_COLUMNS, **FLEX_SUM_COLUMNS}.items()
+                   for pricing, suffix in PRICING_SUFFIXES.items()]
+    result_columns = ['time_data/time_slots'] + list(OPT_SUM_COLUMNS.values()) + list(FLEX_SUM_COLUMNS.values())
+    sums = np.zeros((len(sum_columns), len(t_range)))
+    n_veh_avail = np.zeros(len(t_range), dtype=int)
+    # Go through all files, loading only the columns which are aggregated
+    for result_name in file_names:
+        results = {pricing: opentumflex.load_ems_js(power_path + pricing + '/' + result_name, columns=result_columns)
+                   for pricing in PRICING_SUFFIXES}
+        time_slots = results['ToU']['time_data']['time_slots']
+        start = t_range.get_loc(pd.Timestamp(time_slots[0]))
+        end = start + len(time_slots)
+        sums[:, start:end] += [_get_column(results[pricing], path) for _, pricing, path in sum_columns]
+        n_veh_avail[start:end] += 1
+
+    sums = dict(zip([col for col, _, _ in sum_columns], sums))
+    sums['n_veh_avail'] = n_veh_avail
+    return sums
+
+
+def _sum_ev_store_results(result_store, power, shards, t_range):
+    """
+    This function sums the optimal charging plans and flexibility offers of one power level in shards of a result
+    store. Each result is added to all aggregated columns of its pricing strategy at the offset of its first time step.
+
+    :param result_store: folder of the result store
+    :param power: power level as in the keys 'power/pricing/ev_avail_i' of the results
+    :param shards: paths of the shards to read
+    :param t_range: time steps of the aggregated columns
+    :return: dict of aggregated columns and their sums, dict of the vehicle availabilities and their first and last
+             (exclusive) offsets
+    """
+    sums = {col.format(suffix): np.zeros(len(t_range)) for col in {**OPT_SUM_COLUMNS, **FLEX_SUM_COLUMNS}
+            for suffix in PRICING_SUFFIXES.values()}
+    vehicles = {}
+    result_columns = ['time_data/time_slots'] + list(OPT_SUM_COLUMNS.values()) + list(FLEX_SUM_COLUMNS.values())
+    # Go through all results of the power level, loading only the columns which are aggregated
+    for key, ems in opentumflex.ResultStore(result_store).iter_ems(columns=result_columns, prefix=power + '/',
+                                                                   shards=shards):
+        _, pricing, veh_name = key.split('/')
+        time_slots = ems['time_data']['time_slots']
+        start = t_range.get_loc(pd.Timestamp(time_slots[0]))
+        end = start + len(time_slots)
+        for col, path in {**OPT_SUM_COLUMNS, **FLEX_SUM_COLUMNS}.items():
+            sums[col.format(PRICING_SUFFIXES[pricing])][start:end] += _get_column(ems, path)
+        vehicles[veh_name] = (start, end)
+
+    return sums, vehicles
+
+
+def _get_column(ems, path):
+    for key in path.split('/'):
+        ems = ems[key]
+    return ems
+
+
 if __name__ == '__main__':
     # Read veh availabilities from file
     veh_avail = pd.read_csv('../input/chts_veh_availability.csv')
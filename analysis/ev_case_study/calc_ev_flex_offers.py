@@ -11,8 +11,13 @@ __maintainer__ = "Michel Zadé"
 __email__ = "michel.zade@tum.de"
 __status__ = "Development"
 
+from concurrent.futures import ProcessPoolExecutor
 from joblib import Parallel, delayed
 import multiprocessing
+import time
+import copy
+import json
+import os
 import pandas as pd
 import opentumflex
 import forecast
@@ -26,7 +31,9 @@ def calc_ev_flex_offers(veh_availabilities,
                         pricing_strategies={'ToU', 'Constant', 'Con_mi', 'ToU_mi', 'RTP'},
                         conversion_distance_2_km=1.61,
                         conversion_km_2_kwh=0.2,
-                        plotting=False):
+                        plotting=False,
+                        result_store=None,
+                        solver='highs'):
     """
     This function iteratively calculates the flexibility of each vehicle availability for every power level
     and pricing strategy.
@@ -39,6 +46,8 @@ def calc_ev_flex_offers(veh_availabilities,
     :param conversion_distance_2_km: conversion rate, e.g. 1 mile = 1.61 km
     :param conversion_km_2_kwh: conversion rate from km to kwh
     :param plotting: plotting parameter, default is False
+    :param result_store: folder of a result store to save the results in, otherwise one json file per result is saved
+    :param solver: solver to be used, default is HiGHS, which is kept in the process (appsi) for all solves
     :return: None
     """
 
@@ -53,6 +62,13 @@ def calc_ev_flex_offers(veh_availabilities,
     # Counter for keeping track of insufficient time differences
     t_insufficient_count = 0
 
+    # Pyomo model which is only rebuilt if the length of the availability changes
+    model_template = opentumflex.ModelTemplate()
+    # solver which is kept alive for all vehicle availabilities (if in-process bindings are available)
+    solver_session = opentumflex.SolverSession(solver, time_limit=30, troubleshooting=False)
+    # result store which collects the results in binary shards
+    store = None if result_store is None else opentumflex.ResultStore(result_store)
+
     # Go through all vehicle availabilities
     for i in range(len(veh_availabilities)):
         print('################# Vehicle availability #' + str(i) + ' #################')
@@ -70,11 +86,11 @@ def calc_ev_flex_offers(veh_availabilities,
         my_ems['time_data']['start_time'] = t_arrival_ceiled.strftime('%Y-%m-%d %H:%M')
         my_ems['time_data']['end_time'] = t_departure_floored.strftime('%Y-%m-%d %H:%M')
         my_ems.update(opentumflex.update_time_data(my_ems))
-        my_ems['fcst']['temp'] = [0] * my_ems['time_data']['nsteps']
-        my_ems['fcst']['solar'] = [0] * my_ems['time_data']['nsteps']
-        my_ems['fcst']['last_heat'] = [0] * my_ems['time_data']['nsteps']
-        my_ems['fcst']['last_elec'] = [0] * my_ems['time_data']['nsteps']
-        my_ems['fcst']['gas'] = [0] * my_ems['time_data']['nsteps']
+        my_ems['fcst']['temperature'] = [0] * my_ems['time_data']['nsteps']
+        my_ems['fcst']['solar_power'] = [0] * my_ems['time_data']['nsteps']
+        my_ems['fcst']['load_heat'] = [0] * my_ems['time_data']['nsteps']
+        my_ems['fcst']['load_elec'] = [0] * my_ems['time_data']['nsteps']
+        my_ems['fcst']['gas_price'] = [0] * my_ems['time_data']['nsteps']
         my_ems['fcst']['ele_price_out'] = [0] * my_ems['time_data']['nsteps']
 
         # Get simulated price forecast for given time period
@@ -83,6 +99,8 @@ def calc_ev_flex_offers(veh_availabilities,
                                                         t_end=t_departure_floored,
                                                         pr_constant=0.19,
                                                         pricing=pricing_strategies)
+        # Optimal charging schedules of all price strategies and power levels of the vehicle availability
+        combinations = []
         # Go through all price strategies
         for price in price_fcst.columns:
             # Go through all power levels
@@ -101,24 +119,56 @@ def calc_ev_flex_offers(veh_availabilities,
                                                                             my_ems['time_data']['end_time']],
                                                                    timesetting=my_ems['time_data']))
 
-                # create Pyomo model from opentumflex data
-                m = opentumflex.create_model(my_ems)
+                # create Pyomo model from opentumflex data or update the parameters of the previous one
+                m = model_template.update(my_ems)
 
                 # solve the optimization problem
-                m = opentumflex.solve_model(m, solver='glpk', time_limit=30, troubleshooting=False)
+                m = solver_session.solve(m)
 
                 # extract the results from model and store them in opentumflex['optplan'] dictionary
                 my_ems = opentumflex.extract_res(m, my_ems)
+                combinations.append((str(power) + '/' + price + '/ev_avail_' + str(i), copy.deepcopy(my_ems)))
+
+        # Calculate ev flexibility of all combinations at once
+        _calc_flex_ev_combinations([combination_ems for _, combination_ems in combinations])
+
+        for key, combination_ems in combinations:
+            # Plot flex result
+            if plotting:
+                opentumflex.plot_flex(combination_ems, 'ev')
+
+            # Save results to files
+            if store is None:
+                opentumflex.save_ems(combination_ems, path=output_path + key + '.txt')
+            else:
+                store.save_ems(combination_ems, key=key)
+
+    if store is not None:
+        store.flush()
 
-                # Calculate ev flexibility
-                my_ems = opentumflex.calc_flex_ev(my_ems)
+    # Durations of the solves
+    print('### Solves (' + solver_session.interface + '):', solver_session.summary(), '###')
 
-                # Plot flex result
-                if plotting:
-                    opentumflex.plot_flex(my_ems, 'ev')
 
-                # Save results to files
-                opentumflex.save_ems(my_ems, path=output_path + str(power) + '/' + price + '/ev_avail_' + str(i) + '.txt')
+def _calc_flex_ev_combinations(ems_combinations):
+    """
+    This function calculates the ev flexibility of the power levels and pricing strategies of one vehicle availability
+    in one call of calc_flex_ev_batch.
+
+    :param ems_combinations: list of ems objects with the optimal charging schedules of one vehicle availability
+    :return: None, the flexibility is stored in the ems objects
+    """
+    if not ems_combinations:
+        return
+    time_data = ems_combinations[0]['time_data']
+    # the vehicle is available for the entire time period
+    ev_flex = opentumflex.calc_flex_ev_batch([my_ems['optplan']['EV_power'] for my_ems in ems_combinations],
+                                             [my_ems['fcst']['ele_price_in'] for my_ems in ems_combinations],
+                                             [my_ems['devices']['ev']['maxpow'] for my_ems in ems_combinations], 1,
+                                             n_time_steps_phour=time_data['ntsteps'], temp_res=time_data['t_inval'])
+    for u, my_ems in enumerate(ems_combinations):
+        my_ems['flexopts']['ev'] = opentumflex.FlexTable({col: values[u] for col, values in ev_flex.items()},
+                                                         index=time_data['time_slots'])
 
 
 def calc_ev_flex_offers_parallel(param_variation,
@@ -129,7 +179,8 @@ def calc_ev_flex_offers_parallel(param_variation,
     :param param_variation: parameter variation as a list containing charging power (float), pricing strategy (string)
                             and vehicle availability (list)
     :param param_fix: fix parameters consisting of 'conversion_distance_2_km', 'conversion_km_2_kwh', 'rtp_input_data_path',
-                      'output_path', 'pricing_strategies', 'plotting'
+                      'output_path', 'pricing_strategies' and 'plotting', the result is saved in a json file (use
+                      calc_ev_flex_offers_sweep to save the results in a result store)
     :return: None
     """
 
@@ -206,6 +257,254 @@ def calc_ev_flex_offers_parallel(param_variation,
                                       param_variation[1] + '/ev_avail_' + str(param_variation[2][0]) + '.txt')
 
 
+def calc_ev_flex_offers_sweep(veh_availabilities,
+                              param_fix,
+                              power_levels=[3.7, 11, 22],
+                              n_workers=None,
+                              manifest_path=None,
+                              resume=False):
+    """
+    This function calculates the flexibility of all vehicle availabilities for every power level and pricing strategy
+    in a pool of worker processes. Each worker is initialized once and keeps the ems object with the default devices,
+    the model template, the solver and the rtp prices for all of its tasks. One task calculates all power levels
+    and pricing strategies of one vehicle availability, their flexibility in one call of calc_flex_ev_batch. Completed
+    and failed combinations are recorded in a manifest, solves without a solution are retried with a doubled time
+    limit, other errors stop the sweep.
+
+    :param veh_availabilities: vehicle availabilities as list of rows, see calc_ev_flex_offers_parallel
+    :param param_fix: fix parameters, see calc_ev_flex_offers_parallel, optionally 'solver' (default is 'highs',
+                      kept in the process by appsi), 'time_limit' of the first solve in seconds (default is 30),
+                      'max_retries' (default is 2) and 'result_store', the folder of a result store which gets one
+                      shard per vehicle availability instead of one json file per result
+    :param power_levels: charging power levels
+    :param n_workers: number of worker processes, default is the number of cpus
+    :param manifest_path: path of the manifest, default is 'manifest.jsonl' in the output path
+    :param resume: skip the combinations which are completed according to the manifest, e.g. to continue an
+                   interrupted sweep or to add vehicle availabilities
+    :return: number of completed combinations of power level, pricing strategy and vehicle availability per second
+    """
+    if manifest_path is None:
+        manifest_path = param_fix['output_path'] + 'manifest.jsonl'
+    completed = SweepManifest(manifest_path).completed() if resume else set()
+
+    # Tasks of the vehicle availabilities with the remaining combinations of power level and pricing strategy
+    tasks = []
+    for veh_availability in veh_availabilities:
+        combinations = [(power, price) for price in param_fix['pricing_strategies'] for power in power_levels
+                        if _sweep_key(power, price, veh_availability) not in completed]
+        if combinations:
+            tasks.append((veh_availability, combinations))
+
+    t_start = time.time()
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_sweep_worker,
+                             initargs=(param_fix, manifest_path)) as executor:
+        n_tasks = sum(executor.map(_calc_ev_flex_vehicle, tasks))
+
+    return n_tasks / (time.time() - t_start)
+
+
+def _sweep_key(power, price, veh_availability):
+    return str(power) + '/' + price + '/ev_avail_' + str(veh_availability[0])
+
+
+class SweepManifest:
+    """
+    Append-only log with one json line per finished attempt of a combination, the last line of a key is its state.
+    Lines are short and written at once, so several worker processes can append to the same manifest.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the manifest file, created at the first record
+        """
+        self.path = path
+
+    def record(self, key, status, **info):
+        """
+        This function appends the state of a combination to the manifest.
+
+        :param key: key of the combination, e.g. '3.7/ToU/ev_avail_68'
+        :param status: 'done' or 'failed'
+        :param info: further json serializable information, e.g. the time limit of the solver or the error
+        :return: None
+        """
+        line = json.dumps({'key': key, 'status': status, 'time': pd.Timestamp.now().isoformat(), **info}) + '\n'
+        with open(self.path, 'a+') as f:
+            # start a new line after the line of an interrupted write
+            if f.tell() > 0:
+                f.seek(f.tell() - 1)
+                if f.read(1) != '\n':
+                    line = '\n' + line
+            f.write(line)
+
+    def states(self):
+        """
+        This function reads the last state of every combination in the manifest.
+
+        :return: dict of keys and their last records
+        """
+        states = {}
+        if not os.path.exists(self.path):
+            return states
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # line of an interrupted write
+                    continue
+                states[entry['key']] = entry
+        return states
+
+    def completed(self):
+        """
+        :return: set of the keys of all completed combinations
+        """
+        return {key for key, entry in self.states().items() if entry['status'] == 'done'}
+
+    def failed(self):
+        """
+        :return: dict of the keys of all failed combinations and their last records
+        """
+        return {key: entry for key, entry in self.states().items() if entry['status'] == 'failed'}
+
+
+# state of a sweep worker process, set by _init_sweep_worker
+_sweep_worker = {}
+
+
+def _init_sweep_worker(param_fix, manifest_path):
+    """
+    This function initializes a worker process of calc_ev_flex_offers_sweep.
+
+    :param param_fix: fix parameters, see calc_ev_flex_offers_sweep
+    :param manifest_path: path of the manifest
+    :return: None
+    """
+    # initialize with basic time settings
+    my_ems = opentumflex.initialize_time_setting(0, t_inval=15,
+                                                 start_time='2012-01-01 00:00',
+                                                 end_time='2012-01-01 23:00')
+    # Reset forecasts
+    my_ems['fcst'] = {}
+
+    _sweep_worker.update(param_fix=param_fix,
+                         manifest=SweepManifest(manifest_path),
+                         ems=my_ems,
+                         model_template=opentumflex.ModelTemplate(),
+                         solver_session=opentumflex.SolverSession(param_fix.get('solver', 'highs'),
+                                                                  time_limit=param_fix.get('time_limit', 30),
+                                                                  troubleshooting=False))
+
+
+def _calc_ev_flex_vehicle(task):
+    """
+    This function calculates the flexibility of one vehicle availability for the given power levels and pricing
+    strategies in a worker process of calc_ev_flex_offers_sweep.
+
+    :param task: vehicle availability as list (see calc_ev_flex_offers_parallel) and list of the combinations of
+                 power level and pricing strategy
+    :return: number of completed combinations
+    """
+    veh_availability, combinations = task
+    param_fix = _sweep_worker['param_fix']
+    manifest = _sweep_worker['manifest']
+    my_ems = _sweep_worker['ems']
+
+    # Ceil arrival time to next quarter hour
+    t_arrival_ceiled = pd.Timestamp(veh_availability[4]).ceil(freq='15Min')
+    # Floor departure time to previous quarter hour
+    t_departure_floored = pd.Timestamp(veh_availability[5]).floor(freq='15Min')
+    # Check whether time between ceiled arrival and floored departure time are at least two time steps
+    if t_arrival_ceiled >= t_departure_floored:
+        if param_fix['info']:
+            print('#' + str(veh_availability[0]) + ': Time not sufficient.')
+        return 0
+
+    # change the time interval
+    my_ems['time_data']['start_time'] = t_arrival_ceiled.strftime('%Y-%m-%d %H:%M')
+    my_ems['time_data']['end_time'] = t_departure_floored.strftime('%Y-%m-%d %H:%M')
+    my_ems.update(opentumflex.update_time_data(my_ems))
+    my_ems['fcst']['temperature'] = [0] * my_ems['time_data']['nsteps']
+    my_ems['fcst']['solar_power'] = [0] * my_ems['time_data']['nsteps']
+    my_ems['fcst']['load_heat'] = [0] * my_ems['time_data']['nsteps']
+    my_ems['fcst']['load_elec'] = [0] * my_ems['time_data']['nsteps']
+    my_ems['fcst']['gas_price'] = [0] * my_ems['time_data']['nsteps']
+    my_ems['fcst']['ele_price_out'] = [0] * my_ems['time_data']['nsteps']
+
+    # Get simulated price forecast for given time period, the rtp files are read only once per worker (see RtpStore)
+    price_fcst = forecast.simulate_elect_price_fcst(rtp_input_data_path=param_fix['rtp_input_data_path'],
+                                                    t_start=t_arrival_ceiled,
+                                                    t_end=t_departure_floored,
+                                                    pr_constant=0.19,
+                                                    pricing=param_fix['pricing_strategies'])
+
+    store = None if param_fix.get('result_store') is None else opentumflex.ResultStore(param_fix['result_store'])
+    # solved combinations with the time limit of their solve and their ems object
+    completed = []
+    # Go through the remaining combinations of power level and pricing strategy
+    for power, price in combinations:
+        key = _sweep_key(power, price, veh_availability)
+        if param_fix['info']:
+            print('#' + str(veh_availability[0]) + ': Power=' + str(power) + ' Pricing=' + price)
+        # Update forecast data
+        my_ems['fcst']['ele_price_in'] = price_fcst[price].to_list()
+
+        # Update EV parameters
+        my_ems['devices'].update(opentumflex.create_device(device_name='ev', minpow=0, maxpow=power,
+                                                           stocap=round(veh_availability[2] *
+                                                                        param_fix['conversion_distance_2_km'] *
+                                                                        param_fix['conversion_km_2_kwh']),
+                                                           init_soc=[0], end_soc=[100], eta=0.98,
+                                                           ev_aval=[my_ems['time_data']['start_time'],
+                                                                    my_ems['time_data']['end_time']],
+                                                           timesetting=my_ems['time_data']))
+
+        solver_session = _sweep_worker['solver_session']
+        for _ in range(param_fix.get('max_retries', 2) + 1):
+            try:
+                # update the parameters of the model of the worker or rebuild it if the length of the availability
+                # changes
+                m = _sweep_worker['model_template'].update(my_ems)
+
+                # solve the optimization problem
+                m = solver_session.solve(m)
+
+                # extract the results from model and store them in opentumflex['optplan'] dictionary
+                my_ems = opentumflex.extract_res(m, my_ems)
+                break
+            except opentumflex.NoSolutionError as error:
+                # no solution was found, e.g. within the time limit, retry with a doubled time limit, other errors
+                # like a missing solver stop the sweep
+                manifest.record(key, 'failed', time_limit=solver_session.time_limit, error=repr(error))
+                solver_session = opentumflex.SolverSession(solver_session.solver,
+                                                           time_limit=2 * solver_session.time_limit,
+                                                           troubleshooting=False)
+        else:
+            continue
+        completed.append((key, solver_session.time_limit, copy.deepcopy(my_ems)))
+
+    # Calculate ev flexibility of all solved combinations at once
+    _calc_flex_ev_combinations([combination_ems for _, _, combination_ems in completed])
+
+    # Save results to files
+    for key, _, combination_ems in completed:
+        if store is None:
+            opentumflex.save_ems(combination_ems, path=param_fix['output_path'] + key + '.txt')
+        else:
+            store.save_ems(combination_ems, key=key)
+
+    # Write the results of the vehicle availability to one shard of the result store
+    if store is not None:
+        store.flush()
+
+    # Record the combinations once their results are saved
+    for key, time_limit, _ in completed:
+        manifest.record(key, 'done', time_limit=time_limit)
+
+    return len(completed)
+
+
 if __name__ == '__main__':
     # Read veh availabilities from file
     veh_avail = pd.read_csv('../input/chts_veh_availability.csv')
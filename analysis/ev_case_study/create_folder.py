@@ -5,12 +5,13 @@ import shutil
 
 def create_output_folder(output_path='output/',
                          power_levels=[3.7, 11, 22],
-                         pricing_strategies=['ToU', 'Constant', 'ToU_mi', 'Con_mi', 'RTP']):
-    # Delete existing output folder
-    if os.path.exists(output_path):
+                         pricing_strategies=['ToU', 'Constant', 'ToU_mi', 'Con_mi', 'RTP'],
+                         keep_existing=False):
+    # Delete existing output folder unless a sweep is resumed
+    if os.path.exists(output_path) and not keep_existing:
         shutil.rmtree(path=output_path, ignore_errors=True)
     # Create output folder
-    Path(output_path).mkdir(parents=True, exist_ok=False)
+    Path(output_path).mkdir(parents=True, exist_ok=keep_existing)
     # Go through all price strategies
     for price in pricing_strategies:
         # Go through all power levels
@@ -12,19 +12,19 @@ __maintainer__ = "Michel Zadé"
 __email__ = "michel.zade@tum.de"
 __status__ = "Complete"
 
-from joblib import Parallel, delayed
-from tqdm import tqdm
 import multiprocessing
 import pandas as pd
-import itertools
 import analysis.ev_case_study as ev_case_study
-import os
 
 # Define input and output paths
 output_path = 'output/'
 input_path = 'input/'
 figure_path = 'figures/'
 rtp_input_path = 'input/RTP/'
+# Result store of the single flexibility offers, one shard per vehicle availability
+result_store = output_path + 'results/'
+# Continue an interrupted run or add vehicle availabilities, completed combinations are skipped
+resume = False
 # Read veh availabilities from file
 veh_availabilities = pd.read_csv('input/chts_veh_availability.csv')
 
@@ -42,34 +42,36 @@ params = {'power_levels': [3.7, 11, 22],
 # Create output folder
 ev_case_study.create_output_folder(output_path=output_path,
                                    power_levels=params['power_levels'],
-                                   pricing_strategies=params['pricing'])
+                                   pricing_strategies=params['pricing'],
+                                   keep_existing=resume)
 
-# Create all possible combinations of params
-keys = list(params)
-param_variations = list()
+# Fix parameters of all vehicle availabilities
 param_con = {'conversion_distance_2_km': 1.61,
              'conversion_km_2_kwh': 0.2,
              'rtp_input_data_path': rtp_input_path,
              'output_path': output_path,
+             'result_store': result_store,
              'pricing_strategies': ['ToU', 'Constant', 'Con_mi', 'ToU_mi', 'RTP'],
              'plotting': False,
              'info': False}
-for values in itertools.product(*map(params.get, keys)):
-    # Store in list
-    param_variations.append(list(values))
 
 print('2. Calculate flexibility offers.')
 
-# Run flex calculation in parallel
-Parallel(n_jobs=int(multiprocessing.cpu_count()))(
-    delayed(ev_case_study.calc_ev_flex_offers_parallel)(i, param_con) for i in tqdm(param_variations))
+# Run flex calculation in parallel, each worker calculates all power levels and pricing strategies of a vehicle
+tasks_per_s = ev_case_study.calc_ev_flex_offers_sweep(params['veh_availability'], param_con,
+                                                      power_levels=params['power_levels'],
+                                                      n_workers=int(multiprocessing.cpu_count()),
+                                                      resume=resume)
+print('Calculated {:.2f} combinations per second.'.format(tasks_per_s))
 
 print('3. Aggregate optimal charging schedules, costs, and flexibility offers.')
 
 # Aggregate single offers
 ev_case_study.aggregate_ev_flex(veh_availabilities,
                                 output_path=output_path,
-                                rtp_input_data_path=rtp_input_path)
+                                rtp_input_data_path=rtp_input_path,
+                                n_jobs=int(multiprocessing.cpu_count()),
+                                result_store=result_store)
 
 print('4. Plot results.')
 
@@ -84,7 +86,7 @@ ev_case_study.plot_n_avail_veh(output_path=output_path + str(params['power_level
 ev_case_study.plot_flex_heatmap(output_path=output_path)
 
 # List all power levels
-power_levels = os.listdir(output_path)
+power_levels = [str(power) for power in params['power_levels']]
 # df for overall costs
 overall_costs = pd.DataFrame(columns=power_levels, index=params['pricing'])
 for power in power_levels:
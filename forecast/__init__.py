@@ -3,4 +3,7 @@ This package includes all different forecast modules that are used within opentu
 """
 
 from .price_fcst_sim import simulate_elect_price_fcst
-
+from .rtp_store import RtpStore, get_rtp_store
+from .tou_tariffs import TOU_TARIFFS, tou_prices
+from .scenario_gen import ScenarioGenerator
+from .rtp_ingest import download_rtp_dump, read_rtp_dump, ingest_rtp, rtp_per_daytime
@@ -0,0 +1,166 @@
+"""
+The rtp_ingest.py module ingests real time prices from ComED, an energy supplier from Illinois. Raw 5 minute dumps of
+the ComEd API are cached locally as JSON or CSV files, resampled to a 15 minute resolution and appended to a rtp h5
+store, which only gets the periods after its last quarter hour.
+"""
+
+__author__ = "Michel Zadé"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Michel Zadé"
+__email__ = "michel.zade@tum.de"
+__status__ = "Development"
+
+import json
+import os
+import numpy as np
+import pandas as pd
+from forecast.rtp_store import RTP_STEP
+
+# URL of the 5 minute price feed of ComEd
+COMED_FEED_URL = 'https://hourlypricing.comed.com/api?type=5minutefeed&datestart={}&dateend={}'
+# Local time zone of the ComEd prices
+COMED_TZ = 'America/Chicago'
+# Time step of the raw prices
+RAW_STEP = pd.Timedelta('5Min')
+
+
+def download_rtp_dump(t_start='201901010000', t_end='202001010000', raw_path='input/RTP/raw/'):
+    """
+    This function requests the 5 minute prices of a period from ComEd and caches the raw response as JSON file, which
+    can be ingested later without network access.
+
+    :param t_start: start time as string 'YYYYMMDDhhmm'
+    :param t_end: end time as string 'YYYYMMDDhhmm'
+    :param raw_path: folder of the raw dumps
+    :return: path of the JSON file
+    """
+    import requests
+
+    price_data = requests.get(COMED_FEED_URL.format(t_start, t_end))
+    price_data.raise_for_status()
+    os.makedirs(raw_path, exist_ok=True)
+    dump_path = os.path.join(raw_path, 'rtp_5min_' + t_start + '-' + t_end + '.json')
+    with open(dump_path, 'wb') as dump_file:
+        dump_file.write(price_data.content)
+    return dump_path
+
+
+def read_rtp_dump(dump_paths, tz=COMED_TZ):
+    """
+    This function reads raw dumps of the ComEd 5 minute feed, i.e. JSON lists or CSV files of 'millisUTC' and 'price'
+    in ct/kWh. Rows in several dumps are only taken once.
+
+    :param dump_paths: path or list of paths of the raw dumps
+    :param tz: time zone of the returned time stamps
+    :return: series of the prices in $/kWh with the local time stamps without time zone, sorted by time
+    """
+    if isinstance(dump_paths, str):
+        dump_paths = [dump_paths]
+    raw = []
+    for dump_path in dump_paths:
+        if dump_path.endswith('.json'):
+            with open(dump_path) as dump_file:
+                raw.append(pd.DataFrame(json.load(dump_file), columns=['millisUTC', 'price']))
+        else:
+            raw.append(pd.read_csv(dump_path, usecols=['millisUTC', 'price']))
+    raw = pd.concat(raw, ignore_index=True) if raw else pd.DataFrame(columns=['millisUTC', 'price'])
+
+    # Convert milliseconds since epoch in UTC to local time stamps
+    millis = raw['millisUTC'].to_numpy(dtype=np.int64)
+    millis, first = np.unique(millis, return_index=True)
+    timesteps = pd.to_datetime(millis, unit='ms', utc=True).tz_convert(tz).tz_localize(None)
+    # divide by 100 to make them to dollar per kWh
+    prices = raw['price'].to_numpy(dtype=float)[first] / 100
+    return pd.Series(prices, index=pd.DatetimeIndex(timesteps, name='timesteps'), name='price')
+
+
+def ingest_rtp(dump_paths, store_path, avg_price=0.19, tz=COMED_TZ):
+    """
+    This function resamples raw 5 minute prices to quarter hours and appends the quarter hours after the last quarter
+    hour of the store. A last quarter hour without its last raw price is left for the next dumps. Missing quarter hours
+    are set to the average price of the new quarter hours. A constant value for taxes, fees, delivery services etc. is
+    added, so that the prices of a new store average avg_price, appended prices get the same value as the store or, if
+    the store lacks it, average the price of the store.
+
+    :param dump_paths: path or list of paths of the raw dumps, see read_rtp_dump
+    :param store_path: path of the rtp h5 file, which is created if it does not exist
+    :param avg_price: average price of a new store, default is the constant price of California in 2019
+    :param tz: time zone of the ComEd prices
+    :return: data frame of the appended quarter hours
+    """
+    rtp_5min = read_rtp_dump(dump_paths, tz=tz)
+    if os.path.exists(store_path):
+        with pd.HDFStore(store_path, mode='r') as store:
+            rtp_15min = store['df']
+            # Stores without the value of their taxes and fees keep their average price
+            price_adder = getattr(store.get_storer('df').attrs, 'price_adder', None)
+        avg_price = rtp_15min['price'].mean()
+        # Only raw prices after the last quarter hour of the store
+        rtp_5min = rtp_5min[rtp_5min.index >= rtp_15min.index[-1] + RTP_STEP]
+    else:
+        rtp_15min, price_adder = None, None
+    if not rtp_5min.empty:
+        rtp_5min = rtp_5min[rtp_5min.index < (rtp_5min.index[-1] + RAW_STEP).floor(RTP_STEP)]
+    if rtp_5min.empty:
+        return pd.DataFrame(columns=['price', 'Daytime_ID'], index=pd.DatetimeIndex([], name='timesteps'))
+
+    # Resample data to 15 minutes, starting right after the store
+    new_15min = rtp_5min.resample(RTP_STEP).mean()
+    if rtp_15min is not None:
+        new_15min = new_15min.reindex(pd.date_range(start=rtp_15min.index[-1] + RTP_STEP, end=new_15min.index[-1],
+                                                    freq=RTP_STEP, name='timesteps'))
+    new_15min = new_15min.fillna(new_15min.mean())
+    if price_adder is None:
+        price_adder = avg_price - new_15min.mean()
+    new_15min = pd.DataFrame({'price': new_15min + price_adder,
+                              'Daytime_ID': new_15min.index.day_name() + ', ' + new_15min.index.strftime('%H:%M')})
+
+    # Write the store to a temporary file first, so a failed write keeps the existing store
+    if rtp_15min is not None:
+        new_store = pd.concat([rtp_15min, new_15min])
+    else:
+        new_store = new_15min
+    with pd.HDFStore(store_path + '.tmp', mode='w') as store:
+        store.put('df', new_store)
+        store.get_storer('df').attrs.price_adder = price_adder
+    os.replace(store_path + '.tmp', store_path)
+    return new_15min
+
+
+def rtp_per_daytime(rtp_15min):
+    """
+    This function averages the prices per weekday and time of day.
+
+    :param rtp_15min: data frame of the prices in quarter hours
+    :return: data frame of the average prices from Monday 00:00 till Sunday 23:45
+    """
+    index = rtp_15min.index
+    rtp_per_daytime = rtp_15min[['price']].groupby([index.weekday, index.strftime('%H:%M')]).mean()
+    weekdays = pd.Index(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'])
+    rtp_per_daytime.index = pd.Index(weekdays[rtp_per_daytime.index.get_level_values(0)] + ', ' +
+                                     rtp_per_daytime.index.get_level_values(1), name='Daytime_ID')
+    return rtp_per_daytime
+
+
+if __name__ == '__main__':
+    import glob
+    import matplotlib.pyplot as plt
+    from pandas.plotting import register_matplotlib_converters
+
+    register_matplotlib_converters()
+
+    # Ingest all cached raw dumps, use download_rtp_dump to add dumps
+    t_start, t_end = '201901010000', '202001010000'
+    ingest_rtp(sorted(glob.glob('input/RTP/raw/*')), 'input/RTP/rtp_15min_' + t_start + '-' + t_end + '.h5')
+    rtp_15min = pd.read_hdf('input/RTP/rtp_15min_' + t_start + '-' + t_end + '.h5', key='df')
+    rtp_daytime = rtp_per_daytime(rtp_15min)
+    rtp_daytime.to_hdf('input/RTP/rtp_per_daytime_' + t_start + '-' + t_end + '.h5', mode='w', key='df')
+
+    # Plot average daytime price data
+    plt.figure()
+    rtp_daytime['price'].plot()
+    plt.grid()
+    plt.show()
@@ -0,0 +1,140 @@
+"""
+The rtp_store.py module keeps the real time prices of the rtp h5 files in memory. Every year is read once per process
+and the prices of a time period are sliced by the offsets of its quarter hours.
+"""
+
+__author__ = "Michel Zadé"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Michel Zadé"
+__email__ = "michel.zade@tum.de"
+__status__ = "Development"
+
+import os
+import numpy as np
+import pandas as pd
+
+# Time step of the rtp files
+RTP_STEP = pd.Timedelta('15Min')
+# Years without sufficient rtp data, the years whose prices are used instead and the shift of the time stamps
+RTP_SUBSTITUTE_YEARS = {2012: (2017, pd.Timedelta('1826d'))}
+
+# Stores of all rtp input paths used in this process
+_rtp_stores = {}
+
+
+def get_rtp_store(rtp_input_data_path, mmap=False):
+    """
+    This function returns the rtp store of an input path, which is created only once per process.
+
+    :param rtp_input_data_path: path to rtp h5 files
+    :param mmap: memory-map the prices from .npy files next to the h5 files, see RtpStore
+    :return: RtpStore of the path
+    """
+    key = (os.path.abspath(rtp_input_data_path), mmap)
+    if key not in _rtp_stores:
+        _rtp_stores[key] = RtpStore(rtp_input_data_path, mmap=mmap)
+    return _rtp_stores[key]
+
+
+class RtpStore:
+    """
+    Real time prices of one year per rtp h5 file 'rtp_15min_<year>...h5' in quarter hours. Each year is loaded at
+    its first use, optionally memory-mapped from a flat .npy file, which is written next to the h5 file and rewritten if
+    the h5 file is newer.
+    """
+
+    def __init__(self, rtp_input_data_path, mmap=False):
+        """
+        :param rtp_input_data_path: path to rtp h5 files
+        :param mmap: memory-map the prices from .npy files instead of keeping them in memory
+        """
+        self.rtp_input_data_path = rtp_input_data_path
+        self.mmap = mmap
+        self._files = None
+        self._years = {}
+
+    def years(self):
+        """
+        This function lists the years of the rtp files.
+
+        :return: sorted list of the years
+        """
+        if self._files is None:
+            self._files = sorted(os.listdir(self.rtp_input_data_path))
+        return sorted({int(i[len('rtp_15min_'):len('rtp_15min_') + 4]) for i in self._files
+                       if i.startswith('rtp_15min_') and i.endswith('.h5')})
+
+    def year(self, year):
+        """
+        This function returns the prices of a year of the rtp files.
+
+        :param year: year of the prices
+        :return: prices of all quarter hours of the year starting at January 1st 00:00, None if there is no file
+        """
+        if year not in self._years:
+            if self._files is None:
+                self._files = sorted(os.listdir(self.rtp_input_data_path))
+            names = [i for i in self._files if i.startswith('rtp_15min_' + str(year)) and i.endswith('.h5')]
+            self._years[year] = self._load(self.rtp_input_data_path + names[0], year) if names else None
+        return self._years[year]
+
+    def _load(self, path, year):
+        npy_path = path[:-len('.h5')] + '.npy'
+        if self.mmap and os.path.exists(npy_path) and os.path.getmtime(npy_path) >= os.path.getmtime(path):
+            return np.load(npy_path, mmap_mode='r')
+
+        rtp_price_forecast = pd.read_hdf(path, key='df')
+        index = rtp_price_forecast.index.values
+        if index[0] != pd.Timestamp(year=year, month=1, day=1).to_datetime64() or \
+                (np.diff(index) != RTP_STEP.to_timedelta64()).any():
+            raise ValueError('the prices of ' + path + ' are not in quarter hours from the beginning of ' + str(year))
+        prices = rtp_price_forecast['price'].to_numpy(dtype=float)
+        if not self.mmap:
+            return prices
+        try:
+            np.save(npy_path + '.tmp.npy', prices)
+            os.replace(npy_path + '.tmp.npy', npy_path)
+        except OSError:
+            # read-only input folder
+            return prices
+        return np.load(npy_path, mmap_mode='r')
+
+    def prices(self, t_start, t_end):
+        """
+        This function returns the prices of the quarter hours from t_start to t_end (both included). The prices of a
+        year with a substitute year are taken from the shifted time stamps in the substitute year. Quarter hours
+        without a price in the rtp files are NaN.
+
+        :param t_start: first quarter hour as pandas time stamp
+        :param t_end: last quarter hour as pandas time stamp
+        :return: array of the prices
+        """
+        if (t_start - t_start.floor(RTP_STEP)) != pd.Timedelta(0):
+            raise ValueError('the start time ' + str(t_start) + ' is not a quarter hour')
+        n_steps = max((t_end - t_start) // RTP_STEP + 1, 0)
+        prices = np.full(n_steps, np.nan)
+        if n_steps == 0:
+            return prices
+
+        # Go through all years of the period
+        for year in range(t_start.year, t_end.year + 1):
+            source_year, shift = RTP_SUBSTITUTE_YEARS.get(year, (year, pd.Timedelta(0)))
+            source = self.year(source_year)
+            if source is None:
+                continue
+            # Offsets of the quarter hours of the year in the returned prices and in the prices of the source year
+            start = max((pd.Timestamp(year=year, month=1, day=1) - t_start) // RTP_STEP, 0)
+            end = min((pd.Timestamp(year=year + 1, month=1, day=1) - t_start) // RTP_STEP, n_steps)
+            source_start = (t_start + shift - pd.Timestamp(year=source_year, month=1, day=1)) // RTP_STEP
+            # Skip the quarter hours before and after the source year
+            start = max(start, -source_start)
+            end = min(end, len(source) - source_start)
+            if start < end:
+                prices[start:end] = source[source_start + start:source_start + end]
+
+        if np.isnan(prices).all():
+            raise ValueError('there are no rtp prices from ' + str(t_start) + ' to ' + str(t_end))
+        return prices
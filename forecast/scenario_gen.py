@@ -0,0 +1,139 @@
+"""
+The scenario_gen.py module generates Monte-Carlo scenarios of electricity prices and loads by bootstrapping historical
+days of the rtp files. The scenarios are reproducible from a seed and can be generated in chunks.
+"""
+
+__author__ = "Michel Zadé"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Michel Zadé"
+__email__ = "michel.zade@tum.de"
+__status__ = "Development"
+
+import numpy as np
+import pandas as pd
+from forecast.rtp_store import get_rtp_store, RTP_STEP
+
+# Number of scenarios drawn from one random number stream, scenario i is always drawn from stream i // SCENARIO_BLOCK
+SCENARIO_BLOCK = 64
+
+
+class ScenarioGenerator:
+    """
+    Price scenarios are composed of historical rtp days of the same month and day type (weekday or weekend) as the days
+    of the period. Load scenarios vary a base load by lognormal noise, which is correlated with the deviation of the
+    prices from their historical mean at the same time of day.
+    """
+
+    def __init__(self, rtp_input_data_path='../analysis/input/RTP/', seed=0, rtp_store=None):
+        """
+        :param rtp_input_data_path: path to rtp h5 files
+        :param seed: seed of the random number streams
+        :param rtp_store: RtpStore of the rtp prices, default is the store of rtp_input_data_path in this process
+        """
+        self.seed = seed
+        if rtp_store is None:
+            rtp_store = get_rtp_store(rtp_input_data_path)
+        steps_per_day = pd.Timedelta('1d') // RTP_STEP
+
+        # Prices of all historical days and their day types
+        days, dates = [], []
+        for year in rtp_store.years():
+            prices = np.asarray(rtp_store.year(year))
+            n_days = len(prices) // steps_per_day
+            days.append(prices[:n_days * steps_per_day].reshape(n_days, steps_per_day))
+            dates.append(pd.date_range(start=pd.Timestamp(year=year, month=1, day=1), periods=n_days, freq='1d'))
+        self.days = np.concatenate(days)
+        dates = dates[0].append(dates[1:])
+        self._pools = {}
+        for pos, day_type in enumerate(zip(dates.month, dates.weekday >= 5)):
+            self._pools.setdefault(day_type, []).append(pos)
+        self._pools = {day_type: np.array(pool) for day_type, pool in self._pools.items()}
+        # Mean and standard deviation of the prices per time of day
+        self.day_mean = self.days.mean(axis=0)
+        self.day_std = self.days.std(axis=0)
+        # Times of day with the same price on all days have no deviation, not the rounding error of the mean
+        self.day_std[(self.days == self.days[0]).all(axis=0)] = 0
+
+    def scenarios(self, t_start, n_steps, n_scenarios, start_scenario=0, load=None, load_sigma=0.1,
+                  correlation=0.5):
+        """
+        This function generates price and load scenarios in one vectorized call per block of scenarios.
+
+        :param t_start: first quarter hour as pandas time stamp
+        :param n_steps: number of quarter hours
+        :param n_scenarios: number of scenarios
+        :param start_scenario: number of the first scenario, e.g. to continue a set of scenarios
+        :param load: base load of the period, e.g. ems['fcst']['load_elec'], no load scenarios if None
+        :param load_sigma: standard deviation of the logarithm of the load variation
+        :param correlation: correlation of the logarithm of the load variation with the price deviation
+        :return: dict with the (n_scenarios, n_steps) arrays 'price' and, if a base load is given, 'load'
+        """
+        t_start = pd.Timestamp(t_start)
+        offset = (t_start - t_start.normalize()) // RTP_STEP
+        steps_per_day = self.days.shape[1]
+        dates = pd.date_range(start=t_start.normalize(), periods=-(-(offset + n_steps) // steps_per_day), freq='1d')
+        pools = [self._pools.get(day_type, np.arange(len(self.days)))
+                 for day_type in zip(dates.month, dates.weekday >= 5)]
+
+        scenarios = {'price': np.empty((n_scenarios, n_steps))}
+        if load is not None:
+            scenarios['load'] = np.empty((n_scenarios, n_steps))
+            load = np.asarray(load, dtype=float)
+            tod = (offset + np.arange(n_steps)) % steps_per_day
+            # Times of day with equal prices on all historical days have no price deviation
+            day_mean, day_std = self.day_mean[tod], self.day_std[tod]
+            day_std_safe = np.where(day_std > 0, day_std, 1)
+        # Go through the blocks of the scenarios, each drawn from its own random number stream
+        end_scenario = start_scenario + n_scenarios
+        for block in range(start_scenario // SCENARIO_BLOCK, -(-end_scenario // SCENARIO_BLOCK)):
+            rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(block,)))
+            # Draw a historical day of the same day type for every day of the period
+            picks = np.stack([pool[rng.integers(len(pool), size=SCENARIO_BLOCK)] for pool in pools], axis=1)
+            prices = self.days[picks].reshape(SCENARIO_BLOCK, -1)[:, offset:offset + n_steps]
+            # Rows of the block in the scenarios
+            first = max(start_scenario - block * SCENARIO_BLOCK, 0)
+            last = min(end_scenario - block * SCENARIO_BLOCK, SCENARIO_BLOCK)
+            rows = slice(block * SCENARIO_BLOCK + first - start_scenario, block * SCENARIO_BLOCK + last - start_scenario)
+            scenarios['price'][rows] = prices[first:last]
+            if load is not None:
+                deviation = np.where(day_std > 0, (prices - day_mean) / day_std_safe, 0)
+                noise = correlation * deviation + np.sqrt(1 - correlation ** 2) * rng.standard_normal(prices.shape)
+                scenarios['load'][rows] = load * np.exp(load_sigma * noise[first:last] - load_sigma ** 2 / 2)
+
+        return scenarios
+
+    def iter_scenarios(self, t_start, n_steps, n_scenarios, chunk_size=1024, **kwargs):
+        """
+        This function generates the scenarios in chunks to keep the memory bounded, the chunks together are equal to
+        the scenarios of one call of scenarios.
+
+        :param t_start: first quarter hour as pandas time stamp
+        :param n_steps: number of quarter hours
+        :param n_scenarios: number of scenarios
+        :param chunk_size: number of scenarios per chunk
+        :param kwargs: further parameters of scenarios, e.g. the base load
+        :return: generator of dicts of scenarios, see scenarios
+        """
+        for start_scenario in range(0, n_scenarios, chunk_size):
+            yield self.scenarios(t_start, n_steps, min(chunk_size, n_scenarios - start_scenario),
+                                 start_scenario=start_scenario, **kwargs)
+
+
+if __name__ == '__main__':
+    import time as tm
+
+    bench_generator = ScenarioGenerator(rtp_input_data_path='../analysis/input/RTP/', seed=42)
+    bench_load = 0.5 + 0.3 * np.sin(np.linspace(0, 14 * np.pi, 7 * 96))
+    t_bench = tm.time()
+    bench_scenarios = bench_generator.scenarios(pd.Timestamp('2012-07-02 00:00'), 7 * 96, 10000, load=bench_load)
+    print('10000 one-week scenarios: {:.2f} s'.format(tm.time() - t_bench))
+    bench_chunks = list(bench_generator.iter_scenarios(pd.Timestamp('2012-07-02 00:00'), 7 * 96, 10000,
+                                                        chunk_size=1000, load=bench_load))
+    print('chunks equal:', np.array_equal(np.concatenate([chunk['price'] for chunk in bench_chunks]),
+                                         bench_scenarios['price']),
+          np.array_equal(np.concatenate([chunk['load'] for chunk in bench_chunks]), bench_scenarios['load']))
+    print('correlation of price and load deviation: {:.2f}'.format(
+        np.corrcoef(bench_scenarios['price'].ravel(), (bench_scenarios['load'] / bench_load).ravel())[0, 1]))
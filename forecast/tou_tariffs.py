@@ -0,0 +1,72 @@
+"""
+The tou_tariffs.py module defines time-of-use tariffs by seasons, day types and hour bands and evaluates them for a
+time period with vectorized masks.
+"""
+
+__author__ = "Michel Zadé"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Michel Zadé"
+__email__ = "michel.zade@tum.de"
+__status__ = "Development"
+
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Time-of-use tariffs: every season applies to its months, every day type of a season to its weekdays (Monday is 0).
+# A day type has a base rate and bands of hours [start, end) with other rates, all rates in $/kWh.
+TOU_TARIFFS = {
+    # According to TOU-D-PRIME: https://www.sce.com/residential/rates/Time-Of-Use-Residential-Rate-Plans
+    'TOU-D-PRIME': {
+        'seasons': [
+            # Summer rate from june till september, on peak period (4pm - 9pm) on weekdays, mid peak on weekends
+            {'months': [6, 7, 8, 9],
+             'day_types': [{'weekdays': [0, 1, 2, 3, 4], 'rate': 0.14, 'bands': [(16, 21, 0.39)]},
+                           {'weekdays': [5, 6], 'rate': 0.14, 'bands': [(16, 21, 0.27)]}]},
+            # Winter rate with super off-peak and mid peak period (4pm - 9pm), weekdays and weekends are the same
+            {'months': [1, 2, 3, 4, 5, 10, 11, 12],
+             'day_types': [{'weekdays': [0, 1, 2, 3, 4, 5, 6], 'rate': 0.13, 'bands': [(16, 21, 0.36)]}]}
+        ]
+    }
+}
+
+
+def tou_prices(tariff, t_start, t_end, freq='15Min'):
+    """
+    This function returns the prices of a time-of-use tariff for a time period.
+
+    :param tariff: name of the tariff in TOU_TARIFFS
+    :param t_start: start time as pandas time stamp
+    :param t_end: end time as pandas time stamp
+    :param freq: frequency of the time steps
+    :return: array of the prices of all time steps from t_start to t_end, NaN if no rate applies
+    """
+    return _compile_tou(tariff, pd.Timestamp(t_start), pd.Timestamp(t_end), freq).copy()
+
+
+@lru_cache(maxsize=256)
+def _compile_tou(tariff, t_start, t_end, freq):
+    """
+    This function evaluates a time-of-use tariff for a time period, the result is cached per tariff and period.
+
+    :return: read-only array of the prices
+    """
+    index = pd.date_range(start=t_start, end=t_end, freq=freq)
+    months = index.month.values
+    weekdays = index.weekday.values
+    hours = index.hour.values
+
+    prices = np.full(len(index), np.nan)
+    for season in TOU_TARIFFS[tariff]['seasons']:
+        in_season = np.isin(months, season['months'])
+        for day_type in season['day_types']:
+            in_day_type = in_season & np.isin(weekdays, day_type['weekdays'])
+            prices[in_day_type] = day_type['rate']
+            for start, end, rate in day_type['bands']:
+                prices[in_day_type & (start <= hours) & (hours < end)] = rate
+
+    prices.setflags(write=False)
+    return prices
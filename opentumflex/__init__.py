@@ -12,14 +12,22 @@ from opentumflex.configuration.devices import save_device, create_device
 from opentumflex.configuration.set_time import initialize_time_setting
 from opentumflex.configuration.init_ems import save_ems, init_ems_js, read_data, read_forecast, \
     read_properties, update_time_data
+from opentumflex.configuration.ems import EMS
+from opentumflex.configuration.load_ems import load_ems_js
+from opentumflex.configuration.result_store import ResultStore
 from opentumflex.flexibility.flex_hp import calc_flex_hp
 from opentumflex.flexibility.flex_pv import calc_flex_pv
 from opentumflex.flexibility.flex_chp import calc_flex_chp
-from opentumflex.flexibility.flex_bat import calc_flex_bat
-from opentumflex.flexibility.flex_ev import calc_flex_ev
+from opentumflex.flexibility.flex_bat import calc_flex_bat, calc_flex_bat_batch
+from opentumflex.flexibility.flex_ev import calc_flex_ev, calc_flex_ev_batch
+from opentumflex.flexibility.flex_devices import calc_flex_devices
+from opentumflex.flexibility.flex_table import FlexTable, flex_frame
 from opentumflex.market_communication.generate_market_offers import save_offers_alf, save_offers_comax, save_offers
 from opentumflex.optimization.report import save_results
-from opentumflex.optimization.model import create_model, solve_model, extract_res
+from opentumflex.optimization.model import create_model, update_model, solve_model, extract_res, ModelTemplate, \
+    SolverSession, NoSolutionError
+from opentumflex.optimization.sparse_model import create_sparse_model, solve_sparse_model, extract_sparse_res, \
+    SparseModel
 from opentumflex.plot.plot_optimal_results import plot_optimal_results
 
 from opentumflex.plot.plot_optimal_results import compare_optimal_results
@@ -2,7 +2,10 @@
 This package configures all parameters of the ems object
 """
 
-from .devices import save_device, create_device
+from .devices import save_device, create_device, get_hp_performance
 from .set_time import initialize_time_setting
 from .init_ems import save_ems, init_ems_js, read_data, read_forecast, read_properties, update_time_data
+from .ems import EMS
+from .load_ems import load_ems_js
+from .result_store import ResultStore
 
@@ -18,6 +18,9 @@ import numpy as np
 import datetime
 from scipy.interpolate import UnivariateSpline
 
+# fitted power and COP splines of heat pumps, keyed by power map, COP map and supply temperature
+_hp_performance_cache = {}
+
 
 def create_device(device_name, minpow=0, maxpow=0, stocap=0, eta=1, init_soc=60, end_soc=40, ev_aval=None,
                   supply_temp=45, timesetting=None, sto_volume=0, path=None):
@@ -266,3 +269,44 @@ def save_device(ems, device_name, path):
     # open the file and write in the data
     with open(path, 'w') as f:
         js.dump(device_unit, f)
+
+
+def get_hp_performance(hp_param, temperature):
+    """ evaluate the electric power and the COP of a heat pump for a whole ambient temperature forecast
+
+    The splines of the power map and the COP map are only fitted once for every combination of powmap, COP and
+    supply_temp and are reused afterwards.
+
+    :param hp_param: parameters of the heat pump, e.g. ems['devices']['hp']
+    :param temperature: ambient temperature forecast in degree celsius
+    :return: arrays of electric power and COP for every time step of the forecast
+    """
+    key = (_hp_map_key(hp_param['powmap']), _hp_map_key(hp_param['COP']), hp_param['supply_temp'])
+    if key not in _hp_performance_cache:
+        hp_elec_cap = pd.DataFrame.from_dict(hp_param['powmap'])
+        hp_cop = pd.DataFrame.from_dict(hp_param['COP'])
+        hp_supply_temp = hp_param['supply_temp']
+        # spline functions for electric power and COP of the heat pump over the ambient temperature
+        spl_elec_pow = UnivariateSpline(list(map(float, hp_elec_cap.columns.values)),
+                                        list(hp_elec_cap.loc[hp_supply_temp, :]))
+        spl_cop = UnivariateSpline(list(map(float, hp_cop.columns.values)), list(hp_cop.loc[hp_supply_temp, :]))
+        _hp_performance_cache[key] = (spl_elec_pow, spl_cop)
+
+    spl_elec_pow, spl_cop = _hp_performance_cache[key]
+    temp_kelvin = np.asarray(temperature, dtype=float) + 273.15
+
+    return spl_elec_pow(temp_kelvin), spl_cop(temp_kelvin)
+
+
+def _hp_map_key(hp_map):
+    """ convert a power or COP map of the heat pump (dict of dicts) to a hashable key
+
+    :param hp_map: power map or COP map of the heat pump
+    :return: tuple with all entries of the map
+    """
+    key = []
+    for col in sorted(hp_map, key=str):
+        rows = sorted(hp_map[col].items(), key=lambda item: str(item[0]))
+        key.append((str(col), tuple((str(row), val) for row, val in rows)))
+
+    return tuple(key)
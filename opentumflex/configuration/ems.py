@@ -0,0 +1,182 @@
+"""
+ems.py defines the EMS class, an array-backed ems object with the same sections as the ems dictionary. The forecasting
+data and optimization results are stored as NumPy arrays, while the dict-compatible accessor keeps all functions and
+scenarios working with it. EMS objects are saved in a binary .npz file together with a small json header.
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import json as js
+
+import numpy as np
+import pandas as pd
+
+from opentumflex.flexibility.flex_table import FlexTable
+
+# sections whose time series are stored as float arrays
+ARRAY_SECTIONS = ('fcst', 'optplan')
+
+
+class EMS:
+    """ ems object with one attribute per section of the ems dictionary
+
+    ems['fcst'] and ems.fcst are the same dict, assigning ems['fcst'] or ems['optplan'] converts the time series to
+    float arrays.
+    """
+
+    __slots__ = ('time_data', 'fcst', 'optplan', 'devices', 'flexopts', 'reoptim')
+
+    def __init__(self, time_data=None, fcst=None, optplan=None, devices=None, flexopts=None, reoptim=None):
+        for key, section in zip(self.__slots__, (time_data, fcst, optplan, devices, flexopts, reoptim)):
+            self[key] = {} if section is None else section
+
+    @classmethod
+    def from_dict(cls, ems):
+        """ create an EMS object from an ems dictionary, the sections are not copied except the time series
+
+        :param ems: ems dictionary, e.g. from initialize_time_setting or init_ems_js
+        :return: EMS object
+        """
+        return cls(**{key: ems[key] for key in cls.__slots__ if key in ems})
+
+    def to_dict(self):
+        """ convert the EMS object to an ems dictionary with lists as time series, e.g. to save it with save_ems
+
+        :return: ems dictionary
+        """
+        ems = {key: self[key] for key in self.__slots__}
+        for key in ARRAY_SECTIONS:
+            ems[key] = {name: list(values) if isinstance(values, np.ndarray) else values
+                        for name, values in ems[key].items()}
+        return ems
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, section):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        if key in ARRAY_SECTIONS:
+            section = {name: _as_array(values) for name, values in section.items()}
+        setattr(self, key, section)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def values(self):
+        return [self[key] for key in self.__slots__]
+
+    def items(self):
+        return [(key, self[key]) for key in self.__slots__]
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def update(self, sections):
+        for key, section in dict(sections).items():
+            self[key] = section
+
+    def save(self, path):
+        """ save the EMS object in a binary .npz file, the arrays of the same dtype are stored in one buffer
+
+        :param path: path of the .npz file
+        :return: none
+        """
+        buffers = {}
+        header = {key: _split(self[key], buffers) for key in self.__slots__}
+        np.savez(path, _header=np.array(js.dumps(header)),
+                 **{name: np.concatenate(parts) for name, parts in buffers.items()})
+
+    @classmethod
+    def load(cls, path):
+        """ load an EMS object saved by EMS.save
+
+        :param path: path of the .npz file
+        :return: EMS object
+        """
+        with np.load(path, allow_pickle=False) as data:
+            buffers = {name: data[name] for name in data.files}
+        header = js.loads(str(buffers.pop('_header')))
+        return cls(**{key: _join(header[key], buffers) for key in cls.__slots__})
+
+
+def _as_array(values):
+    """ convert a time series to a float array, other values are returned unchanged """
+    if isinstance(values, (list, tuple, pd.Series, np.ndarray)):
+        try:
+            return np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+def _split(obj, buffers):
+    """ replace the arrays and flexibility tables by references to the buffers of the .npz file
+
+    :param obj: section or value of the ems object
+    :param buffers: dict of dtype names and lists of flattened arrays, extended by the arrays of obj
+    :return: json serializable header of obj
+    """
+    if isinstance(obj, dict):
+        if all(isinstance(key, str) for key in obj):
+            return {key: _split(value, buffers) for key, value in obj.items()}
+        # keep keys like the temperatures of the heat pump maps
+        return {'__items__': [[_split(key, buffers), _split(value, buffers)] for key, value in obj.items()]}
+    if isinstance(obj, pd.DataFrame):
+        obj = FlexTable.from_pandas(obj)
+    if isinstance(obj, FlexTable):
+        index = None if isinstance(obj.index, pd.RangeIndex) else _split(obj.index, buffers)
+        return {'__flextable__': _split(np.array(obj).T, buffers), 'columns': obj.columns, 'index': index}
+    if isinstance(obj, pd.Index) and obj.dtype == object:
+        return {'__index__': obj.tolist()}
+    if isinstance(obj, (pd.Index, pd.Series)):
+        obj = obj.to_numpy()
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return _split(obj.tolist(), buffers)
+        parts = buffers.setdefault(obj.dtype.name, [])
+        offset = sum(part.size for part in parts)
+        parts.append(obj.ravel())
+        return {'__array__': [obj.dtype.name, offset, list(obj.shape)]}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (list, tuple)):
+        return [_split(value, buffers) for value in obj]
+    return obj
+
+
+def _join(header, buffers):
+    """ restore the values of the ems object from the header and the buffers of the .npz file """
+    if isinstance(header, dict):
+        if '__array__' in header:
+            name, offset, shape = header['__array__']
+            return buffers[name][offset:offset + int(np.prod(shape))].reshape(shape)
+        if '__items__' in header:
+            return {_join(key, buffers): _join(value, buffers) for key, value in header['__items__']}
+        if '__index__' in header:
+            return pd.Index(header['__index__'])
+        if '__flextable__' in header:
+            return FlexTable(dict(zip(header['columns'], _join(header['__flextable__'], buffers))),
+                             index=_join(header['index'], buffers))
+        return {key: _join(value, buffers) for key, value in header.items()}
+    if isinstance(header, list):
+        return [_join(value, buffers) for value in header]
+    return header
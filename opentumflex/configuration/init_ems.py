@@ -16,10 +16,14 @@ __email__ = "zhengjie.you@tum.de"
 __status__ = "Development"
 
 
+import numpy as np
 import pandas as pd
 import json as js
 import os
 
+# Parsed input files of this process by path with the version of the file, see _parse_input
+_input_cache = {}
+
 
 def save_ems(ems, path):
     """ save all the data in ems object into one json file
@@ -28,9 +32,16 @@ def save_ems(ems, path):
     :param path: path where the json file will be saved
     :return: none
     """
+    # change EMS object to ems dictionary
+    if not isinstance(ems, dict):
+        ems = ems.to_dict()
 
-    # change index to lists
+    # change index and arrays to lists
     ems['time_data']['time_slots'] = list(ems['time_data']['time_slots'])
+    for key in ('fcst', 'optplan'):
+        if key in ems:
+            ems[key] = {name: values.tolist() if isinstance(values, np.ndarray) else values
+                        for name, values in ems[key].items()}
     with open(path, 'w') as f:
         # change dataframe format to dict
         for key in ems['flexopts']:
@@ -78,29 +89,34 @@ def update_time_data(ems):
     return dict_time_data
 
 
-def read_data(ems,init_time_step=0,end_step=-1, path=None, to_csv=False, fcst_only=True):
+def read_data(ems, init_time_step=0, end_step=-1, path=None, to_csv=False, fcst_only=True, sidecar=False,
+              as_array=False):
     """ read device parameters or forecasting data from input file
 
+    The input file is parsed once per process and file version, further calls only copy the cached forecasting data
+    into new lists, or return read-only array views of them with as_array.
+
     :param ems: ems object
+    :param init_time_step: first time step of the forecasting data in csv files
+    :param end_step: end time step of the forecasting data in csv files, -1 for all time steps
     :param path: path of the input data
     :param to_csv: determine if csv data will be created
     :param fcst_only: if False,  forecasting data and device parameters will be read, otherwise only forecasting data
+    :param sidecar: if True, the parsed input data is also saved in a binary .npz file next to the input file
+    :param as_array: if True, the forecasting data are read-only array views shared by all calls instead of lists
     :return: ems object updated by the input data
     """
     # Check for the file type 
     if path.endswith('.xlsx'):
-        print('Reading your excel file, please wait!')
-        # obtain the spreadsheet data
-        xls = pd.ExcelFile(path)
-        if not fcst_only:            
+        prop, fcst, rows, n_rows = _parse_input(path, sidecar)
+        if not fcst_only:
             # read device parameters
-            prop = pd.read_excel(xls, sheet_name='properties', index_col=0, usecols=range(0, 3))
             read_properties(ems, prop)
         # read forecasting data and write it into ems object
-        ts = pd.read_excel(xls, sheet_name='time_series', usecols='B:I', nrows=ems['time_data']['nsteps'])
-        ems['fcst'] = read_forecast(ts)
+        ems['fcst'] = {key: _fcst_values(values[:ems['time_data']['nsteps']], as_array) for key, values in fcst.items()}
         # Save excel file as CSV
         if to_csv:
+            ts = pd.DataFrame({key: values[:ems['time_data']['nsteps']] for key, values in fcst.items()})
             basename = os.path.basename(path)
             filename = os.path.splitext(basename)[0] + '.csv'
             if not os.path.exists('input'):
@@ -114,18 +130,17 @@ def read_data(ems,init_time_step=0,end_step=-1, path=None, to_csv=False, fcst_on
                     pd.concat([prop, ts], sort=False).to_csv(f, sep=';')
 
     elif path.endswith('.csv'):
-        csv_data = pd.read_csv(path, sep=';', index_col=0)
-        prop = csv_data.iloc[:, 0:2].dropna(how='all')
+        prop, fcst, rows, n_rows = _parse_input(path, sidecar)
+        # number of time steps within the first end_step + len(prop) rows of the file
         if end_step == -1:
-            ts = csv_data.iloc[:, 2:].dropna(how='all')
+            n_steps = len(rows)
         else:
-            ts = csv_data.iloc[:end_step+len(prop), 2:].dropna(how='all')
-        ts = ts.iloc[init_time_step:,:]
+            n_steps = np.searchsorted(rows, len(range(n_rows)[:end_step + len(prop)]))
         # read device parameters
         if not fcst_only:
             read_properties(ems, prop)
         # read forecasting data and write it into ems object
-        ems['fcst'] = read_forecast(ts)
+        ems['fcst'] = {key: _fcst_values(values[:n_steps][init_time_step:], as_array) for key, values in fcst.items()}
 
     else:
         print('Input file format is not accepted, Exit call')
@@ -133,12 +148,93 @@ def read_data(ems,init_time_step=0,end_step=-1, path=None, to_csv=False, fcst_on
     return ems
 
 
-def read_forecast(excel_data):
+def _fcst_values(values, as_array):
+    """ forecasting data of the ems object from a read-only array of the cache, a list unless as_array is True """
+    return values if as_array else values.tolist()
+
+
+def _parse_input(path, sidecar=False):
+    """ parse an input file, the result is cached per path until the file is modified
+
+    :param path: path of the input data
+    :param sidecar: if True, the result is loaded from or saved in the .npz file path + '.npz'
+    :return: device parameters, dict of read-only arrays of forecasting data, rows of the forecasting data in the file
+             and number of rows in the file
+    """
+    stat = os.stat(path)
+    version = [stat.st_mtime_ns, stat.st_size]
+    key = os.path.abspath(path)
+    if key not in _input_cache or _input_cache[key][0] != version:
+        parsed = _load_sidecar(path + '.npz', version) if sidecar else None
+        if parsed is None:
+            if path.endswith('.xlsx'):
+                print('Reading your excel file, please wait!')
+                # obtain the spreadsheet data
+                xls = pd.ExcelFile(path)
+                prop = pd.read_excel(xls, sheet_name='properties', index_col=0, usecols=range(0, 3))
+                ts = pd.read_excel(xls, sheet_name='time_series', usecols='B:I')
+                rows = np.arange(len(ts))
+                n_rows = len(ts)
+            else:
+                csv_data = pd.read_csv(path, sep=';', index_col=0)
+                prop = csv_data.iloc[:, 0:2].dropna(how='all')
+                # the forecasting data are all rows with values in the time series columns
+                ts = csv_data.iloc[:, 2:]
+                rows = np.flatnonzero(ts.notna().any(axis=1).to_numpy())
+                ts = ts.iloc[rows]
+                n_rows = len(csv_data)
+            parsed = (prop, read_forecast(ts, as_array=True), rows, n_rows)
+            if sidecar:
+                _save_sidecar(path + '.npz', version, parsed)
+        _input_cache[key] = (version, parsed)
+    return _input_cache[key][1]
+
+
+def _save_sidecar(path, version, parsed):
+    """ save parsed input data in a .npz file, input data with non-numeric time series are not saved """
+    prop, fcst, rows, n_rows = parsed
+    if any(values.dtype == object for values in fcst.values()):
+        return
+    header = {'version': version, 'n_rows': n_rows, 'prop': js.loads(prop.to_json(orient='split')),
+              'prop_index': prop.index.name, 'fcst': list(fcst)}
+    try:
+        np.savez(path, _header=np.array(js.dumps(header)), _rows=rows,
+                 **{'fcst_' + str(i): values for i, values in enumerate(fcst.values())})
+    except OSError:
+        # read-only input folder
+        pass
+
+
+def _load_sidecar(path, version):
+    """ load parsed input data from a .npz file, None if there is no file of the same version of the input file """
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        header = js.loads(str(data['_header']))
+        if header['version'] != version:
+            return None
+        fcst = {key: data['fcst_' + str(i)] for i, key in enumerate(header['fcst'])}
+        rows = data['_rows']
+    for values in fcst.values():
+        values.setflags(write=False)
+    prop = pd.DataFrame(header['prop']['data'], columns=header['prop']['columns'],
+                        index=pd.Index(header['prop']['index'], name=header['prop_index']))
+    return prop, fcst, rows, header['n_rows']
+
+
+def read_forecast(excel_data, as_array=False):
     """ read the forecasting data from spreadsheet
 
     :param excel_data: excel_data sheet 'time_series'
+    :param as_array: if True, the forecasting data are read-only arrays instead of lists
     :return: dictionary of forecasting data
     """
+    if as_array:
+        dict_fcst = {key: excel_data[key].to_numpy(copy=True) for key in excel_data.columns}
+        for values in dict_fcst.values():
+            values.setflags(write=False)
+        return dict_fcst
+
     dict_fcst = excel_data.to_dict('dict')
     for key in dict_fcst:
         dict_fcst[key] = list(dict_fcst[key].values())
@@ -153,14 +249,10 @@ def read_properties(ems, prop):
     :param prop:  device parameters from input file
     :return: None
     """
-    data_index = prop.index.unique()
     device_set = ems['devices']
     # iterate through all the device parameters and write it into dictionary device_set
-    for i in range(0, len(data_index)):
-        dat = prop[prop.index == data_index[i]].set_index('parameter')
-        dat_T = dat.T
-        dat_T.reset_index(inplace=True, drop=True)
-        device_set[data_index[i]].update(dat_T.to_dict('records')[0])
+    for device, parameter, value in zip(prop.index, prop['parameter'], prop.iloc[:, 1].tolist()):
+        device_set[device][parameter] = value
     ems['devices'] = device_set
 
     # Changing EV input to list
@@ -0,0 +1,172 @@
+"""
+load_ems.py loads only selected columns of an ems object saved by save_ems. The json text is scanned without decoding
+the values which are not requested, e.g. all other columns of the optimal plan, and the flexibility offers are returned
+as FlexTables, which are viewed as DataFrames only on demand with flex_frame.
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import json as js
+import re
+
+from opentumflex.flexibility.flex_table import FlexTable
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DECODER = js.JSONDecoder()
+
+
+def load_ems_js(path, columns):
+    """ load the given columns of an ems object from a json file saved by save_ems
+
+    :param path: path of the json file
+    :param columns: list of paths in the ems object, e.g. 'optplan/EV_power', 'flexopts/ev/Pos_P' or 'time_data' for
+                    a whole section
+    :return: ems object with the requested columns, flexibility offers as FlexTable
+    """
+    with open(path) as f:
+        text = f.read()
+    ems, _ = _decode_selected(text, _WHITESPACE.match(text).end(), _column_tree(columns))
+    for device, flexopts in ems.get('flexopts', {}).items():
+        ems['flexopts'][device] = _flex_table(flexopts)
+
+    return ems
+
+
+def _column_tree(columns):
+    """ convert the column paths to nested dicts, None marks a value which is decoded completely
+
+    :param columns: list of paths in the ems object
+    :return: nested dict of the requested keys
+    """
+    tree = {}
+    for column in columns:
+        node = tree
+        keys = column.split('/')
+        for key in keys[:-1]:
+            if key in node and node[key] is None:
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = None
+    return tree
+
+
+def _decode_selected(text, pos, tree):
+    """ decode the requested keys of the json object starting at pos
+
+    :param text: json text
+    :param pos: position of the value
+    :param tree: nested dict of the requested keys
+    :return: decoded value and position after it
+    """
+    if text[pos] != '{':
+        return _DECODER.raw_decode(text, pos)
+    obj = {}
+    pos = _WHITESPACE.match(text, pos + 1).end()
+    while text[pos] != '}':
+        key, pos = _DECODER.raw_decode(text, pos)
+        # skip the colon
+        pos = _WHITESPACE.match(text, _WHITESPACE.match(text, pos).end() + 1).end()
+        if key not in tree:
+            pos = _skip(text, pos)
+        elif tree[key] is None:
+            obj[key], pos = _DECODER.raw_decode(text, pos)
+        else:
+            obj[key], pos = _decode_selected(text, pos, tree[key])
+        pos = _WHITESPACE.match(text, pos).end()
+        if text[pos] == ',':
+            pos = _WHITESPACE.match(text, pos + 1).end()
+    return obj, pos + 1
+
+
+def _skip(text, pos):
+    """ find the end of the json value starting at pos without decoding it if possible
+
+    :param text: json text
+    :param pos: position of the value
+    :return: position after the value
+    """
+    opening = text[pos]
+    if opening in '[{':
+        closing = ']' if opening == '[' else '}'
+        end = text.find(closing, pos + 1)
+        # a container without nested containers and escapes, its closing bracket is not in a string if the number of
+        # quotes before it is even
+        if end > 0 and text.find('[', pos + 1, end) < 0 and text.find('{', pos + 1, end) < 0 and \
+                text.find('\\', pos + 1, end) < 0 and text.count('"', pos + 1, end) % 2 == 0:
+            return end + 1
+        if opening == '{':
+            # skip the values of the object one by one, e.g. the columns of the optimal plan
+            pos = _WHITESPACE.match(text, pos + 1).end()
+            while text[pos] != '}':
+                pos = _DECODER.raw_decode(text, pos)[1]
+                pos = _skip(text, _WHITESPACE.match(text, _WHITESPACE.match(text, pos).end() + 1).end())
+                pos = _WHITESPACE.match(text, pos).end()
+                if text[pos] == ',':
+                    pos = _WHITESPACE.match(text, pos + 1).end()
+            return pos + 1
+    return _DECODER.raw_decode(text, pos)[1]
+
+
+def _flex_table(flexopts):
+    """ convert the flexibility offers of a device saved by DataFrame.to_dict('dict') to a FlexTable
+
+    :param flexopts: dict of columns, each a dict of index labels and values
+    :return: FlexTable, indexed by the labels unless they are the range of the time steps
+    """
+    labels = list(next(iter(flexopts.values()), {}))
+    index = None if labels == [str(i) for i in range(len(labels))] else labels
+    return FlexTable({col: list(values.values()) for col, values in flexopts.items()}, index=index)
+
+
+if __name__ == '__main__':
+    # benchmark: time to load the columns used by aggregate_ev_flex against init_ems_js
+    import os
+    import tempfile
+    import time as tm
+    import numpy as np
+    import opentumflex
+
+    bench_n = 200
+    bench_ems = opentumflex.initialize_time_setting(0, t_inval=15, start_time='2012-01-01 08:00',
+                                                    end_time='2012-01-02 08:00')
+    bench_nsteps = bench_ems['time_data']['nsteps']
+    bench_ems['fcst'] = {name: list(np.random.rand(bench_nsteps)) for name in
+                         ['temperature', 'solar_power', 'load_heat', 'load_elec', 'gas_price', 'ele_price_out',
+                          'ele_price_in']}
+    bench_ems['devices'].update(opentumflex.create_device(device_name='ev', minpow=0, maxpow=11, stocap=40,
+                                                          init_soc=[0], end_soc=[100], eta=0.98,
+                                                          ev_aval=[bench_ems['time_data']['start_time'],
+                                                                   bench_ems['time_data']['end_time']],
+                                                          timesetting=bench_ems['time_data']))
+    bench_ems['optplan'] = {'column_{}'.format(i): list(np.random.rand(bench_nsteps)) for i in range(40)}
+    bench_ems['optplan']['EV_power'] = list(np.random.rand(bench_nsteps) * 11)
+    opentumflex.calc_flex_ev(bench_ems)
+    bench_file = os.path.join(tempfile.mkdtemp(), 'ev_avail.txt')
+    opentumflex.save_ems(bench_ems, bench_file)
+    bench_columns = ['time_data', 'optplan/EV_power', 'flexopts/ev/Pos_P', 'flexopts/ev/Neg_P',
+                     'flexopts/ev/Pos_E', 'flexopts/ev/Neg_E']
+
+    t_start = tm.time()
+    for _ in range(bench_n):
+        opentumflex.init_ems_js(bench_file)
+    t_full = (tm.time() - t_start) / bench_n
+    t_start = tm.time()
+    for _ in range(bench_n):
+        load_ems_js(bench_file, bench_columns)
+    t_columns = (tm.time() - t_start) / bench_n
+    t_start = tm.time()
+    for _ in range(bench_n):
+        with open(bench_file) as bench_f:
+            bench_f.read()
+    t_read = (tm.time() - t_start) / bench_n
+    print('{:.0f} kB json file: init_ems_js {:.2f} ms, load_ems_js {:.2f} ms, reading the file {:.2f} ms'.format(
+        os.path.getsize(bench_file) / 1e3, t_full * 1e3, t_columns * 1e3, t_read * 1e3))
+    os.remove(bench_file)
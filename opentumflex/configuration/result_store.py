@@ -0,0 +1,302 @@
+"""
+result_store.py is the binary alternative to save_ems/init_ems_js for large parameter sweeps. Instead of one json file
+per run, many ems objects are stored column by column in .npz shards of a result store folder. Every writer creates its
+own shards, so many workers can append to one store at the same time, and readers only load the requested columns.
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import json as js
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from opentumflex.flexibility.flex_table import FlexTable, flex_frame
+
+# sections whose time series are stored as columns
+COLUMN_SECTIONS = ('fcst', 'optplan')
+
+
+class ResultStore:
+    """ folder of .npz shards, each holding the columns of up to shard_size ems objects
+
+    A column is named by its path in the ems object, e.g. 'optplan/EV_power', 'flexopts/ev/Pos_P' or
+    'time_data/time_slots'. The values of all ems objects of a shard are concatenated in one array per column with the
+    offsets of the ems objects in '<column>.offsets'. The remaining values (e.g. devices) are saved in a json header.
+    """
+
+    def __init__(self, path, shard_size=256, compressed=False):
+        """ open or create a result store
+
+        :param path: folder of the result store
+        :param shard_size: number of ems objects buffered before they are written to a new shard
+        :param compressed: if True, the shards are written with np.savez_compressed
+        """
+        self.path = path
+        self.shard_size = shard_size
+        self.compressed = compressed
+        self._buffer = []
+        self._index = None
+        os.makedirs(path, exist_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def save_ems(self, ems, key):
+        """ add an ems object to the result store, it is written to a shard once shard_size objects are buffered
+
+        :param ems: ems object or EMS
+        :param key: unique name of the result, e.g. '3.7/ToU/ev_avail_12'
+        :return: none
+        """
+        self._buffer.append((key, _flatten(ems)))
+        if len(self._buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """ write the buffered ems objects to a new shard
+
+        :return: none
+        """
+        if not self._buffer:
+            return
+        keys, records = zip(*self._buffer)
+        # the headers of the ems objects are already json strings
+        header = '{{"keys": {}, "records": [{}]}}'.format(js.dumps(keys),
+                                                          ', '.join(record['header'] for record in records))
+        arrays = {'_header': np.frombuffer(header.encode(), dtype=np.uint8)}
+        for name in sorted(set().union(*(record['columns'] for record in records))):
+            values = [record['columns'][name] for record in records if name in record['columns']]
+            lengths = [len(record['columns'].get(name, ())) for record in records]
+            arrays[name] = np.concatenate(values)
+            arrays[name + '.offsets'] = np.concatenate([[0], np.cumsum(lengths)])
+
+        # write to a temporary file first, readers only see complete shards
+        shard = os.path.join(self.path, 'shard-{}-{}.npz'.format(os.getpid(), uuid.uuid4().hex))
+        with open(shard + '.tmp', 'wb') as f:
+            (np.savez_compressed if self.compressed else np.savez)(f, **arrays)
+        os.replace(shard + '.tmp', shard)
+        self._buffer = []
+        self._index = None
+
+    def shards(self):
+        """ list the shards of the result store
+
+        :return: sorted list of the shard paths
+        """
+        return sorted(os.path.join(self.path, name) for name in os.listdir(self.path) if name.endswith('.npz'))
+
+    def keys(self, prefix=''):
+        """ list the keys of the saved ems objects
+
+        :param prefix: only return keys starting with prefix, e.g. '3.7/ToU/'
+        :return: list of keys
+        """
+        return [key for key in self._shard_index() if key.startswith(prefix)]
+
+    def load_ems(self, key, columns=None):
+        """ load one ems object from the result store
+
+        :param key: name of the result
+        :param columns: list of column paths to load, all columns if None
+        :return: ems object with arrays as time series and FlexTables as flexibility offers
+        """
+        shard, pos = self._shard_index()[key]
+        return next(_read_shard(shard, columns, [pos]))[1]
+
+    def iter_ems(self, columns=None, prefix='', shards=None):
+        """ iterate over the ems objects of the result store shard by shard
+
+        :param columns: list of column paths to load, all columns if None
+        :param prefix: only return keys starting with prefix
+        :param shards: paths of the shards to read, e.g. a part of shards() for one of several processes, all if None
+        :return: iterator of key and ems object
+        """
+        for shard in self.shards() if shards is None else shards:
+            for key, ems in _read_shard(shard, columns, prefix=prefix):
+                yield key, ems
+
+    def _shard_index(self):
+        if self._index is None:
+            self._index = {}
+            for shard in self.shards():
+                with np.load(shard, allow_pickle=False) as data:
+                    keys = js.loads(data['_header'].tobytes())['keys']
+                self._index.update((key, (shard, pos)) for pos, key in enumerate(keys))
+        return self._index
+
+
+def _read_shard(shard, columns=None, positions=None, prefix=''):
+    """ read ems objects from a shard, only the requested members of the .npz file are decompressed
+
+    :param shard: path of the shard
+    :param columns: list of column paths to load, all columns if None
+    :param positions: positions of the ems objects in the shard, all if None
+    :param prefix: only return keys starting with prefix
+    :return: iterator of key and ems object
+    """
+    with np.load(shard, allow_pickle=False) as data:
+        header = js.loads(data['_header'].tobytes())
+        if columns is None:
+            columns = [name for name in data.files if name != '_header' and not name.endswith('.offsets')]
+        # the time slots of the flexibility offers belong to their columns
+        columns = set(columns)
+        for name in list(columns):
+            if name.startswith('flexopts/'):
+                columns.update([name.rsplit('/', 1)[0] + '/index', 'time_data/time_slots'])
+        columns = [name for name in columns if name in data.files]
+        arrays = {name: (data[name], data[name + '.offsets']) for name in columns}
+    # decode the time slots of all ems objects at once
+    arrays = {name: (values.astype(str).astype(object) if values.dtype.kind == 'S' else values, offsets)
+              for name, (values, offsets) in arrays.items()}
+    if positions is None:
+        positions = [pos for pos, key in enumerate(header['keys']) if key.startswith(prefix)]
+    for pos in positions:
+        yield header['keys'][pos], _unflatten(header['records'][pos],
+                                              {name: values[offsets[pos]:offsets[pos + 1]]
+                                               for name, (values, offsets) in arrays.items()
+                                               if offsets[pos + 1] > offsets[pos]})
+
+
+def _flatten(ems):
+    """ split an ems object into copies of its columns and a json header
+
+    :param ems: ems object or EMS
+    :return: dict with the columns and the header
+    """
+    columns = {}
+    header = {key: section for key, section in ems.items() if key not in COLUMN_SECTIONS + ('flexopts',)}
+    header['time_data'] = dict(ems['time_data'])
+    if 'time_slots' in header['time_data']:
+        columns['time_data/time_slots'] = np.asarray(header['time_data'].pop('time_slots'), dtype=bytes)
+    for section in COLUMN_SECTIONS:
+        for name, values in ems[section].items():
+            columns[section + '/' + name] = np.array(values, dtype=float)
+    header['flexopts'] = {}
+    for device, flexopts in ems['flexopts'].items():
+        table = flexopts if isinstance(flexopts, FlexTable) else FlexTable.from_pandas(flex_frame(flexopts))
+        for col in table.columns:
+            columns['flexopts/' + device + '/' + col] = table[col].copy()
+        # index of the flexibility offers: none, the time slots or an own column
+        index = None
+        if not isinstance(table.index, pd.RangeIndex):
+            index = np.asarray(table.index, dtype=bytes)
+            if np.array_equal(index, columns.get('time_data/time_slots')):
+                index = 'time_data/time_slots'
+            else:
+                columns['flexopts/' + device + '/index'] = index
+                index = 'flexopts/' + device + '/index'
+        header['flexopts'][device] = {'columns': table.columns, 'index': index}
+
+    return {'columns': columns, 'header': js.dumps(header, default=_json_default)}
+
+
+def _unflatten(header, columns):
+    """ rebuild an ems object from its header and the loaded columns
+
+    :param header: json header of the ems object
+    :param columns: dict of column paths and values
+    :return: ems object
+    """
+    ems = {key: section for key, section in header.items() if key != 'flexopts'}
+    ems.update({section: {} for section in COLUMN_SECTIONS})
+    ems['flexopts'] = {}
+    if 'time_data/time_slots' in columns:
+        ems['time_data']['time_slots'] = pd.Index(columns['time_data/time_slots'], dtype=object)
+    for name, values in columns.items():
+        section, _, name = name.partition('/')
+        if section in COLUMN_SECTIONS:
+            ems[section][name] = values
+    for device, device_header in header['flexopts'].items():
+        data = {col: columns['flexopts/' + device + '/' + col] for col in device_header['columns']
+                if 'flexopts/' + device + '/' + col in columns}
+        if data:
+            if device_header['index'] == 'time_data/time_slots':
+                index = ems['time_data'].get('time_slots')
+            else:
+                index = columns.get(device_header['index'])
+            ems['flexopts'][device] = FlexTable(data, index=index)
+
+    return ems
+
+
+def _json_default(obj):
+    if isinstance(obj, (np.ndarray, pd.Index, pd.Series)):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError('{} is not json serializable'.format(type(obj).__name__))
+
+
+if __name__ == '__main__':
+    # benchmark: write and read throughput and disk footprint of the result store against the json files of save_ems
+    import shutil
+    import tempfile
+    import time as tm
+    import opentumflex
+
+    bench_n = 500
+    bench_ems = opentumflex.initialize_time_setting(0, t_inval=15, start_time='2012-01-01 08:00',
+                                                    end_time='2012-01-01 18:00')
+    bench_nsteps = bench_ems['time_data']['nsteps']
+    bench_ems['fcst'] = {'ele_price_in': list(np.random.rand(bench_nsteps) * 0.1 + 0.2),
+                         'ele_price_out': [0] * bench_nsteps}
+    bench_ems['devices'].update(opentumflex.create_device(device_name='ev', minpow=0, maxpow=11, stocap=40,
+                                                          init_soc=[0], end_soc=[100], eta=0.98,
+                                                          ev_aval=[bench_ems['time_data']['start_time'],
+                                                                   bench_ems['time_data']['end_time']],
+                                                          timesetting=bench_ems['time_data']))
+    bench_results = []
+    for i in range(bench_n):
+        bench_ems['optplan'] = {name: list(np.random.rand(bench_nsteps) * 11) for name in
+                                ['EV_power', 'EV_SOC', 'grid_import', 'grid_export', 'load_elec_demand']}
+        bench_results.append(opentumflex.calc_flex_ev(dict(bench_ems, flexopts={})))
+    bench_columns = ['time_data/time_slots', 'optplan/EV_power', 'flexopts/ev/Pos_P', 'flexopts/ev/Neg_P',
+                     'flexopts/ev/Pos_E', 'flexopts/ev/Neg_E']
+    bench_dir = tempfile.mkdtemp()
+
+    def folder_size(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+    os.mkdir(os.path.join(bench_dir, 'json'))
+    t_start = tm.time()
+    for i in range(bench_n):
+        opentumflex.save_ems(dict(bench_results[i], flexopts=dict(bench_results[i]['flexopts'])),
+                             os.path.join(bench_dir, 'json', 'ev_avail_{}.txt'.format(i)))
+    t_write = tm.time() - t_start
+    t_start = tm.time()
+    for i in range(bench_n):
+        opentumflex.init_ems_js(os.path.join(bench_dir, 'json', 'ev_avail_{}.txt'.format(i)))
+    t_read = tm.time() - t_start
+    print('json files:  write {:.0f}/s, read {:.0f}/s, {:.1f} kB per result'.format(
+        bench_n / t_write, bench_n / t_read, folder_size(os.path.join(bench_dir, 'json')) / bench_n / 1e3))
+
+    for bench_compressed in [False, True]:
+        bench_path = os.path.join(bench_dir, 'store_{}'.format(bench_compressed))
+        t_start = tm.time()
+        with ResultStore(bench_path, compressed=bench_compressed) as bench_store:
+            for i in range(bench_n):
+                bench_store.save_ems(bench_results[i], 'ev_avail_{}'.format(i))
+        t_write = tm.time() - t_start
+        t_start = tm.time()
+        n_read = sum(1 for _ in ResultStore(bench_path).iter_ems())
+        t_read = tm.time() - t_start
+        t_start = tm.time()
+        sum(1 for _ in ResultStore(bench_path).iter_ems(columns=bench_columns))
+        t_read_columns = tm.time() - t_start
+        print('store (compressed={}): write {:.0f}/s, read {:.0f}/s, read {} columns {:.0f}/s, {:.1f} kB per result'
+              .format(bench_compressed, bench_n / t_write, n_read / t_read, len(bench_columns),
+                      bench_n / t_read_columns, folder_size(bench_path) / bench_n / 1e3))
+    shutil.rmtree(bench_dir)
@@ -3,9 +3,11 @@
 This package contains the flexibility modules for each device (e.g. EV, PV, CHP, HP, Bat).
 """
 
-from .flex_ev import calc_flex_ev
-from .flex_bat import calc_flex_bat
+from .flex_ev import calc_flex_ev, calc_flex_ev_batch
+from .flex_bat import calc_flex_bat, calc_flex_bat_batch
 from .flex_pv import calc_flex_pv
 from .flex_chp import calc_flex_chp
 from .flex_hp import calc_flex_hp
 
+from .flex_devices import calc_flex_devices
+from .flex_table import FlexTable, flex_frame
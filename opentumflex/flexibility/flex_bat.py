@@ -12,168 +12,222 @@ __email__ = "babu.kumaran-nalini@tum.de"
 __status__ = "Development"
 
 
-import pandas as pd
-import statistics
 import numpy as np
+from fractions import Fraction
+
+from opentumflex.flexibility.flex_duration import next_smaller, suffix_sums
+from opentumflex.flexibility.flex_table import FlexTable, FLEX_COLUMNS
 
 
 def calc_flex_bat(my_ems, reopt):
     # Find whether optimization or reoptimization
     if reopt == 0:
-        dat1 = {'col1': my_ems['optplan']['bat_grid2bat'], 
-            'col2': my_ems['optplan']['bat_input_power'],
-            'col3': my_ems['optplan']['bat_output_power'],
-            'col4': my_ems['optplan']['bat_SOC']}    
+        optplan = my_ems['optplan']
     elif reopt == 1:
-        dat1 = {'col1': my_ems['reoptim']['optplan']['bat_grid2bat'], 
-            'col2': my_ems['reoptim']['optplan']['bat_input_power'],
-            'col3': my_ems['reoptim']['optplan']['bat_output_power'],
-            'col4': my_ems['reoptim']['optplan']['bat_SOC']}   
-    
-    dat1 = pd.DataFrame(data=dat1)   
-    nsteps = len(dat1)
-    ntsteps = my_ems['time_data']['ntsteps']
-    Bat_flex = pd.DataFrame(0, index=range(nsteps), columns=range(7))
-    Bat_flex.columns = ['Sch_P', 'Neg_P', 'Pos_P', 'Neg_E', 'Pos_E', 'Neg_Pr', 'Pos_Pr']
-    
-    # Bat_flex.iloc[:, 0] = my_ems['optplan']['bat_grid2bat']
-    Bat_maxP = my_ems['devices']['bat']['maxpow']
-    Bat_minP = my_ems['devices']['bat']['minpow']
-    Bat_maxE = my_ems['devices']['bat']['stocap']
-    Bat_minE = 0.500
+        optplan = my_ems['reoptim']['optplan']
+
+    bat_flex = calc_flex_bat_batch(optplan['bat_grid2bat'], optplan['bat_input_power'], optplan['bat_output_power'],
+                                   optplan['bat_SOC'], my_ems['fcst']['ele_price_in'],
+                                   my_ems['devices']['bat']['maxpow'], my_ems['devices']['bat']['minpow'],
+                                   my_ems['devices']['bat']['stocap'], my_ems['time_data']['ntsteps'],
+                                   sch_bat_in=my_ems['optplan']['bat_input_power'])
+    Bat_flex = FlexTable({col: bat_flex[col][0] for col in FLEX_COLUMNS})
 
-    # Battery negative flexibility
-    for i in range(nsteps):
-        Bat_flex.iloc[i, 0] = dat1.iloc[i, 2]  - dat1.iloc[i, 1]
-        nflex_P = Bat_maxP-dat1.iloc[i, 1]+dat1.iloc[i, 2]
-        if (dat1.iloc[i, 3]*Bat_maxE/100 < Bat_maxE) and (nflex_P > 0):
-            #round command changed to np.floor command
-            req_steps = int(np.floor(ntsteps*(Bat_maxE-dat1.iloc[i, 3]*Bat_maxE/100)/nflex_P))
-            if nflex_P < Bat_minP: #flexibilty power can not be offered as less than minimum power
-                req_steps = 0
-                
-            elif (req_steps != 0) and (req_steps + i <= nsteps-1): 
-                req_steps = req_steps + i
-            elif req_steps != 0:
-                req_steps = nsteps - 1
-            #print(i,req_steps,(ntsteps*(Bat_maxE-dat1.iloc[i, 3]*Bat_maxE/100)/nflex_P),nflex_P,dat1.iloc[i, 3])
-            if req_steps > 0:                                
-                j = i
-                while (j < nsteps) and (j < req_steps) and \
-                        nflex_P <= (Bat_maxP-dat1.iloc[j, 1]+dat1.iloc[j, 2]): 
-                    j = j+1
-                Bat_flex.iloc[i, 1] = -1*nflex_P
-                Bat_flex.iloc[i, 3] = Bat_flex.iloc[i, 1]*(j-i)/ntsteps
-                
-            # Usable energy
-                cbat_E = 0
-                for k in range(j, nsteps):
-                    cbat_E = cbat_E + (dat1.iloc[k, 1])/ntsteps  
-                
-            # Computing the exact flexibility
-                neg_Eflex = Bat_flex.iloc[i, 3]
-                while (cbat_E < abs(neg_Eflex)) and (j >= i):
-                    neg_Eflex = neg_Eflex + abs(Bat_flex.iloc[i, 1]/ntsteps)
-    #                cbat_E = cbat_E + (dat1.iloc[j-1, 1]/4)
-                    j = j-1
-                    Bat_flex.iloc[i, 3] = Bat_flex.iloc[i, 1]*(j-i)/ntsteps
-                if j <= i:
-                    Bat_flex.iloc[i, 1] = 0
-                    Bat_flex.iloc[i, 3] = 0                                     
-                    
-    # Pricing
-    for i in range(nsteps):
-        if Bat_flex.iloc[i, 1] < 0 and i < nsteps-1:
-            req_steps = int(round(Bat_flex.iloc[i, 3]*ntsteps/Bat_flex.iloc[i, 1]))
-            bch_index = [k+i+req_steps for k, l in enumerate(my_ems['optplan']['bat_input_power'][i+req_steps:nsteps]) if l > 0]
-            pow_ch = []
-            price_ch = []
-            for k in range(0, len(bch_index)):
-                pow_ch.append(my_ems['optplan']['bat_input_power'][bch_index[k]])
-                price_ch.append(my_ems['fcst']['ele_price_in'][bch_index[k]])            
-            bat_ch = pd.DataFrame({'slots':bch_index, 'Bat_in':pow_ch, 'price':price_ch})
-            bat_ch = bat_ch.sort_values(by=['price'], ascending=False)    
-            e_bal = abs(Bat_flex.iloc[i, 3])
-            e_prc = 0
-            for k in range(0, len(bch_index)):
-                if e_bal - bat_ch.iloc[k,1]/ntsteps >= 0:
-                    e_bal = e_bal - bat_ch.iloc[k,1]/ntsteps
-                    e_prc = e_prc + bat_ch.iloc[k,2]*bat_ch.iloc[k,1]/ntsteps                    
-                elif (e_bal - bat_ch.iloc[k,1]/ntsteps < 0) and (e_bal > 0):
-                    e_prc = e_prc + bat_ch.iloc[k,2]*e_bal
-                    e_bal = 0
-            Bat_flex.iloc[i, 5] = e_prc/Bat_flex.iloc[i, 3]
-        elif Bat_flex.iloc[i, 1] < 0 and i == nsteps-1:
-            Bat_flex.iloc[i, 5] = -1*my_ems['fcst']['ele_price_in'][i]
-
-# PV_Bat_Integration
-    # Battery positive flexibility
-    # Feeding into the grid
-    for i in range(nsteps):
-        ava_ebatout = dat1.iloc[i, 3]*Bat_maxE/100 - Bat_minE
-        ava_steps = 0
-        if ava_ebatout > 0:
-            pflex_P = Bat_maxP - dat1.iloc[i, 2]
-            #print(pflex_P)
-            if pflex_P > 0:
-                ava_steps = int(np.floor(ntsteps*ava_ebatout/pflex_P)) #changed round to np.floor
-                
-                #print(i,ntsteps*ava_ebatout/pflex_P,pflex_P,ava_ebatout)
-                if (Bat_maxP - dat1.iloc[i, 2]) < Bat_minP:
-                    ava_steps = 0
-                elif (ava_steps != 0) and (ava_steps + i <= nsteps-1):
-                    ava_steps = ava_steps + i
-                elif ava_steps != 0:
-                    ava_steps = nsteps-1  
-                #print(i,ava_steps)
-            if ava_steps > 0:
-                j = i
-                while (j < nsteps) and (j < ava_steps) and  \
-                        pflex_P <= (Bat_maxP - dat1.iloc[j, 2]): #changed formula for flexibility calculation for j time step
-                    # Add minimum pos flex power in the previous line
-                    j = j+1
-                Bat_flex.iloc[i, 2] = pflex_P
-                Bat_flex.iloc[i, 4] = Bat_flex.iloc[i, 2]*(j-i)/ntsteps    
-                
-                # Rechargable energy
-                cbat_E = 0
-                for k in range(j,nsteps):
-                    cbat_E = cbat_E + (Bat_maxP-dat1.iloc[k, 1])/ntsteps       
-                
-                # Computing the exact flexibility
-                pos_Eflex = Bat_flex.iloc[i, 4] 
-                while (cbat_E < pos_Eflex) and (j >= i):
-                    pos_Eflex = pos_Eflex - Bat_flex.iloc[i, 2]/ntsteps
-                    cbat_E = cbat_E + (Bat_maxP-dat1.iloc[j-1, 1])/ntsteps
-                    j = j-1
-                    Bat_flex.iloc[i, 4] = Bat_flex.iloc[i, 2]*(j-i)/ntsteps
-                if j <= i:
-                    Bat_flex.iloc[i, 2] = 0
-                    Bat_flex.iloc[i, 4] = 0
-            
-    # Curtailing scheduled charging
-    for i in range(nsteps):
-         if dat1.iloc[i, 0] > 0:
-             j = i
-             while (j < nsteps) and (dat1.iloc[i, 0] <= dat1.iloc[j, 0]):
-                 j = j+1
-             pflex_P = dat1.iloc[i, 1]
-             Bat_flex.iloc[i, 2] = Bat_flex.iloc[i, 2] + pflex_P
-             Bat_flex.iloc[i, 4] = Bat_flex.iloc[i, 4] + pflex_P*(j-i)/ntsteps  
-             
-    # Pricing
-    for i in range(nsteps):
-        if Bat_flex.iloc[i, 2] > 0 and i < nsteps-1:
-            min_val = my_ems['fcst']['ele_price_in']
-            min_val = statistics.mean(min_val[i:nsteps])
-            Bat_flex.iloc[i, 6] = 1*min_val        
-        elif Bat_flex.iloc[i, 2] > 0 and i == nsteps-1:
-            Bat_flex.iloc[i, 6] = my_ems['fcst']['ele_price_in'][i]
-    
     # Insert time column
     # temp = my_ems['time_data']['time_slots'][:]
     # Bat_flex.insert(0,"time",temp)
 
     my_ems['flexopts']['bat'] = Bat_flex
-         
+
     return my_ems
+
+
+def calc_flex_bat_batch(grid2bat, bat_in, bat_out, bat_soc, price_in, max_power, min_power, capacity, ntsteps,
+                        sch_bat_in=None):
+    """ battery flexibility of many units in one call
+
+    All units are calculated at once on arrays of shape (n_units, n_steps). The exact energy checks step back the
+    offers of all units together, one time step per iteration, until every offer fits into the energy of the battery.
+
+    :param grid2bat: power from the grid to the battery, array of shape (n_units, n_steps)
+    :param bat_in: scheduled charging power, array of shape (n_units, n_steps)
+    :param bat_out: scheduled discharging power, array of shape (n_units, n_steps)
+    :param bat_soc: scheduled state of charge in %, array of shape (n_units, n_steps)
+    :param price_in: electricity price, array of shape (n_units, n_steps) or (n_steps,) for all units
+    :param max_power: maximum power of every unit (scalar for all units)
+    :param min_power: minimum power of every unit (scalar for all units)
+    :param capacity: storage capacity of every unit (scalar for all units)
+    :param ntsteps: number of time steps per hour
+    :param sch_bat_in: charging power of the original schedule for the pricing, default is bat_in
+    :return: dict with the flexibility columns (Sch_P, Neg_P, Pos_P, Neg_E, Pos_E, Neg_Pr, Pos_Pr) as arrays of shape
+             (n_units, n_steps)
+    """
+    grid2bat, bat_in, bat_out, bat_soc = (np.atleast_2d(np.asarray(x, dtype=float))
+                                          for x in (grid2bat, bat_in, bat_out, bat_soc))
+    n_units, nsteps = bat_in.shape
+    price_in = np.broadcast_to(np.asarray(price_in, dtype=float), (n_units, nsteps))
+    sch_bat_in = bat_in if sch_bat_in is None else np.atleast_2d(np.asarray(sch_bat_in, dtype=float))[:, :nsteps]
+    Bat_maxP, Bat_minP, Bat_maxE = (np.broadcast_to(np.asarray(x, dtype=float), (n_units,))[:, None]
+                                    for x in (max_power, min_power, capacity))
+    Bat_minE = 0.500
+
+    sch_P = bat_out - bat_in
+    neg_P, pos_P, neg_E, pos_E, neg_Pr, pos_Pr = (np.zeros((n_units, nsteps)) for i in range(6))
+
+    # Battery negative flexibility
+    nflex_P = Bat_maxP - bat_in + bat_out
+    # the negative flexibility can be offered until the available power drops below the one of the first time step
+    nflex_end = next_smaller(nflex_P)
+    # energy which is charged from every time step to the end of the horizon (usable energy)
+    charged = suffix_sums(bat_in / ntsteps)
+    units, steps = np.nonzero((bat_soc * Bat_maxE / 100 < Bat_maxE) & (nflex_P > 0))
+    req_steps = _req_steps(ntsteps * (Bat_maxE[units, 0] - bat_soc[units, steps] * Bat_maxE[units, 0] / 100) /
+                           nflex_P[units, steps], nflex_P[units, steps], Bat_minP[units, 0], steps, nsteps)
+    units, steps, req_steps = units[req_steps > 0], steps[req_steps > 0], req_steps[req_steps > 0]
+    j = np.minimum(nflex_end[units, steps], req_steps)
+    flex_P = -1 * nflex_P[units, steps]
+
+    # Computing the exact flexibility
+    cbat_E = charged[units, j]
+    neg_Eflex = flex_P * (j - steps) / ntsteps
+    active = np.flatnonzero((cbat_E < abs(neg_Eflex)) & (j >= steps))
+    while len(active) > 0:
+        neg_Eflex[active] = neg_Eflex[active] + abs(flex_P[active] / ntsteps)
+        j[active] = j[active] - 1
+        active = active[(cbat_E[active] < abs(neg_Eflex[active])) & (j[active] >= steps[active])]
+    neg_P[units, steps] = np.where(j > steps, flex_P, 0)
+    neg_E[units, steps] = np.where(j > steps, flex_P * (j - steps) / ntsteps, 0)
+
+    # Pricing: the energy is taken from the most expensive scheduled charging after the flexibility
+    units, steps = np.nonzero(neg_P[:, :nsteps - 1] < 0)
+    first_slot = steps + np.round(neg_E[units, steps] * ntsteps / neg_P[units, steps]).astype(int)
+    # scheduled charging of every unit by descending price
+    charge = sch_bat_in > 0
+    slots = np.lexsort((-price_in, ~charge), axis=1)[:, :charge.sum(axis=1).max(initial=0)]
+    slot_charge = np.take_along_axis(charge, slots, axis=1)
+    slot_price = np.take_along_axis(price_in, slots, axis=1)
+    slot_P = np.take_along_axis(sch_bat_in, slots, axis=1)
+    # the slots of all offers are used one after the other
+    e_bal = abs(neg_E[units, steps])
+    e_prc = np.zeros(len(units))
+    for k in range(slots.shape[1]):
+        p_ch = np.where(slot_charge[units, k] & (slots[units, k] >= first_slot), slot_P[units, k], 0)
+        e_ch = p_ch / ntsteps
+        full = e_bal - e_ch >= 0
+        part = ~full & (e_bal > 0)
+        e_prc[full] = e_prc[full] + slot_price[units[full], k] * p_ch[full] / ntsteps
+        e_bal[full] = e_bal[full] - e_ch[full]
+        e_prc[part] = e_prc[part] + slot_price[units[part], k] * e_bal[part]
+        e_bal[part] = 0
+    neg_Pr[units, steps] = e_prc / neg_E[units, steps]
+    if nsteps > 0:
+        last = neg_P[:, nsteps - 1] < 0
+        neg_Pr[last, nsteps - 1] = -1 * price_in[last, nsteps - 1]
+
+    # PV_Bat_Integration
+    # Battery positive flexibility
+    # Feeding into the grid
+    pflex_P = Bat_maxP - bat_out
+    pflex_end = next_smaller(pflex_P)
+    # rechargable energy after every time step
+    recharge = (Bat_maxP - bat_in) / ntsteps
+    recharge_sums = suffix_sums(recharge)
+    ava_ebatout = bat_soc * Bat_maxE / 100 - Bat_minE
+    units, steps = np.nonzero((ava_ebatout > 0) & (pflex_P > 0))
+    ava_steps = _req_steps(ntsteps * ava_ebatout[units, steps] / pflex_P[units, steps], pflex_P[units, steps],
+                           Bat_minP[units, 0], steps, nsteps)
+    units, steps, ava_steps = units[ava_steps > 0], steps[ava_steps > 0], ava_steps[ava_steps > 0]
+    j = np.minimum(pflex_end[units, steps], ava_steps)
+    flex_P = pflex_P[units, steps]
+
+    # Computing the exact flexibility
+    cbat_E = recharge_sums[units, j]
+    pos_Eflex = flex_P * (j - steps) / ntsteps
+    active = np.flatnonzero((cbat_E < pos_Eflex) & (j >= steps))
+    while len(active) > 0:
+        pos_Eflex[active] = pos_Eflex[active] - flex_P[active] / ntsteps
+        # the energy before the first time step is the one of the last time step (index -1)
+        cbat_E[active] = cbat_E[active] + recharge[units[active], j[active] - 1]
+        j[active] = j[active] - 1
+        active = active[(cbat_E[active] < pos_Eflex[active]) & (j[active] >= steps[active])]
+    pos_P[units, steps] = np.where(j > steps, flex_P, 0)
+    pos_E[units, steps] = np.where(j > steps, flex_P * (j - steps) / ntsteps, 0)
+
+    # Curtailing scheduled charging
+    charge_end = next_smaller(grid2bat)
+    curtail = grid2bat > 0
+    steps = np.broadcast_to(np.arange(nsteps), (n_units, nsteps))
+    pos_P[curtail] = pos_P[curtail] + bat_in[curtail]
+    pos_E[curtail] = pos_E[curtail] + bat_in[curtail] * (charge_end[curtail] - steps[curtail]) / ntsteps
+
+    # Pricing: mean price of the remaining horizon, calculated once per distinct price forecast
+    if nsteps > 0:
+        prices, inverse = np.unique(price_in, axis=0, return_inverse=True)
+        mean_price = np.array([_suffix_mean(price) for price in prices])[inverse.reshape(-1)]
+        pos_Pr[:, :nsteps - 1] = np.where(pos_P[:, :nsteps - 1] > 0, mean_price[:, :nsteps - 1], 0)
+        last = pos_P[:, nsteps - 1] > 0
+        pos_Pr[last, nsteps - 1] = price_in[last, nsteps - 1]
+
+    return dict(zip(FLEX_COLUMNS, (sch_P, neg_P, pos_P, neg_E, pos_E, neg_Pr, pos_Pr)))
+
+
+def _req_steps(steps, flex_P, min_P, i, nsteps):
+    """ last time step (exclusive) until which the flexibility of every offer can be offered, 0 if it can't be offered
+
+    :param steps: number of time steps the flexibility energy lasts with flex_P
+    :param flex_P: flexibility power
+    :param min_P: minimum power of the battery
+    :param i: time step of the flexibility offer
+    :param nsteps: number of time steps
+    :return: array of indices of the time steps
+    """
+    # time steps beyond the horizon are cut before the conversion to integers
+    req_steps = np.floor(np.minimum(steps, nsteps)).astype(int)
+    # flexibilty power can not be offered as less than minimum power
+    return np.where((req_steps == 0) | (flex_P < min_P), 0, np.minimum(req_steps + i, nsteps - 1))
+
+
+def _suffix_mean(values):
+    """ exact mean of the values from every time step to the end of the horizon (same rounding as statistics.mean)
+
+    :param values: array of values
+    :return: array of mean values
+    """
+    mean = np.zeros(len(values))
+    total = Fraction(0)
+    for k in range(len(values) - 1, -1, -1):
+        total += Fraction(values[k])
+        mean[k] = float(total / (len(values) - k))
+    return mean
+
+
+if __name__ == '__main__':
+    # benchmark: time to calculate the battery flexibility against the length of the horizon
+    import time as tm
+
+    for bench_nsteps in [96, 672, 2880]:
+        bench_in = np.where(np.random.rand(bench_nsteps) > 0.6, np.random.rand(bench_nsteps) * 3, 0)
+        bench_out = np.where(bench_in == 0, np.random.rand(bench_nsteps) * 3, 0) * (np.random.rand(bench_nsteps) > 0.5)
+        bench_soc = np.clip(50 + np.cumsum(bench_in - bench_out) / 4 / 5 * 100, 10, 90)
+        bench_ems = {'optplan': {'bat_grid2bat': list(bench_in * (np.random.rand(bench_nsteps) > 0.5)),
+                                 'bat_input_power': list(bench_in),
+                                 'bat_output_power': list(bench_out),
+                                 'bat_SOC': list(bench_soc)},
+                     'fcst': {'ele_price_in': list(np.random.rand(bench_nsteps) * 0.1 + 0.25)},
+                     'time_data': {'ntsteps': 4},
+                     'devices': {'bat': {'maxpow': 3, 'minpow': 0, 'stocap': 5}},
+                     'flexopts': {}}
+        t_start = tm.time()
+        calc_flex_bat(bench_ems, reopt=0)
+        print('{} time steps: battery flexibility calculated in {:.3f} s'.format(bench_nsteps, tm.time() - t_start))
+
+    # batch of many units with 96 time steps
+    for bench_units in [10, 100, 1000]:
+        bench_in = np.where(np.random.rand(bench_units, 96) > 0.6, np.random.rand(bench_units, 96) * 3, 0)
+        bench_out = np.where(bench_in == 0, np.random.rand(bench_units, 96) * 3, 0) * \
+            (np.random.rand(bench_units, 96) > 0.5)
+        bench_soc = np.clip(50 + np.cumsum(bench_in - bench_out, axis=1) / 4 / 5 * 100, 10, 90)
+        t_start = tm.time()
+        calc_flex_bat_batch(bench_in * (np.random.rand(bench_units, 96) > 0.5), bench_in, bench_out, bench_soc,
+                            np.random.rand(96) * 0.1 + 0.25, 3, 0, 5, 4)
+        print('{} units: battery flexibility calculated in {:.3f} s'.format(bench_units, tm.time() - t_start))
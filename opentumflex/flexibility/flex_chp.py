@@ -13,10 +13,12 @@ __status__ = "Development"
 
 import pandas as pd
 import numpy as np
-import heapq
 
 
 from opentumflex.configuration.init_ems import init_ems_js as ems_loc
+from opentumflex.flexibility.flex_duration import dur_max_operation, dur_max_regeneration, dur_max_storage
+from opentumflex.flexibility.flex_pricing import sum_k_smallest, sum_k_largest
+from opentumflex.flexibility.flex_table import FlexTable
 
 
 def calc_flex_chp(ems, reopt=False):  # datafram open and break it down
@@ -47,40 +49,16 @@ def calc_flex_chp(ems, reopt=False):  # datafram open and break it down
     # get the max duration of flexibility for every time step
 
     # max duration from the optimal operation
-    dur_max_opt = np.zeros(timesteps)
-
-    for i in range(timesteps):
-        if chp_operation[i] > 0:
-            dur_max_opt[i] = next((x for x, val in enumerate(chp_operation[i:]) if val == 0), timesteps - i) + i - 1
-        else:
-            dur_max_opt[i] = next((x for x, val in enumerate(chp_operation[i:]) if val > 0), timesteps - i) + i - 1
+    dur_max_opt = dur_max_operation(chp_operation)
 
     # max duration from available regeneration time
+    dur_max_reg = dur_max_regeneration(chp_operation)
 
-    dur_max_reg = np.zeros(timesteps)
-    for i in range(timesteps):
-        if chp_operation[i] > 0:
-            # dur_max_reg[i] = i + sum(1-chp_operation[i:]) - 1
-            dur_max_reg[i] = min(i + sum(1 - chp_operation[i:]) - 1, timesteps)
-        else:
-            # dur_max_reg[i] = i + sum(chp_operation[i:]) - 1
-            dur_max_reg[i] = min(i + sum(chp_operation[i:]) - 1, timesteps)
     # max duration from storage capacity
-    dur_max_sto = np.zeros(timesteps)
-
     # on/off states to soc change
 
     soc_change = chp_heat_ifrun * pow2energy / hs_cap * (0.5 - chp_operation) * 2 * 100
-    for i in range(timesteps):
-        soc = soc_heat[i]
-        idx = i
-        while 0 < soc < 100:
-            idx += 1
-            if idx > timesteps:
-                break
-            soc += soc_change[idx - 1]
-
-        dur_max_sto[i] = idx - 2
+    dur_max_sto = dur_max_storage(soc_heat, soc_change, 0)
 
     dur_max = list(map(int, map(min, zip(dur_max_opt, dur_max_reg, dur_max_sto))))
 
@@ -112,25 +90,16 @@ def calc_flex_chp(ems, reopt=False):  # datafram open and break it down
     # cost_elec_input = opentumflex['optplan']['elec_supply_price']
     cost_diff_pos = np.zeros(timesteps)
     cost_diff_neg = np.zeros(timesteps)
-    for i in range(timesteps):
-        count_flex_ts = dur_max[i] - i + 1
-        if chp_operation[i] > 0:
-            cost_modified = list(map(float, cost_elec_input[dur_max[i] + 1:])) + chp_operation[dur_max[i] + 1:] * (-100)
-            # cost_elec_modified = list(map(float, cost_elec_input[dur_max[i] + 1:])) + \
-            #                     (1 - chp_operation[dur_max[i] + 1:]) * 0.1
-            # cost_orig = sum(cost_gas_input[i:dur_max[i] + 1])
-            #                 + sum(heapq.nsmallest(count_flex_ts, cost_elec_modified))
-            # cost_new = sum(heapq.nsmallest(count_flex_ts, cost_modified)) + sum(cost_elec_input[i:dur_max[i] + 1])
-            cost_new = sum(heapq.nlargest(count_flex_ts, cost_modified))
-            cost_diff_neg[i] = (-cost_new / count_flex_ts) * 0.85 * (1-idx_no_flex[i])
-        else:
-            cost_modified = (-chp_operation[dur_max[i] + 1:] + 1) * 100 + \
-                            list(map(float, cost_elec_input[dur_max[i] + 1:]))
-            # cost_elec_modified = list(map(float, cost_elec_input[dur_max[i] + 1:]))
-            # cost_orig = sum(heapq.nsmallest(count_flex_ts, cost_modified)) + sum(cost_elec_input[i:dur_max[i] + 1])
-            # cost_new = sum(cost_gas_input[i:dur_max[i] + 1]) + sum(heapq.nlargest(count_flex_ts, cost_elec_modified))
-            cost_new = sum(heapq.nsmallest(count_flex_ts, cost_modified))
-            cost_diff_pos[i] = (cost_new / count_flex_ts) * 1.15 * (1-idx_no_flex[i])
+    operation = np.asarray(chp_operation, dtype=float)
+    price = np.asarray(cost_elec_input)
+    count_flex_ts = np.asarray(dur_max) - np.arange(timesteps) + 1
+    run = operation > 0
+    # switching off: the operation is shifted to the most expensive time steps after the flexibility without operation
+    cost_new, _ = sum_k_largest(price + operation * (-100), np.asarray(dur_max)[run] + 1, count_flex_ts[run])
+    cost_diff_neg[run] = (-cost_new / count_flex_ts[run]) * 0.85 * (1 - idx_no_flex[run])
+    # switching on: the operation is taken from the cheapest time steps after the flexibility
+    cost_new, _ = sum_k_smallest((-operation + 1) * 100 + price, np.asarray(dur_max)[~run] + 1, count_flex_ts[~run])
+    cost_diff_pos[~run] = (cost_new / count_flex_ts[~run]) * 1.15 * (1 - idx_no_flex[~run])
 
     # write the results in data
 
@@ -144,7 +113,7 @@ def calc_flex_chp(ems, reopt=False):  # datafram open and break it down
             'Neg_Pr': cost_diff_neg,
             'Pos_Pr': cost_diff_pos
             }
-    flexopts = pd.DataFrame(data)
+    flexopts = FlexTable(data)
     ems['flexopts']['chp'] = flexopts
 
     return ems
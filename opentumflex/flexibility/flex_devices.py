@@ -0,0 +1,67 @@
+"""
+The "flex_devices.py" calculates the flexibility of all devices of one or more opentumflex objects, sequentially or
+concurrently in a thread or process pool
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+_EXECUTORS = {'thread': ThreadPoolExecutor,
+              'process': ProcessPoolExecutor}
+
+
+def calc_flex_devices(ems_list, calc_flex, executor=None, max_workers=None):
+    """ calculate the flexibility of the given devices for every opentumflex object and store it in its flexopts
+
+    The device calculators only read the optimization results, so all (object, device) pairs are independent tasks.
+
+    :param ems_list: list of opentumflex dictionaries with optimization results
+    :param calc_flex: dict of flexibility functions and their device names
+    :param executor: None to calculate sequentially, 'thread' or 'process' to calculate concurrently in a pool
+    :param max_workers: maximum number of workers of the pool, default of concurrent.futures if None
+    :return: list with a dict of the calculation time of every device in seconds for every opentumflex object
+    """
+    tasks = [(k, function, device_name) for k in range(len(ems_list)) for function, device_name in calc_flex.items()]
+
+    if executor is None:
+        results = [_calc_device_flex(function, ems_list[k], device_name) for k, function, device_name in tasks]
+    elif executor in _EXECUTORS:
+        with _EXECUTORS[executor](max_workers=max_workers) as pool:
+            futures = [pool.submit(_calc_device_flex, function, ems_list[k], device_name)
+                       for k, function, device_name in tasks]
+            results = [future.result() for future in futures]
+    else:
+        raise ValueError('unknown executor {}, use None, {}'.format(executor, ', '.join(map(repr, _EXECUTORS))))
+
+    # merge the flexibility offers into the opentumflex objects
+    timings = [{} for _ in ems_list]
+    for (k, function, device_name), (flexopts, duration) in zip(tasks, results):
+        ems_list[k]['flexopts'][device_name] = flexopts
+        timings[k][device_name] = duration
+
+    return timings
+
+
+def _calc_device_flex(function, ems, device_name):
+    """ calculate the flexibility of one device on a shallow copy of the opentumflex object
+
+    :param function: flexibility function of the device
+    :param ems: opentumflex dictionary with optimization results
+    :param device_name: name of the device
+    :return: flexibility offers of the device and calculation time in seconds
+    """
+    t_start = time.time()
+    ems_device = dict(ems)
+    ems_device['flexopts'] = {}
+    function(ems_device, reopt=False)
+
+    return ems_device['flexopts'][device_name], time.time() - t_start
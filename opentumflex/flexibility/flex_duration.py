@@ -0,0 +1,134 @@
+"""
+The "flex_duration.py" calculates for every time step how long a flexibility can be offered, e.g. how long the
+operation of a device with heat storage (heat pump, CHP) can be shifted, for all time steps at once
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import numpy as np
+
+
+def dur_max_operation(operation):
+    """ last time step of the current on/off period of the optimal operation for every time step (run-length)
+
+    :param operation: optimal on/off operation of the device
+    :return: array with the index of the last time step of the period
+    """
+    operation = np.asarray(operation, dtype=float)
+    # end of the period: first following time step being off (if on) or on (if off)
+    next_off = _next_index(operation == 0)
+    next_on = _next_index(operation > 0)
+
+    return np.where(operation > 0, next_off, next_on) - 1
+
+
+def dur_max_regeneration(operation):
+    """ last time step of the flexibility for every time step limited by the remaining time steps for regeneration, i.e.
+    the off time steps after a running time step and vice versa
+
+    :param operation: optimal on/off operation of the device
+    :return: array with the index of the last time step
+    """
+    operation = np.asarray(operation, dtype=float)
+    timesteps = len(operation)
+    steps = np.arange(timesteps)
+    # sums from every time step to the end of the horizon, the operation of a solver is not exactly 0 or 1
+    sum_on = suffix_sums(operation)
+    sum_off = suffix_sums(1 - operation)
+
+    return np.minimum(steps + np.where(operation > 0, sum_off, sum_on) - 1, timesteps)
+
+
+def dur_max_storage(soc, soc_change, soc_min):
+    """ last time step of the flexibility for every time step limited by the heat storage: the state of charge,
+    starting at the scheduled one, changes by soc_change per time step until it leaves the range (soc_min, 100)
+
+    The states of charge of all time steps are changed at once, one time step after the other, and every time step
+    whose state of charge has left the range drops out. The changes are added in the order of a loop over the time
+    steps, so a state of charge which reaches a bound is rounded the same way.
+
+    :param soc: scheduled state of charge of the heat storage
+    :param soc_change: change of the state of charge per time step in case of flexibility
+    :param soc_min: minimum state of charge
+    :return: array with the index of the last time step
+    """
+    soc = np.array(soc, dtype=float)
+    soc_change = np.asarray(soc_change, dtype=float)
+    timesteps = len(soc)
+    # first time step after the one leaving the range, timesteps + 1 if the state of charge never leaves it
+    pos = np.arange(timesteps)
+    inside = np.flatnonzero((soc_min < soc) & (soc < 100))
+    while len(inside) > 0:
+        pos[inside] += 1
+        inside = inside[pos[inside] <= timesteps]
+        soc[inside] = soc[inside] + soc_change[pos[inside] - 1]
+        inside = inside[(soc_min < soc[inside]) & (soc[inside] < 100)]
+
+    return pos - 2
+
+
+def suffix_sums(values):
+    """ sum of the values from every time step to the end of the horizon (along the last axis)
+
+    The values are added from the time step onwards like in a loop over the remaining horizon, so every sum is rounded
+    like the sum of the loop. A reversed cumulative sum adds them from the end and can differ in the last bit, which
+    changes durations and energies compared with a bound. All sums are built at once in one pass per time step.
+
+    :param values: array of values, e.g. of shape (n_steps,) or (n_units, n_steps)
+    :return: array of sums of the same shape
+    """
+    values = np.asarray(values, dtype=float)
+    timesteps = values.shape[-1]
+    sums = np.zeros(values.shape)
+    for k in range(timesteps):
+        sums[..., :timesteps - k] += values[..., k:]
+    return sums
+
+
+def next_smaller(values):
+    """ index of the next time step with a smaller value (next smaller element) for every time step (along the last
+    axis)
+
+    The minima of all windows of 2^l time steps are tabulated, then every time step skips the windows following it
+    which hold no smaller value, from the longest to the shortest (binary lifting). The values are only compared, so
+    the indices are exact, in O(n log n) operations on whole arrays.
+
+    :param values: array of values, e.g. of shape (n_steps,) or (n_units, n_steps)
+    :return: array of indices of the same shape, n_steps if no smaller value follows
+    """
+    values = np.asarray(values, dtype=float)
+    timesteps = values.shape[-1]
+    levels = max(timesteps.bit_length(), 1)
+    # minima of the windows [k, k + 2^l) for every level l, beyond the end of the horizon padded with infinity
+    minima = [np.full(values.shape[:-1] + (timesteps + (1 << levels),), np.inf)]
+    minima[0][..., :timesteps] = values
+    for level in range(1, levels):
+        half = 1 << (level - 1)
+        window_min = minima[-1].copy()
+        np.minimum(minima[-1][..., :-half], minima[-1][..., half:], out=window_min[..., :-half])
+        minima.append(window_min)
+
+    # skip every window without a smaller value
+    next_idx = np.broadcast_to(np.arange(1, timesteps + 1), values.shape).copy()
+    for level in range(levels - 1, -1, -1):
+        skip = np.take_along_axis(minima[level], next_idx, axis=-1) >= values
+        next_idx[skip] += 1 << level
+    return np.minimum(next_idx, timesteps)
+
+
+def _next_index(condition):
+    """ first index k >= i with condition[k] for every i
+
+    :param condition: array of booleans
+    :return: array of indices, len(condition) if the condition doesn't occur anymore
+    """
+    positions = np.append(np.flatnonzero(condition), len(condition))
+
+    return positions[np.searchsorted(positions, np.arange(len(condition)))]
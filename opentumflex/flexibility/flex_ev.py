@@ -12,7 +12,16 @@ __email__ = "michel.zade@tum.de"
 __status__ = "Development"
 
 import pandas as pd
-import math
+import numpy as np
+
+from opentumflex.flexibility.flex_duration import next_smaller
+from opentumflex.flexibility.flex_pricing import mean_k_smallest, mean_k_largest
+from opentumflex.flexibility.flex_table import FlexTable
+
+# Columns of the ev flexibility, in the order of the arrays returned by calc_flex_ev_periods
+EV_FLEX_COLUMNS = ('Pos_P', 'Neg_P', 'Pos_E', 'Neg_E', 'Pos_Pr', 'Neg_Pr', 'Fcst_Pr', 'Sch_P')
+# Maximum number of values of the windows of modulated negative offers calculated at once
+MAX_WINDOW_VALUES = 1 << 20
 
 
 def calc_flex_ev(my_ems, reopt=0):
@@ -34,169 +43,242 @@ def calc_flex_ev(my_ems, reopt=0):
     # Risk Margin comes in from user preferences
     risk_margin = 0.3
 
-    # Column names
-    p_opt = 'Sch_P'
-    p_pos = 'Pos_P'
-    p_neg = 'Neg_P'
-    e_pos = 'Pos_E'
-    e_neg = 'Neg_E'
-    e_remain = 'Remain_E'
-    pr_pos = 'Pos_Pr'
-    pr_neg = 'Neg_Pr'
-    pr_fcst = 'Fcst_Pr'
-
-    # Flexibility Table for entire time period #############################################
-    ev_flex = pd.DataFrame(0, columns={p_pos, p_neg, e_pos, e_neg, pr_pos, pr_neg, pr_fcst, p_opt},
-                           index=my_ems['time_data']['time_slots'])
-    # Fixing column order
-    ev_flex = ev_flex[[p_pos, p_neg, e_pos, e_neg, pr_pos, pr_neg, pr_fcst, p_opt]]
-
-    ev_flex[p_opt] = my_ems['optplan']['EV_power']
-    ev_flex[pr_fcst] = my_ems['fcst']['ele_price_in']
-
     # Check number of periods ev is available
     n_avail_periods = len(my_ems['devices']['ev']['initSOC'])
 
-    # Go through all availability periods and calculate flexibility
+    # Number the availability periods on the time steps
+    time_slots = pd.Index(my_ems['time_data']['time_slots'])
+    avail = np.zeros(len(time_slots), dtype=int)
     for j in range(n_avail_periods):
-        ev_flex_temp = pd.DataFrame(0.0, columns={p_pos, p_neg, e_pos, e_neg, pr_pos, pr_neg, pr_fcst, p_opt, e_remain},
-                                    index=pd.date_range(start=my_ems['devices']['ev']['aval_init'][j],
-                                                        end=my_ems['devices']['ev']['aval_end'][j],
-                                                        freq=str(my_ems['time_data']['t_inval'])+'Min'))
-
-        # Fixing column order
-        ev_flex_temp = ev_flex_temp[[p_pos, p_neg, e_pos, e_neg, pr_pos, pr_neg, pr_fcst, p_opt, e_remain]]
-
-        # Copy optimal power to flex table
-        ev_flex_temp[p_opt] = ev_flex[p_opt][my_ems['devices']['ev']['aval_init'][j]:my_ems['devices']['ev']['aval_end'][j]]
-        ev_flex_temp[pr_fcst] = ev_flex[pr_fcst][my_ems['devices']['ev']['aval_init'][j]:my_ems['devices']['ev']['aval_end'][j]]
-
-        # Calculate remaining energy that needs to be charged in kWh ####
-        remaining_energy = list((ev_flex_temp[p_opt] / n_time_steps_phour).sum() -
-                                (ev_flex_temp[p_opt] / n_time_steps_phour).cumsum())
-        remaining_energy.insert(0, (ev_flex_temp[p_opt] / n_time_steps_phour).sum())
-        remaining_energy = remaining_energy[:-1]
-        ev_flex_temp[e_remain] = remaining_energy
-
-        # Calculation flexible power ######################
-        ev_flex_temp[p_pos] = ev_flex_temp[p_opt]
-        ev_flex_temp[p_neg] = my_ems['devices']['ev']['maxpow'] - ev_flex_temp[p_opt]
-        # Reset flex power if power or energy is smaller or equal to zero
-        ev_flex_temp.loc[ev_flex_temp[e_remain] <= 0, p_neg] = 0
-        ev_flex_temp.loc[ev_flex_temp[p_pos] <= 0, p_pos] = 0
-        ev_flex_temp.loc[ev_flex_temp[p_neg] <= 0, p_neg] = 0
-
-        # Calculation of flex energy ###################
-        for i in range(len(ev_flex_temp)):
-            # Calculate how many hours flexible power is available
-            t_neg_flex_avail = ((ev_flex_temp[p_neg].iloc[i:] < ev_flex_temp[p_neg].iat[i]).idxmax()
-                                - ev_flex_temp.index[i]) / pd.Timedelta('1 hour')
-            t_pos_flex_avail = ((ev_flex_temp[p_pos].iloc[i:] < ev_flex_temp[p_pos].iat[i]).idxmax()
-                                - ev_flex_temp.index[i]) / pd.Timedelta('1 hour')
-            # Calculate flexible energy
-            ev_flex_temp[e_neg][i] = ev_flex_temp[p_neg].iat[i] * t_neg_flex_avail
-            ev_flex_temp[e_pos][i] = ev_flex_temp[p_pos].iat[i] * t_pos_flex_avail
-
-        # Round entire df to three decimals
-        ev_flex_temp = round(ev_flex_temp, 3)
-
-        # Check whether offered flex energy can be caught up later #######################
-        for i in range(len(ev_flex_temp)):
-            # Positive flex offers
-            if ev_flex_temp[p_pos].iat[i] > 0:
-                # Calculate last index of positive flex offer
-                idx_remaining = len(ev_flex_temp) - round(i + n_time_steps_phour * ev_flex_temp[e_pos].iat[i] /
-                                                          ev_flex_temp[p_pos].iat[i])
-                idx_required = math.ceil(ev_flex_temp[e_pos].iat[i] /
-                                         (my_ems['devices']['ev']['maxpow'] / n_time_steps_phour))
-                if idx_remaining < idx_required:
-                    e_max = idx_remaining / n_time_steps_phour * my_ems['devices']['ev']['maxpow']
-                    ev_flex_temp[e_pos].iat[i] = math.floor(e_max / ev_flex_temp[p_pos].iat[i] * n_time_steps_phour) * \
-                                                 ev_flex_temp[p_pos].iat[i] / n_time_steps_phour
-
-            # Negative flex offers
-            if ev_flex_temp[p_neg].iat[i] > 0:
-                # Calculate for how many time steps negative flex can be offered
-                # check whether power is not available anymore
-                if (ev_flex_temp[p_neg].iloc[i:] < ev_flex_temp[p_neg].iloc[i]).any():
-                    idx_p_neg_max = int(((ev_flex_temp[p_neg].iloc[i:] < ev_flex_temp[p_neg].iloc[i]).idxmax() -
-                                         ev_flex_temp.index[i]).total_seconds() / 3600 * n_time_steps_phour)
-                # power is available for entire time period
-                else:
-                    idx_p_neg_max = len(ev_flex_temp[p_neg].iloc[i:])
-                # Offers with maximum negative power
-                if ev_flex_temp[p_neg].iat[i] == my_ems['devices']['ev']['maxpow']:
-                    if ev_flex_temp[e_neg].iat[i] > ev_flex_temp[e_remain].iat[i]:
-                        ev_flex_temp[e_neg].iat[i] = ev_flex_temp[e_remain].iat[i]
-                        if ev_flex_temp[e_neg].iat[i] == 0:
-                            ev_flex_temp[p_neg].iat[i] = 0
-                        else:
-                            ev_flex_temp[p_neg].iat[i] = ev_flex_temp[e_neg].iat[i] * n_time_steps_phour / \
-                                                         math.ceil(ev_flex_temp[e_neg].iat[i] /
-                                                                   my_ems['devices']['ev']['maxpow'] *
-                                                                   n_time_steps_phour)
-                    if ev_flex_temp[e_neg].iat[i] <= 0:
-                        ev_flex_temp[p_neg].iat[i] = 0
-                # Offers with modulated power
-                elif ev_flex_temp[p_neg].iat[i] < my_ems['devices']['ev']['maxpow']:
-                    # Calculate the cumulated sum of flex and optimal charging schedule
-                    temp_flex_df = pd.DataFrame(0, columns={'E_opt', 'E_flex', 'E_opt_cumsum',
-                                                            'E_flex_cumsum', 'E_flex_opt_cumsum'},
-                                                 index=ev_flex_temp.index[i:i + idx_p_neg_max])
-                    temp_flex_df['E_opt'] = (ev_flex_temp[p_opt].iloc[i:i+idx_p_neg_max] / n_time_steps_phour)
-                    temp_flex_df['E_flex'] = (ev_flex_temp[p_neg].iat[i] / n_time_steps_phour)
-                    temp_flex_df['E_opt_cumsum'] = temp_flex_df['E_opt'].cumsum()
-                    temp_flex_df['E_flex_cumsum'] = temp_flex_df['E_flex'].cumsum()
-                    temp_flex_df['E_flex_opt_cumsum'] = (temp_flex_df['E_opt'] + temp_flex_df['E_flex']).cumsum()
-                    # Check whether maximal possible energy is more than remaining energy
-                    if max(temp_flex_df['E_flex_opt_cumsum']) < ev_flex_temp[e_remain].iat[i]:
-                        pass
-                    else:
-                        # Find number of time steps until remaining energy has been charged
-                        idx_allowed = int((temp_flex_df['E_flex_opt_cumsum'][temp_flex_df['E_flex_opt_cumsum'] >
-                                                                             ev_flex_temp[e_remain].iat[i]].index[0] -
-                                           ev_flex_temp.index[i]).total_seconds() / 3600 * n_time_steps_phour)
-                        # Calculate maximal available time steps negative flex can be offered
-                        # if number of available time steps is lower do not change offered energy
-                        if idx_p_neg_max <= idx_allowed:
-                            pass
-                        else:
-                            # Flexible energy is the sum of energy for maximal power
-                            ev_flex_temp[e_neg].iat[i] = temp_flex_df['E_flex'][:idx_allowed].sum()
-
-        # Reset negative power if energy has been reset as well
-        ev_flex_temp.loc[ev_flex_temp[e_neg] <= 0, p_neg] = 0
-
-        # # Calculating Flex Prices ###########################################################################
-        for i in range(len(ev_flex_temp)):
-
-            # Positive flexibility
-            if ev_flex_temp[e_pos].iat[i] > 0 and ev_flex_temp[p_pos].iat[i] > 0:
-                idx_required = math.ceil(ev_flex_temp[e_pos].iat[i] / my_ems['devices']['ev']['maxpow']
-                                         * n_time_steps_phour)
-                idx_flex = math.ceil(ev_flex_temp[e_pos].iat[i] / ev_flex_temp[p_pos].iat[i]
-                                     * n_time_steps_phour)
-                ev_flex_temp[pr_pos].iat[i] = ev_flex_temp[pr_fcst][i + idx_flex - 1:].nsmallest(idx_required).mean()\
-                                                     * (1 + risk_margin)
-            # Negative flexibility
-            if ev_flex_temp[e_neg].iat[i] > 0 and ev_flex_temp[p_neg].iat[i] > 0:
-                idx_flex = math.ceil(ev_flex_temp[e_neg].iat[i] / 
-                                     ev_flex_temp[p_neg].iat[i] * n_time_steps_phour)
-                ev_flex_temp[pr_neg].iat[i] = ev_flex_temp[pr_fcst][i + idx_flex - 1:].nlargest(idx_flex).mean()\
-                                              * (risk_margin - 1)
-
-        # Clean-up ##########################################
-        # Drop unnecessary columns
-        ev_flex_temp = ev_flex_temp.drop(columns={e_remain})
-
-        # Copy temporary data frame to overall dataframe
-        ev_flex[my_ems['devices']['ev']['aval_init'][j]:my_ems['devices']['ev']['aval_end'][j]] = ev_flex_temp
+        avail[time_slots.slice_indexer(my_ems['devices']['ev']['aval_init'][j],
+                                       my_ems['devices']['ev']['aval_end'][j])] = j + 1
 
-    #print('EV Flex Calculation completed!')
-    ev_flex[p_opt] = -ev_flex[p_opt]
-    ev_flex[p_neg] = -ev_flex[p_neg]
-    ev_flex[e_neg] = -ev_flex[e_neg]
+    # Calculate the flexibility of all availability periods at once
+    ev_flex = calc_flex_ev_batch([my_ems['optplan']['EV_power']], [my_ems['fcst']['ele_price_in']],
+                                 my_ems['devices']['ev']['maxpow'], [avail], n_time_steps_phour, temp_res, risk_margin)
 
-    my_ems['flexopts']['ev'] = ev_flex
+    #print('EV Flex Calculation completed!')
+    my_ems['flexopts']['ev'] = FlexTable({col: ev_flex[col][0] for col in EV_FLEX_COLUMNS},
+                                         index=my_ems['time_data']['time_slots'])
 
     return my_ems
+
+
+def calc_flex_ev_batch(power, price, max_power, avail, n_time_steps_phour=4, temp_res=15, risk_margin=0.3):
+    """
+    Calculates the flexibility of many electric vehicles in one call on stacked schedules. The availability periods of
+    all units are stacked in the rows of one array and calculated at once by calc_flex_ev_periods.
+
+    :param power:               optimal charging power in kW, array of shape (n_units, n_steps)
+    :param price:               electricity price forecast, array of shape (n_units, n_steps) or (n_steps,) for all units
+    :param max_power:           maximum charging power of every unit in kW (scalar for all units)
+    :param avail:               availability of shape (n_units, n_steps), every contiguous run of equal non-zero values
+                                is one availability period (including the time step of the departure), i.e. a boolean
+                                array or period numbers to separate adjacent periods
+    :param n_time_steps_phour:  number of time steps per hour
+    :param temp_res:            temporal resolution in minutes
+    :param risk_margin:         risk margin of the flexibility prices
+
+    :return:                    dict with the flexibility columns (Pos_P, Neg_P, Pos_E, Neg_E, Pos_Pr, Neg_Pr, Fcst_Pr,
+                                Sch_P) as arrays of shape (n_units, n_steps), with the same signs as calc_flex_ev
+    """
+    power = np.atleast_2d(np.asarray(power, dtype=float))
+    n_units, n_steps = power.shape
+    price = np.broadcast_to(np.asarray(price, dtype=float), (n_units, n_steps))
+    max_power = np.broadcast_to(np.asarray(max_power, dtype=float), (n_units,))
+    avail = np.broadcast_to(np.asarray(avail, dtype=int), (n_units, n_steps))
+
+    ev_flex = {col: np.zeros((n_units, n_steps)) for col in EV_FLEX_COLUMNS}
+    ev_flex['Fcst_Pr'][:] = price
+    ev_flex['Sch_P'][:] = power
+
+    # Availability periods of all units as (unit, first time step, last time step + 1)
+    padded = np.pad(avail, ((0, 0), (1, 1)))
+    units, starts = np.nonzero((padded[:, 1:-1] != 0) & (padded[:, 1:-1] != padded[:, :-2]))
+    ends = np.nonzero((padded[:, 1:-1] != 0) & (padded[:, 1:-1] != padded[:, 2:]))[1] + 1
+    if len(units) > 0:
+        # Time steps of the periods in rows of the length of the longest period
+        steps = starts[:, None] + np.arange((ends - starts).max())
+        in_period = steps < ends[:, None]
+        steps = np.minimum(steps, n_steps - 1)
+        rows = np.broadcast_to(units[:, None], steps.shape)
+        period_flex = calc_flex_ev_periods(np.where(in_period, power[rows, steps], 0),
+                                           np.where(in_period, price[rows, steps], 0), max_power[units],
+                                           ends - starts, n_time_steps_phour, temp_res, risk_margin)
+        # Copy period flexibility to overall flex arrays
+        for col, values in zip(EV_FLEX_COLUMNS, period_flex):
+            ev_flex[col][rows[in_period], steps[in_period]] = values[in_period]
+
+    ev_flex['Sch_P'] = -ev_flex['Sch_P']
+    ev_flex['Neg_P'] = -ev_flex['Neg_P']
+    ev_flex['Neg_E'] = -ev_flex['Neg_E']
+
+    return ev_flex
+
+
+def calc_flex_ev_periods(power, price, max_power, lengths, n_time_steps_phour, temp_res, risk_margin):
+    """
+    Calculates the flexibility of many availability periods at once. Every period is one row of the arrays, the time
+    steps after its length are ignored.
+
+    :param power:               optimal charging power in kW, array of shape (n_periods, n_steps)
+    :param price:               electricity price forecast, array of shape (n_periods, n_steps)
+    :param max_power:           maximum charging power of every period in kW
+    :param lengths:             number of time steps of every period
+    :param n_time_steps_phour:  number of time steps per hour
+    :param temp_res:            temporal resolution in minutes
+    :param risk_margin:         risk margin of the flexibility prices
+
+    :return:                    arrays of positive/negative flexible power, positive/negative flexible energy,
+                                positive/negative flexibility prices, price forecast and optimal power (rounded) of shape
+                                (n_periods, n_steps)
+    """
+    lengths = np.asarray(lengths, dtype=int)[:, None]
+    idx = np.arange(np.shape(power)[1])
+    in_period = idx < lengths
+    p_opt = np.where(in_period, np.asarray(power, dtype=float), 0)
+    pr_fcst = np.where(in_period, np.asarray(price, dtype=float), 0)
+    max_power = np.broadcast_to(np.asarray(max_power, dtype=float)[:, None], p_opt.shape)
+
+    # Calculate remaining energy that needs to be charged in kWh ####
+    e_opt = p_opt / n_time_steps_phour
+    e_opt_cumsum = np.cumsum(e_opt, axis=1)
+    # sum of every period over its length, i.e. rounded like the sum of the period alone
+    e_sum = np.zeros(lengths.shape)
+    for length in np.unique(lengths):
+        same = lengths[:, 0] == length
+        e_sum[same, 0] = e_opt[same, :length].sum(axis=1)
+    e_remain = np.concatenate((e_sum, (e_sum - e_opt_cumsum)[:, :-1]), axis=1)
+
+    # Calculation flexible power ######################
+    p_pos = p_opt.copy()
+    p_neg = max_power - p_opt
+    # Reset flex power if power or energy is smaller or equal to zero (and after the period)
+    p_neg[(e_remain <= 0) | ~in_period] = 0
+    p_pos[p_pos <= 0] = 0
+    p_neg[p_neg <= 0] = 0
+
+    # Calculation of flex energy ###################
+    # Flexible power is available until it drops below the one of the first time step (0 if it never drops)
+    next_neg = _next_smaller_in_period(p_neg, in_period)
+    next_pos = _next_smaller_in_period(p_pos, in_period)
+    t_neg_flex_avail = np.where(next_neg < lengths, next_neg - idx, 0) * temp_res / 60
+    t_pos_flex_avail = np.where(next_pos < lengths, next_pos - idx, 0) * temp_res / 60
+    e_neg = p_neg * t_neg_flex_avail
+    e_pos = p_pos * t_pos_flex_avail
+
+    # Round entire period to three decimals
+    p_pos, p_neg, e_pos, e_neg, pr_fcst, p_opt, e_remain = \
+        (np.round(col, 3) for col in (p_pos, p_neg, e_pos, e_neg, pr_fcst, p_opt, e_remain))
+
+    # Check whether offered flex energy can be caught up later #######################
+    # Positive flex offers
+    offer = p_pos > 0
+    rows, steps = np.nonzero(offer)
+    # Calculate last index of positive flex offer
+    idx_remaining = lengths[rows, 0] - np.round(steps + n_time_steps_phour * e_pos[offer] / p_pos[offer])
+    idx_required = np.ceil(e_pos[offer] / (max_power[offer] / n_time_steps_phour))
+    e_max = idx_remaining / n_time_steps_phour * max_power[offer]
+    e_pos[offer] = np.where(idx_remaining < idx_required,
+                            np.floor(e_max / p_pos[offer] * n_time_steps_phour) * p_pos[offer] / n_time_steps_phour,
+                            e_pos[offer])
+
+    # Negative flex offers
+    offer = p_neg > 0
+    # Calculate for how many time steps negative flex can be offered
+    next_neg = _next_smaller_in_period(p_neg, in_period)
+    idx_p_neg_max = np.where(next_neg < lengths,
+                             ((next_neg - idx) * temp_res * 60 / 3600 * n_time_steps_phour).astype(int),
+                             lengths - idx)
+    # Offers with maximum negative power and with modulated power, by the power before the maximum ones are reduced
+    max_offer = offer & (p_neg == max_power)
+    mod_rows, mod_steps = np.nonzero(offer & (p_neg < max_power) & (idx_p_neg_max > 0))
+    reduce = max_offer & (e_neg > e_remain)
+    e_neg[reduce] = e_remain[reduce]
+    p_neg[reduce & (e_neg == 0)] = 0
+    reduce = reduce & (e_neg != 0)
+    p_neg[reduce] = e_neg[reduce] * n_time_steps_phour / np.ceil(e_neg[reduce] / max_power[reduce] * n_time_steps_phour)
+    p_neg[max_offer & (e_neg <= 0)] = 0
+    # Offers with modulated power: flexible energy is limited by the time steps until the remaining energy has been
+    # charged with the cumulated sum of flex and optimal charging schedule
+    e_flex = p_neg[mod_rows, mod_steps] / n_time_steps_phour
+    idx_mod_max = idx_p_neg_max[mod_rows, mod_steps]
+    found = np.zeros(len(mod_rows), dtype=bool)
+    idx_allowed = np.zeros(len(mod_rows), dtype=int)
+    # in chunks of offers to limit the size of the windows
+    chunk_size = max(MAX_WINDOW_VALUES // max(idx_mod_max.max(initial=1), 1), 1)
+    for first in range(0, len(mod_rows), chunk_size):
+        chunk = slice(first, first + chunk_size)
+        window = np.arange(idx_mod_max[chunk].max())
+        in_window = window < idx_mod_max[chunk, None]
+        window_steps = np.minimum(mod_steps[chunk, None] + window, lengths[mod_rows[chunk]] - 1)
+        e_flex_opt_cumsum = np.cumsum(np.where(in_window, p_opt[mod_rows[chunk, None], window_steps] /
+                                               n_time_steps_phour + e_flex[chunk, None], 0), axis=1)
+        charged = in_window & (e_flex_opt_cumsum > e_remain[mod_rows[chunk], mod_steps[chunk], None])
+        found[chunk] = charged.any(axis=1)
+        # Find number of time steps until remaining energy has been charged
+        idx_allowed[chunk] = (np.argmax(charged, axis=1) * temp_res * 60 / 3600 * n_time_steps_phour).astype(int)
+    # if number of available time steps is lower do not change offered energy
+    reduce = found & (idx_mod_max > idx_allowed)
+    for n_allowed in np.unique(idx_allowed[reduce]):
+        # Flexible energy is the sum of energy for maximal power
+        k = np.flatnonzero(reduce & (idx_allowed == n_allowed))
+        e_neg[mod_rows[k], mod_steps[k]] = np.repeat(e_flex[k, None], n_allowed, axis=1).sum(axis=1)
+
+    # Reset negative power if energy has been reset as well
+    p_neg[e_neg <= 0] = 0
+
+    # # Calculating Flex Prices ###########################################################################
+    pr_pos = np.zeros(p_opt.shape)
+    pr_neg = np.zeros(p_opt.shape)
+    # Positive flexibility
+    offer = (e_pos > 0) & (p_pos > 0)
+    rows, steps = np.nonzero(offer)
+    idx_required = np.ceil(e_pos[offer] / max_power[offer] * n_time_steps_phour)
+    idx_flex = np.ceil(e_pos[offer] / p_pos[offer] * n_time_steps_phour)
+    pr_pos[offer] = mean_k_smallest(pr_fcst, steps + idx_flex - 1, idx_required, rows, lengths[:, 0]) * \
+        (1 + risk_margin)
+    # Negative flexibility
+    offer = (e_neg > 0) & (p_neg > 0)
+    rows, steps = np.nonzero(offer)
+    idx_flex = np.ceil(e_neg[offer] / p_neg[offer] * n_time_steps_phour)
+    pr_neg[offer] = mean_k_largest(pr_fcst, steps + idx_flex - 1, idx_flex, rows, lengths[:, 0]) * (risk_margin - 1)
+
+    return p_pos, p_neg, e_pos, e_neg, pr_pos, pr_neg, pr_fcst, p_opt
+
+
+def _next_smaller_in_period(values, in_period):
+    """ next time step with a smaller value within the period, the length of the period if no smaller value follows
+
+    :param values: array of shape (n_periods, n_steps)
+    :param in_period: boolean array of the time steps of the periods
+    :return: array of indices
+    """
+    return next_smaller(np.where(in_period, values, -np.inf))
+
+
+if __name__ == '__main__':
+    # benchmark: time to calculate the ev flexibility against the length of the availability period
+    import time as tm
+
+    for bench_nsteps in [96, 672, 2880]:
+        bench_slots = pd.date_range('2019-12-18 00:00', periods=bench_nsteps, freq='15Min')
+        bench_power = np.round(np.random.rand(bench_nsteps) * 11, 1) * (np.random.rand(bench_nsteps) > 0.5)
+        bench_ems = {'time_data': {'nsteps': bench_nsteps, 't_inval': 15, 'ntsteps': 4,
+                                   'time_slots': pd.Index(bench_slots.strftime('%Y-%m-%d %H:%M'))},
+                     'devices': {'ev': {'maxpow': 11, 'aval': [1] * bench_nsteps, 'initSOC': [20],
+                                        'aval_init': [bench_slots[0].strftime('%Y-%m-%d %H:%M')],
+                                        'aval_end': [bench_slots[-1].strftime('%Y-%m-%d %H:%M')]}},
+                     'optplan': {'EV_power': list(bench_power)},
+                     'fcst': {'ele_price_in': list(np.random.rand(bench_nsteps) * 0.1 + 0.25)},
+                     'flexopts': {}}
+        t_start = tm.time()
+        calc_flex_ev(bench_ems)
+        print('{} time steps: ev flexibility calculated in {:.3f} s'.format(bench_nsteps, tm.time() - t_start))
+
+    # batch of many vehicles with 96 time steps
+    for bench_units in [10, 100, 1000]:
+        bench_power = np.round(np.random.rand(bench_units, 96) * 11, 1) * (np.random.rand(bench_units, 96) > 0.5)
+        t_start = tm.time()
+        calc_flex_ev_batch(bench_power, np.random.rand(96) * 0.1 + 0.25, 11, 1)
+        print('{} vehicles: ev flexibility calculated in {:.3f} s'.format(bench_units, tm.time() - t_start))
@@ -13,10 +13,12 @@ __status__ = "Development"
 
 import pandas as pd
 import numpy as np
-import heapq
 from scipy.interpolate import UnivariateSpline
 
 from opentumflex.configuration.init_ems import init_ems_js as ems_loc
+from opentumflex.flexibility.flex_duration import dur_max_operation, dur_max_regeneration, dur_max_storage
+from opentumflex.flexibility.flex_pricing import sum_k_smallest, sum_k_largest
+from opentumflex.flexibility.flex_table import FlexTable
 
 
 def calc_flex_hp(ems, reopt):  # datafram open and br   eak it down
@@ -60,28 +62,12 @@ def calc_flex_hp(ems, reopt):  # datafram open and br   eak it down
     # get the max duration of flexibility for every time step
 
     # max duration from the optimal operation
-    dur_max_opt = np.zeros(timesteps)
-
-    for i in range(timesteps):
-        if hp_operation[i] > 0:
-            dur_max_opt[i] = next((x for x, val in enumerate(hp_operation[i:]) if val == 0), timesteps - i) + i - 1
-        else:
-            dur_max_opt[i] = next((x for x, val in enumerate(hp_operation[i:]) if val > 0), timesteps - i) + i - 1
+    dur_max_opt = dur_max_operation(hp_operation)
 
     # max duration from available regeneration time
-
-    dur_max_reg = np.zeros(timesteps)
-    for i in range(timesteps):
-        if hp_operation[i] > 0:
-            # dur_max_reg[i] = min(i + sum(1-hp_operation[i:]) - 1, timesteps - 1)
-            dur_max_reg[i] = min(i + sum(1 - hp_operation[i:]) - 1, timesteps)
-        else:
-            # dur_max_reg[i] = min(i + sum(hp_operation[i:]) - 1, timesteps - 1)
-            dur_max_reg[i] = min(i + sum(hp_operation[i:]) - 1, timesteps)
+    dur_max_reg = dur_max_regeneration(hp_operation)
 
     # max duration from storage capacity
-    dur_max_sto = np.zeros(timesteps)
-
     # on/off states to soc change
     soc_mean = ((1 - hp_operation) * 100 + soc_heat) / 2
     temp_mean = (hs_temp_max - hs_temp_min) * soc_mean / 100 + hs_temp_min + 273.15
@@ -91,16 +77,7 @@ def calc_flex_hp(ems, reopt):  # datafram open and br   eak it down
                             (hp_p_map.mean(axis=1)[hp_supply_temp] * hp_cop_map.mean(axis=1)[hp_supply_temp])
 
     soc_change = hp_heat_ifrun_modified * pow2energy / hs_cap * (0.5 - hp_operation) * 2 * 100
-    for i in range(timesteps):
-        soc = soc_heat[i]
-        idx = i
-        while hs_soc_min < soc < 100:
-            idx += 1
-            if idx > timesteps:
-                break
-            soc += soc_change[idx - 1]
-
-        dur_max_sto[i] = idx - 2
+    dur_max_sto = dur_max_storage(soc_heat, soc_change, hs_soc_min)
 
     dur_max = list(map(int, map(min, zip(dur_max_opt, dur_max_reg, dur_max_sto))))
 
@@ -133,19 +110,17 @@ def calc_flex_hp(ems, reopt):  # datafram open and br   eak it down
     
     cost_diff_pos = np.zeros(timesteps)
     cost_diff_neg = np.zeros(timesteps)
-    for i in range(timesteps):
-        count_flex_ts = dur_max[i] - i + 1
-        if hp_operation[i] > 0:
-            cost_modified = list(map(float, cost_elec_input[dur_max[i] + 1:])) + hp_operation[dur_max[i] + 1:] * 100
-            # cost_orig = sum(cost_elec_input[i:dur_max[i] + 1])
-            cost_new = sum(heapq.nsmallest(count_flex_ts, cost_modified))
-            cost_diff_pos[i] = (cost_new / count_flex_ts) * 1.15 * (1 - idx_no_flex[i])
-        else:
-            cost_modified = (-hp_operation[dur_max[i] + 1:] + 1) * (-100) + \
-                            list(map(float, cost_elec_input[dur_max[i] + 1:]))
-            # cost_orig = sum(heapq.nsmallest(count_flex_ts, cost_modified))
-            cost_new = sum(heapq.nlargest(count_flex_ts, cost_modified))
-            cost_diff_neg[i] = (-cost_new / count_flex_ts) * 0.85 * (1 - idx_no_flex[i])
+    operation = np.asarray(hp_operation, dtype=float)
+    price = np.asarray(list(map(float, cost_elec_input)))
+    count_flex_ts = np.asarray(dur_max) - np.arange(timesteps) + 1
+    run = operation > 0
+    # switching off: the operation is shifted to the cheapest time steps after the flexibility without operation
+    cost_new, _ = sum_k_smallest(price + operation * 100, np.asarray(dur_max)[run] + 1, count_flex_ts[run])
+    cost_diff_pos[run] = (cost_new / count_flex_ts[run]) * 1.15 * (1 - idx_no_flex[run])
+    # switching on: the operation is taken from the most expensive time steps after the flexibility
+    cost_new, _ = sum_k_largest((-operation + 1) * (-100) + price, np.asarray(dur_max)[~run] + 1,
+                                count_flex_ts[~run])
+    cost_diff_neg[~run] = (-cost_new / count_flex_ts[~run]) * 0.85 * (1 - idx_no_flex[~run])
 
     # write the results in data
     timeslots = list(ems['time_data']['time_slots'])
@@ -160,7 +135,7 @@ def calc_flex_hp(ems, reopt):  # datafram open and br   eak it down
             'Neg_Pr': cost_diff_neg,
             'Pos_Pr': cost_diff_pos,
             }
-    flexopts = pd.DataFrame(data)
+    flexopts = FlexTable(data)
     ems['flexopts']['hp'] = flexopts
 
     return ems
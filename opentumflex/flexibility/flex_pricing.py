@@ -0,0 +1,227 @@
+"""
+The "flex_pricing.py" answers the order-statistics queries of the flexibility pricing in bulk, i.e. the sum or mean of
+the k cheapest/most expensive prices within the remaining horizon [start, n) for every time step
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import numpy as np
+
+# Minimum number of rows whose trees are updated at once, the trees of fewer rows are built one row after the other
+MIN_ROWS_AT_ONCE = 64
+
+
+def sum_k_smallest(values, starts, counts, rows=None, lengths=None):
+    """ sum of the k smallest values in the window [start, n) for every query
+
+    The queries are answered offline in descending order of their start: the values are inserted from the end of the
+    horizon into Fenwick trees over their ranks, the k smallest are then found by descending the trees, i.e. in
+    O((n + q) log n) instead of sorting a new suffix for every query. The rows of 2-D values are independent horizons
+    with one tree each, the trees of many rows are updated at once (see _sum_k_smallest_rows). Every row is summed
+    like the values of the row alone.
+
+    :param values: array of values, e.g. prices, of shape (n,) or (n_rows, n)
+    :param starts: first index of the window for every query
+    :param counts: number of values k for every query
+    :param rows: row of the values for every query (2-D values)
+    :param lengths: number of values of every row, the values after it are ignored (2-D values, default is n)
+    :return: array of sums and array with the number of values taken (less than k if the window is too short)
+    """
+    values = np.asarray(values, dtype=float)
+    starts = np.asarray(starts, dtype=int)
+    counts = np.asarray(counts, dtype=int)
+    if values.ndim == 2:
+        rows = np.asarray(rows, dtype=int)
+        lengths = np.full(len(values), values.shape[1]) if lengths is None else np.asarray(lengths, dtype=int)
+        if len(values) >= MIN_ROWS_AT_ONCE:
+            return _sum_k_smallest_rows(values, starts, counts, rows, lengths)
+        # the trees of few rows are faster one after the other
+        sums = np.zeros(len(starts))
+        taken = np.zeros(len(starts), dtype=int)
+        for row in np.unique(rows):
+            query = rows == row
+            sums[query], taken[query] = sum_k_smallest(values[row, :lengths[row]], starts[query], counts[query])
+        return sums, taken
+    nvalues = len(values)
+    sums = np.zeros(len(starts))
+    taken = np.zeros(len(starts), dtype=int)
+
+    # rank of every value (1-based), ties are ranked by position
+    rank = np.empty(nvalues, dtype=int)
+    rank[np.argsort(values, kind='stable')] = np.arange(1, nvalues + 1)
+    rank = rank.tolist()
+    values_list = values.tolist()
+    tree_cnt = [0] * (nvalues + 1)
+    tree_sum = [0.0] * (nvalues + 1)
+    top_step = 1 << max(nvalues.bit_length() - 1, 0)
+
+    next_insert = nvalues
+    for q in np.argsort(-starts, kind='stable').tolist():
+        start = max(int(starts[q]), 0)
+        # insert all values of the window
+        while next_insert > start:
+            next_insert -= 1
+            pos = rank[next_insert]
+            while pos <= nvalues:
+                tree_cnt[pos] += 1
+                tree_sum[pos] += values_list[next_insert]
+                pos += pos & -pos
+        # descend to the largest rank with at most k values of the window below
+        remaining = max(int(counts[q]), 0)
+        pos, total, step = 0, 0.0, top_step
+        while step > 0 and remaining > 0:
+            if pos + step <= nvalues and tree_cnt[pos + step] <= remaining:
+                pos += step
+                remaining -= tree_cnt[pos]
+                total += tree_sum[pos]
+            step >>= 1
+        sums[q] = total
+        taken[q] = max(int(counts[q]), 0) - remaining
+
+    return sums, taken
+
+
+def sum_k_largest(values, starts, counts, rows=None, lengths=None):
+    """ sum of the k largest values in the window [start, n) for every query
+
+    :param values: array of values, e.g. prices, of shape (n,) or (n_rows, n)
+    :param starts: first index of the window for every query
+    :param counts: number of values k for every query
+    :param rows: row of the values for every query (2-D values)
+    :param lengths: number of values of every row, the values after it are ignored (2-D values, default is n)
+    :return: array of sums and array with the number of values taken (less than k if the window is too short)
+    """
+    sums, taken = sum_k_smallest(-np.asarray(values, dtype=float), starts, counts, rows, lengths)
+
+    return -sums, taken
+
+
+def mean_k_smallest(values, starts, counts, rows=None, lengths=None):
+    """ mean of the k smallest values in the window [start, n) for every query, NaN if the window is empty
+
+    :param values: array of values, e.g. prices, of shape (n,) or (n_rows, n)
+    :param starts: first index of the window for every query
+    :param counts: number of values k for every query
+    :param rows: row of the values for every query (2-D values)
+    :param lengths: number of values of every row, the values after it are ignored (2-D values, default is n)
+    :return: array of mean values
+    """
+    sums, taken = sum_k_smallest(values, starts, counts, rows, lengths)
+
+    return _mean(sums, taken)
+
+
+def mean_k_largest(values, starts, counts, rows=None, lengths=None):
+    """ mean of the k largest values in the window [start, n) for every query, NaN if the window is empty
+
+    :param values: array of values, e.g. prices, of shape (n,) or (n_rows, n)
+    :param starts: first index of the window for every query
+    :param counts: number of values k for every query
+    :param rows: row of the values for every query (2-D values)
+    :param lengths: number of values of every row, the values after it are ignored (2-D values, default is n)
+    :return: array of mean values
+    """
+    sums, taken = sum_k_largest(values, starts, counts, rows, lengths)
+
+    return _mean(sums, taken)
+
+
+def _sum_k_smallest_rows(values, starts, counts, rows, lengths):
+    """ sum of the k smallest values in the window [start, length) of a row for every query, with one Fenwick tree per
+    row
+
+    The values of all rows are inserted time step by time step from the end of the horizon, and the queries starting at
+    a time step descend their trees at once. Every tree holds only the values of its row and is descended up to the
+    length of the row, so a row is summed like the values of the row alone.
+
+    :param values: array of values of shape (n_rows, n)
+    :param starts: first index of the window for every query
+    :param counts: number of values k for every query
+    :param rows: row of the values for every query
+    :param lengths: number of values of every row
+    :return: array of sums and array with the number of values taken (less than k if the window is too short)
+    """
+    n_rows, nvalues = values.shape
+    sums = np.zeros(len(starts))
+    taken = np.zeros(len(starts), dtype=int)
+
+    # rank of every value within its row (1-based), ties are ranked by position and the values after the length last
+    rank = np.empty(values.shape, dtype=int)
+    in_row = np.arange(nvalues) < lengths[:, None]
+    rank[np.arange(n_rows)[:, None], np.argsort(np.where(in_row, values, np.inf), axis=1, kind='stable')] = \
+        np.arange(1, nvalues + 1)
+    tree_cnt = np.zeros((n_rows, nvalues + 1), dtype=int)
+    tree_sum = np.zeros((n_rows, nvalues + 1))
+    top_step = 1 << max(nvalues.bit_length() - 1, 0)
+
+    # queries by start, the ones starting at or after the end are answered before the first insertion
+    starts = np.clip(starts, 0, nvalues)
+    order = np.argsort(starts, kind='stable')
+    first_query = np.searchsorted(starts[order], np.arange(nvalues + 2))
+    for start in range(nvalues, -1, -1):
+        # insert the values of the time step into the trees of all rows
+        if start < nvalues:
+            insert = np.flatnonzero(in_row[:, start])
+            pos = rank[insert, start]
+            while len(insert) > 0:
+                tree_cnt[insert, pos] += 1
+                tree_sum[insert, pos] += values[insert, start]
+                pos = pos + (pos & -pos)
+                insert, pos = insert[pos <= lengths[insert]], pos[pos <= lengths[insert]]
+        # descend to the largest rank with at most k values of the window below
+        query = order[first_query[start]:first_query[start + 1]]
+        row = rows[query]
+        remaining = np.maximum(counts[query], 0)
+        pos = np.zeros(len(query), dtype=int)
+        total = np.zeros(len(query))
+        step = top_step
+        while step > 0 and len(query) > 0:
+            down = np.flatnonzero((remaining > 0) & (pos + step <= lengths[row]))
+            down = down[tree_cnt[row[down], pos[down] + step] <= remaining[down]]
+            pos[down] += step
+            remaining[down] -= tree_cnt[row[down], pos[down]]
+            total[down] += tree_sum[row[down], pos[down]]
+            step >>= 1
+        sums[query] = total
+        taken[query] = np.maximum(counts[query], 0) - remaining
+
+    return sums, taken
+
+
+def _mean(sums, taken):
+    """ divide the sums by the number of values, NaN for empty windows
+
+    :param sums: array of sums
+    :param taken: array with the number of values
+    :return: array of mean values
+    """
+    mean = np.full(len(sums), np.nan)
+    np.divide(sums, taken, out=mean, where=taken > 0)
+
+    return mean
+
+
+if __name__ == '__main__':
+    # benchmark: bulk queries against heapq.nsmallest over every suffix
+    import heapq
+    import time as tm
+
+    for bench_nsteps in [96, 672, 2880]:
+        bench_prices = np.random.rand(bench_nsteps) * 0.1 + 0.25
+        bench_starts = np.arange(bench_nsteps) + np.random.randint(0, 8, bench_nsteps)
+        bench_counts = np.random.randint(1, 16, bench_nsteps)
+        t_start = tm.time()
+        sum_k_smallest(bench_prices, bench_starts, bench_counts)
+        t_bulk = tm.time() - t_start
+        t_start = tm.time()
+        for a, k in zip(bench_starts, bench_counts):
+            sum(heapq.nsmallest(k, list(bench_prices[a:])))
+        t_heapq = tm.time() - t_start
+        print('{} time steps: bulk {:.3f} s, heapq {:.3f} s'.format(bench_nsteps, t_bulk, t_heapq))
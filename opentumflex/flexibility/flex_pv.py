@@ -11,57 +11,49 @@ __maintainer__ = "Babu Kumaran Nalini"
 __email__ = "babu.kumaran-nalini@tum.de"
 __status__ = "Development"
 
-from opentumflex.configuration.init_ems import init_ems_js as ems_loc
 # from opentumflex.flex.flex_draw import plot_flex as plot_flex
-import pandas as pd
 import numpy as np
 
+from opentumflex.flexibility.flex_duration import next_smaller
+from opentumflex.flexibility.flex_table import FlexTable
+
+
 def calc_flex_pv(my_ems, reopt):
     # Find whether optimization or reoptimization
     if reopt == 0:
-        dat1 = my_ems['optplan']['pv_pv2grid'] 
-        dat2 = my_ems['optplan']['PV_power']    
-        dat3 = my_ems['optplan']['pv_pv2demand']
-        
+        optplan = my_ems['optplan']
     elif reopt == 1:
-        dat1 = my_ems['reoptim']['optplan']['pv_pv2grid'] 
-        dat2 = my_ems['reoptim']['optplan']['PV_power'] 
-        
+        optplan = my_ems['reoptim']['optplan']
+
+    dat1 = np.asarray(optplan['pv_pv2grid'], dtype=float)
+    dat2 = np.asarray(optplan['PV_power'], dtype=float)
+    dat3 = np.asarray(optplan['pv_pv2demand'], dtype=float)
     nsteps = len(dat1)
     ntsteps = my_ems['time_data']['ntsteps']
-    PV_flex = pd.DataFrame(0, index=range(nsteps), columns=range(7))
-    PV_flex.columns = ['Sch_P', 'Neg_P', 'Pos_P', 'Neg_E', 'Pos_E', 'Neg_Pr', 'Pos_Pr']
-    
-    pv2bat = np.array(dat2)-np.array(dat3)-np.array(dat1) # PV power going to battery
-    
-    # PV positive flexibility
-    for i in range(0, nsteps):
-        
-        if pv2bat[i] > 0:
-            PV_flex.iloc[i, 2] = pv2bat[i]
-        if pv2bat[i] > 0.1:  # min_export
-            j = i 
-            while j < nsteps and pv2bat[i] <= pv2bat[j]:
-                j = j + 1
-            
-            PV_flex.iloc[i, 4] = PV_flex.iloc[i, 2] * (j-i) / ntsteps
-    #PV negative flexibility
-    for i in range(0, nsteps):
-        PV_flex.iloc[i, 0] = dat1[i]
-        if dat2[i] > 0.1:  # min_export
-            j = i 
-            while j < nsteps and dat1[i] <= dat1[j]:
-                j = j + 1
-            PV_flex.iloc[i, 1] = -1 * dat1[i]
-            PV_flex.iloc[i, 3] = PV_flex.iloc[i, 1] * (j-i) / ntsteps
+    price_out = np.asarray(my_ems['fcst']['ele_price_out'][:nsteps], dtype=float)
+    steps = np.arange(nsteps)
+    neg_P, pos_P, neg_E, pos_E, neg_Pr, pos_Pr = (np.zeros(nsteps) for i in range(6))
+
+    pv2bat = dat2 - dat3 - dat1  # PV power going to battery
+
+    # PV positive flexibility: available until the power going to the battery drops
+    pos_P[pv2bat > 0] = pv2bat[pv2bat > 0]
+    pos_flex = pv2bat > 0.1  # min_export
+    pos_E[pos_flex] = pos_P[pos_flex] * (next_smaller(pv2bat)[pos_flex] - steps[pos_flex]) / ntsteps
+
+    # PV negative flexibility: available until the power fed into the grid drops
+    neg_flex = dat2 > 0.1  # min_export
+    neg_P[neg_flex] = -1 * dat1[neg_flex]
+    neg_E[neg_flex] = neg_P[neg_flex] * (next_smaller(dat1)[neg_flex] - steps[neg_flex]) / ntsteps
 
     # PV negative flexibility pricing
-    for i in range(0, nsteps):
-        if PV_flex.iloc[i, 1] < 0:
-            net_income = 0
-            net_income = net_income + dat1[i] * -my_ems['fcst']['ele_price_out'][i] / ntsteps
-            PV_flex.iloc[i, 5] = net_income * ntsteps / PV_flex.iloc[i, 1]
-            
+    neg_pr = neg_P < 0
+    net_income = dat1[neg_pr] * -price_out[neg_pr] / ntsteps
+    neg_Pr[neg_pr] = net_income * ntsteps / neg_P[neg_pr]
+
+    PV_flex = FlexTable({'Sch_P': dat1, 'Neg_P': neg_P, 'Pos_P': pos_P, 'Neg_E': neg_E, 'Pos_E': pos_E,
+                         'Neg_Pr': neg_Pr, 'Pos_Pr': pos_Pr})
+
     # Insert time column
     # temp = my_ems['time_data']['time_slots'][:]
     # PV_flex.insert(0,"time",temp)
@@ -73,17 +65,20 @@ def calc_flex_pv(my_ems, reopt):
 
 
 if __name__ == '__main__':
-    my_ems = ems_loc(initialize=True, path='C:/Users/ge57vam/emsflex/opentumflex/test_chp.txt')
-    # my_ems['fcst'] = opentumflex(my_ems)
-    # my_ems['flexopts']['pv'] = PVflex(my_ems)
-    # my_ems['time_data']['nsteps'] = 24
-    # my_ems['time_data']['ntsteps'] = 1
-    # my_ems['time_data']['t_inval'] = 60
-    # my_ems['time_data']['d_inval'] = 15
-    # my_ems['time_data']['days'] = 1
-    my_ems['devices']['pv']['maxpow'] = 15
-    #  my_ems['optplan'] = opt(my_ems, plot_fig=False, result_folder='C:/Optimierung/')
-    #  my_ems['flexopts']['pv'] = PVflex(my_ems)
-    #  my_ems['flexopts']['bat'] = Batflex(my_ems)
-    #  plot_flex(my_ems, 'bat')
-    # # save_results(my_ems['flexopts']['hp'])
+    # benchmark: time to calculate the PV flexibility against the length of the horizon
+    import time as tm
+
+    for bench_nsteps in [96, 672, 2880]:
+        # flat plateaus of the PV generation
+        bench_pv = np.round(np.maximum(np.sin(np.arange(bench_nsteps) / 96 * 2 * np.pi), 0) * 4, 1) * 2.5
+        bench_demand = np.minimum(bench_pv, np.random.rand(bench_nsteps))
+        bench_grid = (bench_pv - bench_demand) * (np.random.rand(bench_nsteps) > 0.3)
+        bench_ems = {'optplan': {'pv_pv2grid': list(bench_grid),
+                                 'PV_power': list(bench_pv),
+                                 'pv_pv2demand': list(bench_demand)},
+                     'fcst': {'ele_price_out': list(np.full(bench_nsteps, 0.08))},
+                     'time_data': {'ntsteps': 4},
+                     'flexopts': {}}
+        t_start = tm.time()
+        calc_flex_pv(bench_ems, reopt=0)
+        print('{} time steps: PV flexibility calculated in {:.3f} s'.format(bench_nsteps, tm.time() - t_start))
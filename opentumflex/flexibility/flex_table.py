@@ -0,0 +1,152 @@
+"""
+The "flex_table.py" stores the flexibility offers of a device in one contiguous float array with named column views
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import numpy as np
+import pandas as pd
+
+FLEX_COLUMNS = ('Sch_P', 'Neg_P', 'Pos_P', 'Neg_E', 'Pos_E', 'Neg_Pr', 'Pos_Pr')
+
+
+class FlexTable:
+    """ flexibility offers of a device with one row of a (n_columns, nsteps) float array per column
+
+    A column name returns a writable view of its values, a slice returns a FlexTable of the time steps as a view.
+    """
+
+    __slots__ = ('_values', '_columns', '_index')
+
+    def __init__(self, data, index=None):
+        """ create a flexibility table from the values of its columns
+
+        :param data: dict of column names and values of equal length, copied into one contiguous array
+        :param index: labels of the time steps, range of the time steps if None
+        """
+        self._columns = tuple(data)
+        self._values = np.array([np.asarray(values, dtype=float) for values in data.values()], dtype=float)
+        self._index = _as_index(index)
+
+    @classmethod
+    def zeros(cls, nsteps, columns=FLEX_COLUMNS, index=None):
+        """ create a flexibility table without flexibility
+
+        :param nsteps: number of time steps
+        :param columns: column names
+        :param index: labels of the time steps, range of the time steps if None
+        :return: FlexTable filled with zeros
+        """
+        return cls._from_values(np.zeros((len(columns), nsteps)), columns, index)
+
+    @classmethod
+    def from_pandas(cls, df):
+        """ create a flexibility table from a dataframe of flexibility offers
+
+        :param df: dataframe with one column per offer parameter
+        :return: FlexTable with the columns and index of the dataframe
+        """
+        index = None if df.index.equals(pd.RangeIndex(len(df))) else df.index
+        return cls({col: df[col] for col in df.columns}, index=index)
+
+    @classmethod
+    def _from_values(cls, values, columns, index):
+        table = cls.__new__(cls)
+        table._values = values
+        table._columns = tuple(columns)
+        table._index = _as_index(index)
+        return table
+
+    @property
+    def columns(self):
+        return list(self._columns)
+
+    @property
+    def index(self):
+        return pd.RangeIndex(self._values.shape[1]) if self._index is None else self._index
+
+    def __len__(self):
+        return self._values.shape[1]
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __contains__(self, col):
+        return col in self._columns
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._from_values(self._values[:, key], self._columns,
+                                     None if self._index is None else self._index[key])
+        return self._values[self._column_pos(key)]
+
+    def __setitem__(self, key, values):
+        if isinstance(key, slice):
+            self._values[:, key] = np.asarray(values, dtype=float).T
+        else:
+            self._values[self._column_pos(key)] = values
+
+    def __array__(self, dtype=None):
+        # rows are time steps like in the values of a dataframe
+        return self._values.T if dtype is None else self._values.T.astype(dtype)
+
+    def __repr__(self):
+        return repr(self.to_pandas())
+
+    def _column_pos(self, col):
+        try:
+            return self._columns.index(col)
+        except ValueError:
+            raise KeyError(col) from None
+
+    def copy(self):
+        return self._from_values(self._values.copy(), self._columns, self._index)
+
+    def reset_index(self, drop=True):
+        """ copy the flexibility table with the range of the time steps as index
+
+        :param drop: has to be True, the labels of the time steps can not be inserted as float column
+        :return: FlexTable with a copy of the values
+        """
+        if not drop:
+            raise ValueError('the index of a FlexTable can only be dropped')
+        return self._from_values(self._values.copy(), self._columns, None)
+
+    def to_dict(self, orient='dict'):
+        """ convert the flexibility table to a dict like DataFrame.to_dict, e.g. to save it in a json file
+
+        :param orient: orientation of the dict, see DataFrame.to_dict
+        :return: dict of the flexibility offers
+        """
+        return self.to_pandas().to_dict(orient)
+
+    def to_pandas(self):
+        """ view the flexibility table as dataframe without copying its values
+
+        :return: dataframe with one column per offer parameter, sharing the memory of the table
+        """
+        return pd.DataFrame(self._values.T, index=self.index, columns=self.columns, copy=False)
+
+
+def _as_index(index):
+    if index is None or isinstance(index, pd.Index):
+        return index
+    return pd.Index(index)
+
+
+def flex_frame(flexopts):
+    """ get the flexibility offers of a device as dataframe
+
+    :param flexopts: FlexTable, dataframe or dict of columns as stored by save_ems
+    :return: dataframe of the flexibility offers
+    """
+    if isinstance(flexopts, FlexTable):
+        return flexopts.to_pandas()
+    return pd.DataFrame.from_dict(flexopts)
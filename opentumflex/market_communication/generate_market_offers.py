@@ -15,6 +15,8 @@ import pandas as pd
 from datetime import datetime
 import os
 
+from opentumflex.flexibility.flex_table import flex_frame
+
 def save_offers(my_ems, market='comax'):
     device = list(my_ems['flexopts'].keys())   
     if market == 'comax':
@@ -53,10 +55,10 @@ def save_offers_comax(my_ems,  device,  filetype='xlsx'):
     
     # Save flex offers in the requested format
     if filetype == 'xlsx':
-        my_ems['flexopts'][device].to_excel(new_cwd+'.xlsx')
+        flex_frame(my_ems['flexopts'][device]).to_excel(new_cwd+'.xlsx')
         # print("Excel file generated! Available on " + path)
     elif filetype == 'csv':
-        my_ems['flexopts'][device].to_csv(new_cwd+'.csv', sep=';', decimal='.', index=False)
+        flex_frame(my_ems['flexopts'][device]).to_csv(new_cwd+'.csv', sep=';', decimal='.', index=False)
         # print("CSV file generated! Available on " + path)
     else:
         print('Unknown file format - .xlsx/.csv supported')
@@ -87,13 +89,14 @@ def save_offers_alf(my_ems, device):
                                'min_Dauer_eines_Abrufs'], index=range(my_ems['time_data']['nsteps']))
 
     # Insert respective parameter from dictionary to the new dataframe
-    df['Leistung_Plan'] = round(my_ems['flexopts'][device]['Sch_P'], 5)
-    df['Leistung-'] = round(my_ems['flexopts'][device]['Neg_P'], 5)
-    df['Leistung+'] = round(my_ems['flexopts'][device]['Pos_P'], 5)
-    df['Energie-'] = round(my_ems['flexopts'][device]['Neg_E'], 5)
-    df['Energie+'] = round(my_ems['flexopts'][device]['Pos_E'], 5)
-    df['Preis-'] = round(my_ems['flexopts'][device]['Neg_Pr'] * 100, 2)
-    df['Preis+'] = round(my_ems['flexopts'][device]['Pos_Pr'] * 100, 2)
+    flexopts = flex_frame(my_ems['flexopts'][device])
+    df['Leistung_Plan'] = round(flexopts['Sch_P'], 5)
+    df['Leistung-'] = round(flexopts['Neg_P'], 5)
+    df['Leistung+'] = round(flexopts['Pos_P'], 5)
+    df['Energie-'] = round(flexopts['Neg_E'], 5)
+    df['Energie+'] = round(flexopts['Pos_E'], 5)
+    df['Preis-'] = round(flexopts['Neg_Pr'] * 100, 2)
+    df['Preis+'] = round(flexopts['Pos_Pr'] * 100, 2)
 
     # Add UTC string to Uhrzeit(time)
     utc = " +0100"
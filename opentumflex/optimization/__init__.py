@@ -5,7 +5,9 @@ Created on Thu Oct 17 10:05:55 2019
 @author: ge57vam
 """
 
-from .model import create_model, solve_model, extract_res
+from .model import create_model, update_model, solve_model, extract_res, ModelTemplate, SolverSession, \
+    NoSolutionError
+from .sparse_model import create_sparse_model, solve_sparse_model, extract_sparse_res, SparseModel
 from .report import save_results
 
 
@@ -17,9 +17,16 @@ from pyomo.environ import value as get_value
 from pyomo.environ import *
 import pandas as pd
 import numpy as np
-from scipy.interpolate import UnivariateSpline
 import time as tm
 from datetime import datetime
+from opentumflex.configuration.devices import get_hp_performance
+
+
+class NoSolutionError(ImportError):
+    """ the solver did not find a feasible solution, e.g. within the time limit
+
+    It is an ImportError, which extract_res raised for this case before.
+    """
 
 
 def create_model(ems_local):
@@ -34,7 +41,6 @@ def create_model(ems_local):
     t0 = tm.time()
     # get all the data from the external file
     # ems_local = ems_loc(initialize=True, path='C:/Users/ge57vam/emsflex/opentumflex/ems01_ems.txt')
-    devices = ems_local['devices']
 
     # read data from excel file
 
@@ -42,10 +48,6 @@ def create_model(ems_local):
     # print('Prepare Data ...\n')
     t = tm.time()
     time_interval = ems_local['time_data']['t_inval']  # x minutes for one time step
-    # write in the time series from the data
-    df_time_series = ems_local['fcst']
-    time_series = pd.DataFrame.from_dict(df_time_series)
-    # time = time_series.index.values
 
     # print('Data Prepared. time: ' + "{:.1f}".format(tm.time() - t0) + ' s\n')
 
@@ -81,69 +83,44 @@ def create_model(ems_local):
     m.t_UP = pyen.Set(ordered=True, initialize=timesteps_up)
 
     # heat_storage
-    sto_param = devices['sto']
-    m.sto_max_cont = pyen.Param(initialize=sto_param['stocap'])
-    m.SOC_init = pyen.Param(initialize=sto_param['initSOC'])
-    m.temp_min = pyen.Param(initialize=sto_param['mintemp'])
-    m.temp_max = pyen.Param(initialize=sto_param['maxtemp'])
+    m.sto_max_cont, m.SOC_init, m.temp_min, m.temp_max = (pyen.Param(initialize=0, mutable=True) for i in range(4))
 
     # battery
-    bat_param = devices['bat']
-    m.bat_cont_max = pyen.Param(initialize=bat_param['stocap'])
-    m.bat_SOC_init = pyen.Param(initialize=bat_param['initSOC'])
-    m.bat_power_max = pyen.Param(initialize=bat_param['maxpow'])
-    m.bat_eta = pyen.Param(initialize=bat_param['eta'])
+    m.bat_cont_max, m.bat_SOC_init, m.bat_power_max, m.bat_eta = (pyen.Param(initialize=0, mutable=True)
+                                                                  for i in range(4))
+    # maximum charging/discharging power of the battery: min(bat_power_max, bat_cont_max)
+    m.bat_pow_lim = pyen.Param(initialize=0, mutable=True)
     #bat_aval = bat_param['aval']
     #m.bat_aval = pyen.Param(m.t, initialize=1, mutable=True)
 
 
     # heat pump
-    hp_param = devices['hp']
-    hp_elec_cap = pd.DataFrame.from_dict(hp_param['powmap'])
-    hp_cop = pd.DataFrame.from_dict(hp_param['COP'])
-    hp_supply_temp = hp_param['supply_temp']
     m.hp_ther_pow = pyen.Param(m.t, initialize=1, mutable=True, within=pyen.NonNegativeReals)
     m.hp_COP = pyen.Param(m.t, initialize=1, mutable=True, within=pyen.NonNegativeReals)
     m.hp_elec_pow = pyen.Param(m.t, initialize=1, mutable=True, within=pyen.NonNegativeReals)
     m.T_DN = pyen.Param(initialize=t_dn, mutable=True)
     m.T_UP = pyen.Param(initialize=t_up, mutable=True)
-    m.hp_themInertia = pyen.Param(initialize=hp_param['thermInertia'])
-    m.hp_minTemp = pyen.Param(initialize=hp_param['minTemp'])
-    m.hp_maxTemp = pyen.Param(initialize=hp_param['maxTemp'])
-    m.hp_heatgain = pyen.Param(initialize=hp_param['heatgain'])
+    m.hp_themInertia, m.hp_minTemp, m.hp_maxTemp, m.hp_heatgain = (pyen.Param(initialize=0, mutable=True)
+                                                                   for i in range(4))
 
     # elec_vehicle
-    ev_param = devices['ev']
-    ev_aval = ev_param['aval']
-    m.ev_min_pow = pyen.Param(initialize=ev_param['minpow'])
-    m.ev_max_pow = pyen.Param(initialize=ev_param['maxpow'])
-    m.ev_sto_cap = pyen.Param(initialize=ev_param['stocap'])
-    m.ev_eta = pyen.Param(initialize=ev_param['eta'])
+    m.ev_min_pow, m.ev_max_pow, m.ev_sto_cap, m.ev_eta, m.ev_soc_init = (pyen.Param(initialize=0, mutable=True)
+                                                                         for i in range(5))
     m.ev_aval = pyen.Param(m.t, initialize=1, mutable=True)
+    m.ev_init_soc_check = pyen.Param(m.t, initialize=100, mutable=True)
+    m.ev_end_soc_check = pyen.Param(m.t, initialize=0, mutable=True)
     m.flex_type = pyen.Param(m.t, initialize=0, mutable=True)
-    m.ev_charg_amount = m.ev_sto_cap * (ev_param['endSOC'][-1] - ev_param['initSOC'][0]) / 100
-    ev_soc_init = ev_param['initSOC']
-    ev_soc_end = ev_param['endSOC']
-    ev_init_soc_check = ev_param['init_soc_check']
-    ev_end_soc_check = ev_param['end_soc_check']
 
     # boilder
-    boil_param = devices['boiler']
-    m.boiler_max_cap = pyen.Param(initialize=boil_param['maxpow'])
-    m.boiler_eff = pyen.Param(initialize=boil_param['eta'])
+    m.boiler_max_cap, m.boiler_eff = (pyen.Param(initialize=0, mutable=True) for i in range(2))
 
     # CHP
-    chp_param = devices['chp']
-    m.chp_elec_effic = pyen.Param(m.t, initialize=chp_param['eta'][0])
-    m.chp_ther_effic = pyen.Param(m.t, initialize=chp_param['eta'][1])
-    m.chp_elec_run = pyen.Param(m.t, initialize=chp_param['maxpow'])
-    m.chp_heat_run = pyen.Param(m.t, initialize=0, mutable=True)
-    m.chp_gas_run = pyen.Param(m.t, initialize=0, mutable=True)
+    m.chp_elec_effic, m.chp_ther_effic, m.chp_elec_run, m.chp_heat_run, m.chp_gas_run = \
+        (pyen.Param(m.t, initialize=0, mutable=True) for i in range(5))
 
     # solar
-    pv_param = devices['pv']
     # m.pv_effic = pyen.Param(initialize=pv_param['eta'])
-    m.pv_peak_power = pyen.Param(initialize=pv_param['maxpow'])
+    m.pv_peak_power = pyen.Param(initialize=0, mutable=True)
     m.solar = pyen.Param(m.t, initialize=1, mutable=True)
     m.solar_act = pyen.Param(m.t, initialize=1, mutable=True)
     m.grid_export =  pyen.Param(m.t, initialize=1, mutable=True)
@@ -164,49 +141,6 @@ def create_model(ems_local):
 
     # lastprofil
     m.lastprofil_heat, m.lastprofil_elec = (pyen.Param(m.t, initialize=1, mutable=True) for i in range(2))
-    
-    for t in m.t:
-        # weather data
-        m.ele_price_in[t] = time_series.loc[t]['ele_price_in']
-        m.gas_price[t] = time_series.loc[t]['gas_price']
-        m.ele_price_out[t] = time_series.loc[t]['ele_price_out']
-        m.lastprofil_heat[t] = time_series.loc[t]['load_heat']
-        m.lastprofil_elec[t] = time_series.loc[t]['load_elec']
-        m.solar[t] = time_series.loc[t]['solar_power']
-        
-        
-        # fill the ev availability
-        m.ev_aval[t] = ev_aval[t]
-        #m.bat_aval[t] = bat_aval[t]
-        # calculate the spline function for thermal power of heat pump
-        spl_elec_pow = UnivariateSpline(list(map(float, hp_elec_cap.columns.values)),
-                                        list(hp_elec_cap.loc[hp_supply_temp, :]))
-        m.hp_elec_pow[t] = spl_elec_pow(time_series.loc[t]['temperature'] + 273.15).item(0)
-        # calculate the spline function for COP of heat pump
-        spl_cop = UnivariateSpline(list(map(float, hp_cop.columns.values)), list(hp_cop.loc[hp_supply_temp, :]))
-        m.hp_COP[t] = spl_cop(time_series.loc[t]['temperature'] + 273.15).item(0)
-        m.hp_ther_pow[t] = m.hp_elec_pow[t] * m.hp_COP[t]
-        # calculate the chp electric and thermal power when it's running
-        m.chp_heat_run[t] = m.chp_elec_run[t] / m.chp_elec_effic[t] * m.chp_ther_effic[t]
-        m.chp_gas_run[t] = m.chp_elec_run[t] / m.chp_elec_effic[t]
-        
-        
-        m.solar_act[t] = time_series.loc[t]['solar_power']
-        if 'type_flex' in ems_local['reoptim']:
-            
-
-            if 'grid_export' in ems_local['optplan']:
-                m.grid_export[t] = ems_local['optplan']['grid_export'][t]
-                m.grid_import[t] = ems_local['optplan']['grid_import'][t]
-                m.flex_type[t] = ems_local['reoptim']['type_flex'][t]
-                m.flex_value[t] = ems_local['reoptim']['flex_value'][t]
-            else:
-                m.flex_type[t] = 0 
-            
-            
-            
-
-    # m.ele_price = ele_price
 
     # Variables
 
@@ -215,24 +149,29 @@ def create_model(ems_local):
     m.CHP_run = pyen.Var(m.t, within=pyen.Boolean,
                          doc='operation of the CHP')
 
-    m.ev_power = pyen.Var(m.t, within=pyen.NonNegativeReals, bounds=(ev_param['minpow'], ev_param['maxpow']),
+    m.ev_power = pyen.Var(m.t, within=pyen.NonNegativeReals,
                           doc='power of the EV')
     m.boiler_cap, m.PV_cap, m.elec_import, m.elec_export, m.bat_cont, m.sto_e_cont, m.bat_pow_pos, m.bat_pow_neg, \
     m.ev_cont, m.ev_var_pow, m.soc_diff, m.roomtemp = (pyen.Var(m.t, within=pyen.NonNegativeReals) for i in range(12))
     m.sto_e_pow, m.costs, m.heatextra = (pyen.Var(m.t, within=pyen.Reals) for i in range(3))
 
-    # Constrains
+    # write the forecasts and device parameters into the model (variables of absent devices are fixed to 0)
+    update_model(m, ems_local)
+
+    # Constrains, only the ones of present devices are created
+    active = active_devices(ems_local)
 
     # heat_storage
-    def sto_e_cont_def_rule(m, t):
-        if t > m.t[1]:
-            return m.sto_e_cont[t] == m.sto_e_cont[t - 1] + m.sto_e_pow[t] * p2e
-        else:
-            return m.sto_e_cont[t] == m.sto_max_cont * m.SOC_init / 100 + m.sto_e_pow[t] * p2e
+    if active['sto']:
+        def sto_e_cont_def_rule(m, t):
+            if t > m.t[1]:
+                return m.sto_e_cont[t] == m.sto_e_cont[t - 1] + m.sto_e_pow[t] * p2e
+            else:
+                return m.sto_e_cont[t] == m.sto_max_cont * m.SOC_init / 100 + m.sto_e_pow[t] * p2e
 
-    m.sto_e_cont_def = pyen.Constraint(m.t,
-                                       rule=sto_e_cont_def_rule,
-                                       doc='heat_storage_balance')
+        m.sto_e_cont_def = pyen.Constraint(m.t,
+                                           rule=sto_e_cont_def_rule,
+                                           doc='heat_storage_balance')
 
     def heat_balance_rule(m, t):
         return m.boiler_cap[t] + m.CHP_run[t] * m.chp_heat_run[t] + \
@@ -270,24 +209,25 @@ def create_model(ems_local):
     # m.heat_room_end = pyen.Constraint(m.t, rule=heat_room_end_rule)
 
     # battery
-    def battery_e_cont_def_rule(m, t):
-        if t > m.t[1]:
-            return m.bat_cont[t] == m.bat_cont[t - 1] + (
-                    m.bat_pow_pos[t] * m.bat_eta - m.bat_pow_neg[t] / m.bat_eta) * p2e
-        else:
-            return m.bat_cont[t] == m.bat_cont_max * m.bat_SOC_init / 100 + (m.bat_pow_pos[t] * m.bat_eta -
-                                                                             m.bat_pow_neg[t] / m.bat_eta) * p2e
+    if active['bat']:
+        def battery_e_cont_def_rule(m, t):
+            if t > m.t[1]:
+                return m.bat_cont[t] == m.bat_cont[t - 1] + (
+                        m.bat_pow_pos[t] * m.bat_eta - m.bat_pow_neg[t] / m.bat_eta) * p2e
+            else:
+                return m.bat_cont[t] == m.bat_cont_max * m.bat_SOC_init / 100 + (m.bat_pow_pos[t] * m.bat_eta -
+                                                                                 m.bat_pow_neg[t] / m.bat_eta) * p2e
 
-    m.bat_e_cont_def = pyen.Constraint(m.t,
-                                       rule=battery_e_cont_def_rule,
-                                       doc='battery_balance')
+        m.bat_e_cont_def = pyen.Constraint(m.t,
+                                           rule=battery_e_cont_def_rule,
+                                           doc='battery_balance')
     
     
     
 
         
     def elec_export_rule(m, t):
-        if m.flex_type[t] == 1:
+        if value(m.flex_type[t]) == 1:
             
             def solar_power_max(m,t):
                 return m.solar_act[t] <= m.solar[t] 
@@ -297,8 +237,8 @@ def create_model(ems_local):
             return m.elec_export[t] == m.grid_export[t] - m.flex_value[t]
         
         
-        elif m.flex_type[t] == 2:
-            return m.elec_export[t] == value(m.grid_export[t] + m.flex_value[t])
+        elif value(m.flex_type[t]) == 2:
+            return m.elec_export[t] == m.grid_export[t] + m.flex_value[t]
         
         # elif m.flex_type[t] == 3:
         #     if value(m.grid_export[t]) > 0 and value(m.grid_export[t]) >= value(m.flex_value[t]):
@@ -355,28 +295,29 @@ def create_model(ems_local):
                                  rule=cost_sum_rule)
 
     # ev battery balance
-    def ev_cont_def_rule(m, t):
-        if t > m.t[1]:
-            return m.ev_cont[t] == m.ev_cont[t - 1] + m.ev_power[t] * p2e * m.ev_eta - m.ev_var_pow[t]
-        else:
-            return m.ev_cont[t] == m.ev_sto_cap * ev_soc_init[0] / 100 + m.ev_power[t] * p2e * m.ev_eta
+    if active['ev']:
+        def ev_cont_def_rule(m, t):
+            if t > m.t[1]:
+                return m.ev_cont[t] == m.ev_cont[t - 1] + m.ev_power[t] * p2e * m.ev_eta - m.ev_var_pow[t]
+            else:
+                return m.ev_cont[t] == m.ev_sto_cap * m.ev_soc_init / 100 + m.ev_power[t] * p2e * m.ev_eta
 
-    m.ev_cont_def = pyen.Constraint(m.t, rule=ev_cont_def_rule, doc='EV_balance')
+        m.ev_cont_def = pyen.Constraint(m.t, rule=ev_cont_def_rule, doc='EV_balance')
 
-    def EV_end_soc_rule(m, t):
-        return m.ev_cont[t] >= m.ev_sto_cap * ev_end_soc_check[t] / 100 - m.soc_diff[t]
+        def EV_end_soc_rule(m, t):
+            return m.ev_cont[t] >= m.ev_sto_cap * m.ev_end_soc_check[t] / 100 - m.soc_diff[t]
 
-    m.EV_end_soc_def = pyen.Constraint(m.t, rule=EV_end_soc_rule)
+        m.EV_end_soc_def = pyen.Constraint(m.t, rule=EV_end_soc_rule)
 
-    def EV_init_soc_rule(m, t):
-        return m.ev_cont[t] <= m.ev_sto_cap * ev_init_soc_check[t] / 100
+        def EV_init_soc_rule(m, t):
+            return m.ev_cont[t] <= m.ev_sto_cap * m.ev_init_soc_check[t] / 100
 
-    m.EV_init_soc_def = pyen.Constraint(m.t, rule=EV_init_soc_rule)
+        m.EV_init_soc_def = pyen.Constraint(m.t, rule=EV_init_soc_rule)
 
-    def EV_aval_rule(m, t):
-        return m.ev_power[t] <= m.ev_aval[t] * m.ev_max_pow
+        def EV_aval_rule(m, t):
+            return m.ev_power[t] <= m.ev_aval[t] * m.ev_max_pow
 
-    m.EV_aval_def = pyen.Constraint(m.t, rule=EV_aval_rule)
+        m.EV_aval_def = pyen.Constraint(m.t, rule=EV_aval_rule)
 
     # hp
     def hp_min_still_t_rule(m, t):
@@ -403,17 +344,19 @@ def create_model(ems_local):
     # m.chp_min_lauf_t_def = pyen.Constraint(m.t_UP, rule=chp_min_lauf_t_rule)
 
     # boiler
-    def boiler_max_cap_rule(m, t):
-        return m.boiler_cap[t] <= m.boiler_max_cap
+    if active['boiler']:
+        def boiler_max_cap_rule(m, t):
+            return m.boiler_cap[t] <= m.boiler_max_cap
 
-    m.boiler_max_cap_def = pyen.Constraint(m.t, rule=boiler_max_cap_rule)
+        m.boiler_max_cap_def = pyen.Constraint(m.t, rule=boiler_max_cap_rule)
 
     # PV
-    def pv_max_cap_rule(m, t):
-        return m.PV_cap[t] <= m.pv_peak_power
+    if active['pv']:
+        def pv_max_cap_rule(m, t):
+            return m.PV_cap[t] <= m.pv_peak_power
 
-    m.pv_max_cap_def = pyen.Constraint(m.t,
-                                       rule=pv_max_cap_rule)
+        m.pv_max_cap_def = pyen.Constraint(m.t,
+                                           rule=pv_max_cap_rule)
 
    
   
@@ -423,7 +366,7 @@ def create_model(ems_local):
 
     # storage
     # storage content
-    if m.sto_max_cont > 0:
+    if active['sto']:
         def sto_e_cont_min_rule(m, t):
             return m.sto_e_cont[t] / m.sto_max_cont >= 0.1
 
@@ -435,7 +378,7 @@ def create_model(ems_local):
 
         m.sto_e_cont_max = pyen.Constraint(m.t,
                                            rule=sto_e_cont_max_rule)
-    if m.bat_cont_max > 0:
+    if active['bat']:
         def bat_e_cont_min_rule(m, t):
             return m.bat_cont[t] / m.bat_cont_max >= 0.1
 
@@ -449,47 +392,51 @@ def create_model(ems_local):
 
     # storage power
 
-    def sto_e_max_pow_rule_1(m, t):
-        return m.sto_e_pow[t] <= m.sto_max_cont
+    if active['sto']:
+        def sto_e_max_pow_rule_1(m, t):
+            return m.sto_e_pow[t] <= m.sto_max_cont
 
-    m.sto_e_pow_max_1 = pyen.Constraint(m.t,
-                                        rule=sto_e_max_pow_rule_1)
+        m.sto_e_pow_max_1 = pyen.Constraint(m.t,
+                                            rule=sto_e_max_pow_rule_1)
 
-    def sto_e_max_pow_rule_2(m, t):
-        return m.sto_e_pow[t] >= -m.sto_max_cont
+        def sto_e_max_pow_rule_2(m, t):
+            return m.sto_e_pow[t] >= -m.sto_max_cont
 
-    m.sto_e_pow_max_2 = pyen.Constraint(m.t,
-                                        rule=sto_e_max_pow_rule_2)
+        m.sto_e_pow_max_2 = pyen.Constraint(m.t,
+                                            rule=sto_e_max_pow_rule_2)
 
-    def bat_e_max_pow_rule_1(m, t):
-        #return m.bat_pow_pos[t] <= min(m.bat_power_max , m.bat_cont_max )*m.bat_aval[t]
-        if m.flex_type[t] == 3:
-            return m.bat_pow_pos[t] == m.bat_power_max
-        elif m.flex_type[t] == 4:
-            return m.bat_pow_pos[t] ==0 
-        else:
-            return m.bat_pow_pos[t] <= min(m.bat_power_max , m.bat_cont_max )
-    
+    if active['bat']:
+        def bat_e_max_pow_rule_1(m, t):
+            #return m.bat_pow_pos[t] <= min(m.bat_power_max , m.bat_cont_max )*m.bat_aval[t]
+            if value(m.flex_type[t]) == 3:
+                return m.bat_pow_pos[t] == m.bat_power_max
+            elif value(m.flex_type[t]) == 4:
+                return m.bat_pow_pos[t] ==0 
+            else:
+                return m.bat_pow_pos[t] <= m.bat_pow_lim
 
-    m.bat_e_pow_max_1 = pyen.Constraint(m.t,
-                                        rule=bat_e_max_pow_rule_1)
 
-    def bat_e_max_pow_rule_2(m, t):
-        if m.flex_type[t] == 3:
-            return m.bat_pow_neg[t] ==0 
-        elif m.flex_type[t] == 4:
-            
-            return m.bat_pow_neg[t] == m.bat_power_max 
-        else:
-            return m.bat_pow_neg[t] <= min(m.bat_power_max , m.bat_cont_max )
-        #return m.bat_pow_neg[t] <= min(m.bat_power_max , m.bat_cont_max )* m.bat_aval[t]
+        m.bat_e_pow_max_1 = pyen.Constraint(m.t,
+                                            rule=bat_e_max_pow_rule_1)
+
+        def bat_e_max_pow_rule_2(m, t):
+            if value(m.flex_type[t]) == 3:
+                return m.bat_pow_neg[t] ==0 
+            elif value(m.flex_type[t]) == 4:
+
+                return m.bat_pow_neg[t] == m.bat_power_max 
+            else:
+                return m.bat_pow_neg[t] <= m.bat_pow_lim
+            #return m.bat_pow_neg[t] <= min(m.bat_power_max , m.bat_cont_max )* m.bat_aval[t]
 
-    m.bat_e_pow_max_2 = pyen.Constraint(m.t,
-                                        rule=bat_e_max_pow_rule_2)
+        m.bat_e_pow_max_2 = pyen.Constraint(m.t,
+                                            rule=bat_e_max_pow_rule_2)
 
     # end state of storage and battery
-    m.sto_e_cont_end = pyen.Constraint(expr=(m.sto_e_cont[m.t[-1]] >= 0.5 * m.sto_max_cont))
-    m.bat_e_cont_end = pyen.Constraint(expr=(m.bat_cont[m.t[-1]] >= 0.5 * m.bat_cont_max))
+    if active['sto']:
+        m.sto_e_cont_end = pyen.Constraint(expr=(m.sto_e_cont[m.t[-1]] >= 0.5 * m.sto_max_cont))
+    if active['bat']:
+        m.bat_e_cont_end = pyen.Constraint(expr=(m.bat_cont[m.t[-1]] >= 0.5 * m.bat_cont_max))
 
     def obj_rule(m):
         # Return sum of total costs over all cost types.
@@ -504,6 +451,214 @@ def create_model(ems_local):
     return m
 
 
+def update_model(m, ems_local):
+    """ write the forecasts and device parameters of the ems model into the mutable parameters of model m
+    Args:
+        - m: optimization model instance created by create_model with the same structure as the ems model
+        - ems_local: ems model which has been parameterized
+
+    Return:
+        - m: optimization model instance with updated parameters
+    """
+    devices = ems_local['devices']
+    timesteps = np.arange(ems_local['time_data']['isteps'], ems_local['time_data']['nsteps'])
+    index = timesteps.tolist()
+    # write in the time series from the data
+    time_series = pd.DataFrame.from_dict(ems_local['fcst']).loc[timesteps]
+
+    # heat_storage
+    sto_param = devices['sto']
+    m.sto_max_cont.value = sto_param['stocap']
+    m.SOC_init.value = sto_param['initSOC']
+    m.temp_min.value = sto_param['mintemp']
+    m.temp_max.value = sto_param['maxtemp']
+
+    # battery
+    bat_param = devices['bat']
+    m.bat_cont_max.value = bat_param['stocap']
+    m.bat_SOC_init.value = bat_param['initSOC']
+    m.bat_power_max.value = bat_param['maxpow']
+    m.bat_eta.value = bat_param['eta']
+    m.bat_pow_lim.value = min(bat_param['maxpow'], bat_param['stocap'])
+
+    # heat pump
+    hp_param = devices['hp']
+    # electric power and COP of the heat pump for the whole temperature forecast
+    hp_elec_pow, hp_cop = get_hp_performance(hp_param, time_series['temperature'])
+    m.hp_elec_pow.store_values(dict(zip(index, hp_elec_pow)))
+    m.hp_COP.store_values(dict(zip(index, hp_cop)))
+    m.hp_ther_pow.store_values(dict(zip(index, hp_elec_pow * hp_cop)))
+    m.hp_themInertia.value = hp_param['thermInertia']
+    m.hp_minTemp.value = hp_param['minTemp']
+    m.hp_maxTemp.value = hp_param['maxTemp']
+    m.hp_heatgain.value = hp_param['heatgain']
+
+    # elec_vehicle
+    ev_param = devices['ev']
+    m.ev_min_pow.value = ev_param['minpow']
+    m.ev_max_pow.value = ev_param['maxpow']
+    m.ev_sto_cap.value = ev_param['stocap']
+    m.ev_eta.value = ev_param['eta']
+    m.ev_soc_init.value = ev_param['initSOC'][0]
+    m.ev_aval.store_values({t: ev_param['aval'][t] for t in index})
+    m.ev_init_soc_check.store_values({t: ev_param['init_soc_check'][t] for t in index})
+    m.ev_end_soc_check.store_values({t: ev_param['end_soc_check'][t] for t in index})
+    for t in index:
+        m.ev_power[t].setlb(ev_param['minpow'])
+        m.ev_power[t].setub(ev_param['maxpow'])
+        # clear the result of a previous solve, so that a failed solve is detected in extract_res
+        m.costs[t].value = None
+
+    # boilder
+    boil_param = devices['boiler']
+    m.boiler_max_cap.value = boil_param['maxpow']
+    m.boiler_eff.value = boil_param['eta']
+
+    # CHP
+    chp_param = devices['chp']
+    chp_elec_effic, chp_ther_effic = float(chp_param['eta'][0]), float(chp_param['eta'][1])
+    chp_elec_run = float(chp_param['maxpow'])
+    m.chp_elec_effic.store_values(chp_elec_effic)
+    m.chp_ther_effic.store_values(chp_ther_effic)
+    m.chp_elec_run.store_values(chp_elec_run)
+    # calculate the chp electric and thermal power when it's running
+    m.chp_heat_run.store_values(chp_elec_run / chp_elec_effic * chp_ther_effic)
+    m.chp_gas_run.store_values(chp_elec_run / chp_elec_effic)
+
+    # solar
+    m.pv_peak_power.value = devices['pv']['maxpow']
+    m.solar.store_values(dict(zip(index, time_series['solar_power'])))
+    m.solar_act.store_values(dict(zip(index, time_series['solar_power'])))
+
+    # price
+    m.ele_price_in.store_values(dict(zip(index, time_series['ele_price_in'])))
+    m.gas_price.store_values(dict(zip(index, time_series['gas_price'])))
+    m.ele_price_out.store_values(dict(zip(index, time_series['ele_price_out'])))
+
+    # lastprofil
+    m.lastprofil_heat.store_values(dict(zip(index, time_series['load_heat'])))
+    m.lastprofil_elec.store_values(dict(zip(index, time_series['load_elec'])))
+
+    # flexibility offer of the re-optimization
+    m.flex_type.store_values(dict(zip(index, _flex_type(ems_local))))
+    if 'type_flex' in ems_local['reoptim'] and 'grid_export' in ems_local['optplan']:
+        m.grid_export.store_values({t: ems_local['optplan']['grid_export'][t] for t in index})
+        m.grid_import.store_values({t: ems_local['optplan']['grid_import'][t] for t in index})
+        m.flex_value.store_values({t: ems_local['reoptim']['flex_value'][t] for t in index})
+
+    # the variables of absent devices are fixed to 0 and not passed to the solver
+    active = active_devices(ems_local)
+    for device, var_names in DEVICE_VARIABLES.items():
+        for var_name in var_names:
+            if active[device]:
+                getattr(m, var_name).unfix()
+            else:
+                getattr(m, var_name).fix(0)
+
+    return m
+
+
+# variables which only belong to one device, they are fixed to 0 if the device is absent (see active_devices), also
+# used by the SparseModel
+DEVICE_VARIABLES = {'hp': ['hp_run'],
+                    'chp': ['CHP_run'],
+                    'ev': ['ev_power', 'ev_cont', 'ev_var_pow', 'soc_diff'],
+                    'bat': ['bat_cont', 'bat_pow_pos', 'bat_pow_neg'],
+                    'sto': ['sto_e_cont', 'sto_e_pow'],
+                    'boiler': ['boiler_cap'],
+                    'pv': ['PV_cap']}
+
+
+def active_devices(ems_local):
+    """ check which devices of the ems model are present, i.e. have a power (and a storage capacity if needed)
+    Args:
+        - ems_local: ems model which has been parameterized
+
+    Return:
+        - dict with True for every present device and False for every absent one
+    """
+    devices = ems_local['devices']
+
+    return {'hp': devices['hp']['maxpow'] > 0,
+            'chp': devices['chp']['maxpow'] > 0,
+            'ev': devices['ev']['maxpow'] > 0,
+            'bat': devices['bat']['maxpow'] > 0 and devices['bat']['stocap'] > 0,
+            'sto': devices['sto']['stocap'] > 0,
+            'boiler': devices['boiler']['maxpow'] > 0,
+            'pv': devices['pv']['maxpow'] > 0}
+
+
+def _flex_type(ems_local):
+    """ get the type of the selected flexibility offer for every time step (0 if no offer is re-optimized)
+    Args:
+        - ems_local: ems model which has been parameterized
+
+    Return:
+        - list with the flexibility type of every time step
+    """
+    timesteps = range(ems_local['time_data']['isteps'], ems_local['time_data']['nsteps'])
+    if 'type_flex' in ems_local['reoptim'] and 'grid_export' in ems_local['optplan']:
+        return [ems_local['reoptim']['type_flex'][t] for t in timesteps]
+    else:
+        return [0] * len(timesteps)
+
+
+def _model_signature(ems_local):
+    """ collect all settings of the ems model which determine the structure of the optimization model
+    Args:
+        - ems_local: ems model which has been parameterized
+
+    Return:
+        - tuple which is equal for all ems models that can share one optimization model
+    """
+    time_data = ems_local['time_data']
+
+    return (time_data['isteps'], time_data['nsteps'], time_data['t_inval'],
+            tuple(sorted(active_devices(ems_local).items())),
+            'flex_value' in ems_local['reoptim'], tuple(_flex_type(ems_local)))
+
+
+class ModelTemplate:
+    """ optimization model which is built once for a given horizon and device set and only re-parameterized for
+    further solves, e.g. when forecasts or device parameters change in a parameter sweep
+
+    If an ems model requires another model structure (other horizon, devices added/removed, other re-optimized
+    flexibility offer), the model is rebuilt automatically.
+    """
+
+    def __init__(self, ems_local=None):
+        """
+        Args:
+            - ems_local: ems model which has been parameterized, if None the model is built at the first update
+        """
+        self.model = None
+        self.signature = None
+        self.n_builds = 0
+        self.n_updates = 0
+        if ems_local is not None:
+            self.update(ems_local)
+
+    def update(self, ems_local):
+        """ rewrite the mutable parameters of the model with the data of the ems model (or rebuild the model if the
+        structure has changed)
+        Args:
+            - ems_local: ems model which has been parameterized
+
+        Return:
+            - m: optimization model instance which is ready to be solved
+        """
+        signature = _model_signature(ems_local)
+        if self.model is None or signature != self.signature:
+            self.model = create_model(ems_local)
+            self.signature = signature
+            self.n_builds += 1
+        else:
+            update_model(self.model, ems_local)
+            self.n_updates += 1
+
+        return self.model
+
+
 def solve_model(m, solver, time_limit=100, min_gap=0.001, troubleshooting=True):
     """ solve the optimization problem and save the results in instance m
     Args:
@@ -534,147 +689,259 @@ def solve_model(m, solver, time_limit=100, min_gap=0.001, troubleshooting=True):
     return m
 
 
-def extract_res(m, ems):
+# names of the mip gap options of the appsi solvers whose configuration has no mip_gap
+_APPSI_GAP_OPTIONS = {'cbc': 'ratioGap'}
+
+
+class SolverSession:
+    """ solver which is kept alive across several solves, e.g. in a parameter sweep
+
+    If Pyomo has an in-process "appsi_<solver>" interface for the solver (Pyomo >= 6 with e.g. HiGHS, Gurobi, CPLEX or
+    CBC), the model is passed to the solver once and appsi only pushes the changed parameters, bounds and fixed
+    variables to the solver for further solves. Otherwise every solve falls back to solve_model(), which writes a
+    problem file and starts the solver as a subprocess; this always applies to GLPK, which has no in-process interface.
+    The durations of all solves are recorded in timings.
+    """
+
+    def __init__(self, solver, time_limit=100, min_gap=0.001, troubleshooting=True):
+        """
+        Args:
+            - solver: solver to be used, e.g. "glpk", "gurobi", "cplex"...
+            - time_limit: time limit (in seconds) terminating the optimization
+            - min_gap: relative gap between the lower and upper objective bound to terminate the optimization
+            - troubleshooting: show the solver log
+        """
+        self.solver = solver
+        self.time_limit = time_limit
+        self.min_gap = min_gap
+        self.troubleshooting = troubleshooting
+        self.interface = 'shell'
+        self.optimizer = None
+        self.timings = []
+
+        if 'appsi_' + solver in SolverFactory:
+            optimizer = SolverFactory('appsi_' + solver)
+            if optimizer.available(exception_flag=False):
+                self.optimizer = optimizer
+                self.interface = 'appsi'
+                # solve to the same relative gap as solve_model
+                if 'mip_gap' in optimizer.config:
+                    optimizer.config.mip_gap = min_gap
+                elif solver in _APPSI_GAP_OPTIONS:
+                    optimizer.options[_APPSI_GAP_OPTIONS[solver]] = min_gap
+
+    def solve(self, m):
+        """ solve the optimization problem and save the results in instance m
+        Args:
+            - m: optimization model instance, e.g. created by create_model or ModelTemplate.update
+
+        Return:
+            - m: optimization model instance with results
+
+        Raises:
+            - NoSolutionError: the appsi solver found no feasible solution, e.g. within the time limit
+        """
+        t_start = tm.time()
+        if self.interface == 'shell':
+            solve_model(m, self.solver, time_limit=self.time_limit, min_gap=self.min_gap,
+                        troubleshooting=self.troubleshooting)
+        else:
+            # appsi solvers detect the changes of the model since the last solve by themselves, the solution is only
+            # loaded if the solver found one, other errors of the solver are raised
+            results = self.optimizer.solve(m, load_solutions=False, tee=self.troubleshooting,
+                                           timelimit=self.time_limit)
+            if len(results.solution) == 0:
+                raise NoSolutionError('the solver can not find a solution: ' +
+                                      results.solver.termination_message)
+            m.solutions.load_from(results)
+
+        self.timings.append({'interface': self.interface, 'solve': tm.time() - t_start})
+
+        return m
+
+    def summary(self):
+        """ statistics of the recorded solve durations
+
+        Return:
+            - dict with the number of solves, the total and the mean duration in seconds
+        """
+        durations = [timing['solve'] for timing in self.timings]
+
+        return {'interface': self.interface, 'n_solves': len(durations), 'total': sum(durations),
+                'mean': sum(durations) / len(durations) if durations else 0}
+
+
+def extract_res(m, ems, as_arrays=False):
     """ extract the results from instance m and save it into ems model
     Args:
         - m: optimization model instance with results
         - ems: ems model to be filled with optimization results
+        - as_arrays: if True, the columns of ems['optplan'] are NumPy arrays instead of lists
 
     """
 
     # check if the results are available
     try:
-        get_value(m.ev_power[ems['time_data']['isteps']])
+        get_value(m.costs[ems['time_data']['isteps']])
     except ValueError as error:
         print(error)
-        raise ImportError(
+        raise NoSolutionError(
             'the solver can not find a solution, try to change the device parameters to fulfill the requirements')
     timesteps = np.arange(ems['time_data']['isteps'], ems['time_data']['nsteps'])
-    length = len(timesteps)
 
-    # print('Load Results ...\n')
+    # read every variable and parameter in one pass over the time steps
+    res = {name: _indexed_values(getattr(m, name), timesteps) for name in RESULT_COMPONENTS}
+    res.update({'ev_sto_cap': get_value(m.ev_sto_cap), 'bat_cont_max': get_value(m.bat_cont_max),
+                'sto_max_cont': get_value(m.sto_max_cont)})
 
-    # electricity variable
-    HP_ele_cap, HP_ele_run, elec_import, elec_export, lastprofil_elec, ev_pow, ev_soc, CHP_cap, pv_power, bat_cont, \
-    bat_power, pv_pv2demand, pv_pv2grid, bat_grid2bat, bat_power_pos, bat_power_neg, CHP_elec_run, CHP_operation, \
-    elec_supply_price, opt_ele_price = (np.zeros(length) for i in range(20))
-    # heat variable
-    boiler_cap, CHP_heat_run, HP_heat_run, HP_heat_cap, CHP_operation, HP_operation, lastprofil_heat, sto_e_pow, \
-    sto_e_pow_pos, CHP_gas_run, sto_e_pow_neg, sto_e_cont, HP_room_temp = (np.zeros(length) for i in range(13))
+    ems['optplan'] = compose_optplan(res, as_arrays)
 
-    # COP - HP
-    HP_cop = np.zeros(length)
+    return ems
 
-    # final cost
-    cost_min = np.zeros(length)
-    # heat balance
 
-    bat_max_cont = get_value(m.bat_cont_max)
-    sto_cont_max = get_value(m.sto_max_cont)
-
-    i = 0
-
-    # timesteps = sorted(get_entity(prob, 't').index)
-    # demand, ext, pro, sto = get_timeseries(prob, timesteps
-
-    for idx in timesteps:
-        # electricity balance
-
-        ev_pow[i] = get_value(m.ev_power[idx])
-        ev_soc[i] = get_value(m.ev_cont[idx]) / get_value(m.ev_sto_cap) * 100 if get_value(m.ev_sto_cap) > 0 else 0
-        elec_import[i] = get_value(m.elec_import[idx])
-        elec_export[i] = get_value(m.elec_export[idx])
-        lastprofil_elec[i] = get_value(m.lastprofil_elec[idx])
-        pv_power[i] = get_value(m.PV_cap[idx] * m.solar[idx])
-
-        bat_cont[i] = get_value(m.bat_cont[idx])
-        bat_power_pos[i] = get_value(m.bat_pow_neg[idx])
-        bat_power_neg[i] = -get_value(m.bat_pow_pos[idx])
-        pv_pv2demand[i] = min(pv_power[i], lastprofil_elec[i])
-        pv_pv2grid[i] = max(0, min(pv_power[i] - pv_pv2demand[i] + bat_power_neg[i], elec_export[i]))
-        bat_grid2bat[i] = min(elec_import[i], -bat_power_neg[i])
-
-        ##heat balance
-        boiler_cap[i] = get_value(m.boiler_cap[idx])
-        # CHP
-        if get_value(m.chp_elec_run[idx]) > 0:
-            CHP_operation[i] = get_value(m.CHP_run[idx])
-            CHP_cap[i] = get_value(m.CHP_run[idx] * m.chp_elec_run[idx])
-            CHP_heat_run[i] = get_value(m.chp_heat_run[idx])
-            CHP_elec_run[i] = get_value(m.chp_elec_run[idx])
-            CHP_gas_run[i] = get_value(m.chp_gas_run[idx])
-        # HP
-        if get_value(m.hp_ther_pow[idx]) > 0:
-            HP_operation[i] = get_value(m.hp_run[idx])
-            HP_heat_cap[i] = get_value(m.hp_run[idx] * m.hp_ther_pow[idx])
-            HP_ele_cap[i] = get_value(m.hp_run[idx] * m.hp_elec_pow[idx])
-            HP_heat_run[i] = get_value(m.hp_ther_pow[idx])
-            HP_ele_run[i] = get_value(m.hp_elec_pow[idx])
-            # HP_room_temp[i] = value(prob.roomtemp[idx])
-
-        # supply prices
-
-        elec_supply_price[i] = (elec_import[i] * get_value(m.ele_price_in[idx]) + pv_power[i] * get_value(
-            m.ele_price_out[idx]) + CHP_gas_run[i] * CHP_operation[i] * get_value(m.gas_price[idx]) + 0.000011) / \
-                               (elec_import[i] + pv_power[i] + CHP_cap[i] + 0.0001)
-        lastprofil_heat[i] = get_value(m.lastprofil_heat[idx])
-        sto_e_pow[i] = get_value(m.sto_e_pow[idx])
-        sto_e_cont[i] = get_value(m.sto_e_cont[idx])
-
-        # Optimized electricity price (Import - Export)
-        opt_ele_price[i] = elec_import[i] * get_value(m.ele_price_in[idx]) - pv_pv2grid[i] \
-                           * get_value(m.ele_price_out[idx]) - (elec_export[i] - pv_pv2grid[i]) * get_value(
-            m.gas_price[idx])
-
-        # COP heat
-        HP_cop[i] = get_value(m.hp_COP[idx])
-
-        # the total cost
-        cost_min[i] = get_value(m.costs[idx])
-
-        i += 1
-
-    SOC_heat = sto_e_cont / sto_cont_max * 100 if sto_cont_max > 0 else 0 * sto_e_cont
-    SOC_elec = bat_cont / bat_max_cont * 100 if bat_max_cont > 0 else 0 * bat_cont
-    # battery_power
+# indexed variables and parameters which are needed to compose the optimization results with compose_optplan, read
+# by extract_res and extract_sparse_res
+RESULT_COMPONENTS = ['ev_power', 'ev_cont', 'elec_import', 'elec_export', 'PV_cap', 'bat_cont', 'bat_pow_pos',
+                     'bat_pow_neg', 'boiler_cap', 'CHP_run', 'hp_run', 'sto_e_pow', 'sto_e_cont', 'costs',
+                     'lastprofil_elec', 'lastprofil_heat', 'solar', 'chp_elec_run', 'chp_heat_run', 'chp_gas_run',
+                     'hp_ther_pow', 'hp_elec_pow', 'hp_COP', 'ele_price_in', 'ele_price_out', 'gas_price']
 
-    # heat storage power
-    for i in range(length):
-        if sto_e_pow[i] > 0:
-            sto_e_pow_neg[i] = -sto_e_pow[i]
-        else:
-            sto_e_pow_pos[i] = -sto_e_pow[i]
-
-    data_input = {'HP_operation': list(HP_operation),
-                  'HP_heat_power': list(HP_heat_cap),
-                  'HP_elec_power': list(HP_ele_cap),
-                  'HP_heat_run': list(HP_heat_run),
-                  'HP_ele_run': list(HP_ele_run),
-                  'CHP_operation': list(CHP_operation),
-                  'CHP_elec_pow': list(CHP_operation * CHP_elec_run),
-                  'CHP_heat_pow': list(CHP_operation * CHP_heat_run),
-                  'CHP_heat_run': list(CHP_heat_run),
-                  'CHP_elec_run': list(CHP_elec_run),
-                  'CHP_gas_run': list(CHP_gas_run),
-                  'boiler_heat_power': list(boiler_cap),
-                  'sto_heat_power_neg': list(sto_e_pow_neg),
-                  'sto_heat_power_pos': list(sto_e_pow_pos),
-                  'Last_heat': list(lastprofil_heat),
-                  'SOC_heat': list(SOC_heat),
-                  'SOC_elec': list(SOC_elec),
-                  'PV_power': list(pv_power), 'pv_pv2demand': list(pv_pv2demand), 'pv_pv2grid': list(pv_pv2grid),
-                  'grid_import': list(elec_import),
-                  'Last_elec': list(lastprofil_elec), 'grid_export': list(elec_export),
-                  'bat_grid2bat': list(bat_grid2bat),
-                  'bat_input_power': list(-bat_power_neg), 'bat_output_power': list(bat_power_pos),
-                  'bat_SOC': list(SOC_elec),
-                  'EV_power': list(ev_pow),
-                  'EV_SOC': list(ev_soc),
-                  'elec_supply_price': list(elec_supply_price),
-                  'min cost': list(cost_min),
-                  'HP_COP': list(HP_cop),
-                  'opt_ele_price': list(opt_ele_price)}
-
-    ems['optplan'] = data_input
 
-    return ems
+def _indexed_values(component, timesteps):
+    """ read the values of an indexed variable or parameter
+    Args:
+        - component: indexed Pyomo variable or mutable parameter
+        - timesteps: indices to be read
+
+    Return:
+        - array with the values (NaN for variables without value)
+    """
+    return np.array([component[t].value for t in timesteps], dtype=float)
+
+
+def compose_optplan(res, as_arrays=False):
+    """ compose the columns of ems['optplan'] from the values of the variables and parameters, independent of the model
+    which was solved (Pyomo model or SparseModel)
+    Args:
+        - res: dict with arrays of the components in RESULT_COMPONENTS and the scalars ev_sto_cap, bat_cont_max and
+          sto_max_cont
+        - as_arrays: if True, the columns are NumPy arrays instead of lists
+
+    Return:
+        - dict with the optimization results
+    """
+    # electricity balance
+    ev_pow = res['ev_power']
+    ev_soc = res['ev_cont'] / res['ev_sto_cap'] * 100 if res['ev_sto_cap'] > 0 else np.zeros(len(ev_pow))
+    elec_import = res['elec_import']
+    elec_export = res['elec_export']
+    lastprofil_elec = res['lastprofil_elec']
+    pv_power = res['PV_cap'] * res['solar']
+    bat_cont = res['bat_cont']
+    bat_power_pos = res['bat_pow_neg']
+    bat_power_neg = -res['bat_pow_pos']
+    pv_pv2demand = np.minimum(pv_power, lastprofil_elec)
+    pv_pv2grid = np.maximum(0, np.minimum(pv_power - pv_pv2demand + bat_power_neg, elec_export))
+    bat_grid2bat = np.minimum(elec_import, -bat_power_neg)
+
+    # heat balance
+    boiler_cap = res['boiler_cap']
+    # CHP
+    chp_on = res['chp_elec_run'] > 0
+    CHP_operation = np.where(chp_on, res['CHP_run'], 0)
+    CHP_elec_run = np.where(chp_on, res['chp_elec_run'], 0)
+    CHP_heat_run = np.where(chp_on, res['chp_heat_run'], 0)
+    CHP_gas_run = np.where(chp_on, res['chp_gas_run'], 0)
+    CHP_cap = CHP_operation * CHP_elec_run
+    # HP
+    hp_on = res['hp_ther_pow'] > 0
+    HP_operation = np.where(hp_on, res['hp_run'], 0)
+    HP_heat_run = np.where(hp_on, res['hp_ther_pow'], 0)
+    HP_ele_run = np.where(hp_on, res['hp_elec_pow'], 0)
+    HP_heat_cap = HP_operation * HP_heat_run
+    HP_ele_cap = HP_operation * HP_ele_run
+
+    # supply prices
+    elec_supply_price = (elec_import * res['ele_price_in'] + pv_power * res['ele_price_out'] +
+                         CHP_gas_run * CHP_operation * res['gas_price'] + 0.000011) / \
+                        (elec_import + pv_power + CHP_cap + 0.0001)
+    sto_e_pow = res['sto_e_pow']
+    sto_e_cont = res['sto_e_cont']
+
+    # Optimized electricity price (Import - Export)
+    opt_ele_price = elec_import * res['ele_price_in'] - pv_pv2grid * res['ele_price_out'] - \
+                    (elec_export - pv_pv2grid) * res['gas_price']
+
+    SOC_heat = sto_e_cont / res['sto_max_cont'] * 100 if res['sto_max_cont'] > 0 else 0 * sto_e_cont
+    SOC_elec = bat_cont / res['bat_cont_max'] * 100 if res['bat_cont_max'] > 0 else 0 * bat_cont
+
+    # heat storage power
+    sto_e_pow_neg = np.where(sto_e_pow > 0, -sto_e_pow, 0)
+    sto_e_pow_pos = np.where(sto_e_pow > 0, 0, -sto_e_pow)
+
+    data_input = {'HP_operation': HP_operation,
+                  'HP_heat_power': HP_heat_cap,
+                  'HP_elec_power': HP_ele_cap,
+                  'HP_heat_run': HP_heat_run,
+                  'HP_ele_run': HP_ele_run,
+                  'CHP_operation': CHP_operation,
+                  'CHP_elec_pow': CHP_operation * CHP_elec_run,
+                  'CHP_heat_pow': CHP_operation * CHP_heat_run,
+                  'CHP_heat_run': CHP_heat_run,
+                  'CHP_elec_run': CHP_elec_run,
+                  'CHP_gas_run': CHP_gas_run,
+                  'boiler_heat_power': boiler_cap,
+                  'sto_heat_power_neg': sto_e_pow_neg,
+                  'sto_heat_power_pos': sto_e_pow_pos,
+                  'Last_heat': res['lastprofil_heat'],
+                  'SOC_heat': SOC_heat,
+                  'SOC_elec': SOC_elec,
+                  'PV_power': pv_power, 'pv_pv2demand': pv_pv2demand, 'pv_pv2grid': pv_pv2grid,
+                  'grid_import': elec_import,
+                  'Last_elec': lastprofil_elec, 'grid_export': elec_export,
+                  'bat_grid2bat': bat_grid2bat,
+                  'bat_input_power': -bat_power_neg, 'bat_output_power': bat_power_pos,
+                  'bat_SOC': SOC_elec,
+                  'EV_power': ev_pow,
+                  'EV_SOC': ev_soc,
+                  'elec_supply_price': elec_supply_price,
+                  'min cost': res['costs'],
+                  'HP_COP': res['hp_COP'],
+                  'opt_ele_price': opt_ele_price}
+
+    if not as_arrays:
+        data_input = {key: list(val) for key, val in data_input.items()}
+
+    return data_input
+
+
+if __name__ == '__main__':
+    # benchmark: time to build the model and to extract the results against the length of the horizon
+    from opentumflex.configuration.set_time import initialize_time_setting
+    from opentumflex.scenarios.scenarios import scenario_apartment
+
+    for n_days in [1, 3, 7, 14]:
+        end_time = pd.Timestamp('2019-12-18 00:00') + pd.Timedelta(days=n_days) - pd.Timedelta('15min')
+        bench_ems = initialize_time_setting(0, t_inval=15, start_time='2019-12-18 00:00',
+                                            end_time=end_time.strftime('%Y-%m-%d %H:%M'))
+        n_steps = bench_ems['time_data']['nsteps']
+        bench_ems['fcst'] = {'temperature': list(np.random.rand(n_steps) * 10),
+                             'solar_power': list(np.random.rand(n_steps) * 5),
+                             'load_heat': list(np.random.rand(n_steps) * 2),
+                             'load_elec': list(np.random.rand(n_steps)),
+                             'ele_price_in': list(np.random.rand(n_steps) * 0.1 + 0.25),
+                             'gas_price': [0.07] * n_steps,
+                             'ele_price_out': [0.11] * n_steps}
+        bench_ems = scenario_apartment(bench_ems)
+        t_build = tm.time()
+        bench_m = create_model(bench_ems)
+        print('{} days ({} time steps): model built in {:.3f} s'.format(n_days, n_steps, tm.time() - t_build))
+        # random values instead of a solution, the extraction does not depend on the solver
+        for bench_var in bench_m.component_data_objects(pyen.Var):
+            if not bench_var.fixed:
+                bench_var.value = np.random.rand()
+        for bench_as_arrays in [False, True]:
+            t_extract = tm.time()
+            extract_res(bench_m, bench_ems, as_arrays=bench_as_arrays)
+            print('{} days ({} time steps): results extracted in {:.4f} s (as_arrays={})'.format(
+                n_days, n_steps, tm.time() - t_extract, bench_as_arrays))
@@ -0,0 +1,349 @@
+"""
+The "sparse_model.py" assembles the optimization problem of "model.py" directly as scipy.sparse matrices and solves it
+with HiGHS (scipy.optimize.milp), without generating Pyomo expressions
+"""
+
+__author__ = "Zhengjie You"
+__copyright__ = "2020 TUM-EWK"
+__credits__ = []
+__license__ = "GPL v3.0"
+__version__ = "1.0"
+__maintainer__ = "Zhengjie You"
+__email__ = "zhengjie.you@tum.de"
+__status__ = "Development"
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+import time as tm
+from opentumflex.configuration.devices import get_hp_performance
+from opentumflex.optimization.model import NoSolutionError, active_devices, compose_optplan, DEVICE_VARIABLES, \
+    RESULT_COMPONENTS
+
+# variables of the model, every variable has one column per time step
+VARIABLES = ['hp_run', 'CHP_run', 'ev_power', 'boiler_cap', 'PV_cap', 'elec_import', 'elec_export', 'bat_cont',
+             'sto_e_cont', 'bat_pow_pos', 'bat_pow_neg', 'ev_cont', 'ev_var_pow', 'soc_diff', 'sto_e_pow', 'costs']
+# binary variables
+BINARIES = ['hp_run', 'CHP_run']
+# variables without lower bound
+FREE_VARIABLES = ['sto_e_pow', 'costs']
+
+
+class SparseModel:
+    """ optimization problem of one ems model in matrix form:
+
+        min c*x  s.t.  con_lb <= A*x <= con_ub,  var_lb <= x <= var_ub,  x[integrality == 1] binary
+
+    The columns of variable v are columns[v] (one per time step), the values of the solution are stored in x.
+    """
+
+    def __init__(self, nsteps):
+        """
+        Args:
+            - nsteps: number of time steps of the optimization horizon
+        """
+        self.nsteps = nsteps
+        self.columns = {var: slice(i * nsteps, (i + 1) * nsteps) for i, var in enumerate(VARIABLES)}
+        self.n_cols = len(VARIABLES) * nsteps
+        self.c = np.zeros(self.n_cols)
+        self.var_lb = np.zeros(self.n_cols)
+        self.var_ub = np.full(self.n_cols, np.inf)
+        self.integrality = np.zeros(self.n_cols)
+        self.A = None
+        self.con_lb = None
+        self.con_ub = None
+        self.param = {}
+        self.x = None
+        self.status = None
+        self.message = ''
+        self._rows, self._cols, self._data, self._lb, self._ub = [], [], [], [], []
+        self._n_rows = 0
+
+    def add_rows(self, terms, lb, ub):
+        """ add one constraint per time step: lb[t] <= sum(coef[t] * var[t - lag]) <= ub[t]
+        Args:
+            - terms: list of (variable name, coefficient (scalar or array), lag), terms with lag > 0 are left out for
+              the first time steps
+            - lb: lower bound of the constraints (scalar or array)
+            - ub: upper bound of the constraints (scalar or array)
+        """
+        n = self.nsteps
+        for var, coef, lag in terms:
+            coef = np.broadcast_to(np.asarray(coef, dtype=float), (n,))
+            start = self.columns[var].start
+            self._rows.append(self._n_rows + np.arange(lag, n))
+            self._cols.append(start + np.arange(0, n - lag))
+            self._data.append(coef[lag:])
+        self._lb.append(np.broadcast_to(np.asarray(lb, dtype=float), (n,)))
+        self._ub.append(np.broadcast_to(np.asarray(ub, dtype=float), (n,)))
+        self._n_rows += n
+
+    def set_bounds(self, var, lb=None, ub=None):
+        """ set the bounds of all columns of a variable
+        Args:
+            - var: variable name
+            - lb: lower bound (scalar or array), unchanged if None
+            - ub: upper bound (scalar or array), unchanged if None
+        """
+        if lb is not None:
+            self.var_lb[self.columns[var]] = lb
+        if ub is not None:
+            self.var_ub[self.columns[var]] = ub
+
+    def finalize(self):
+        """ assemble the constraint matrix from all added rows """
+        self.A = sp.csr_matrix((np.concatenate(self._data), (np.concatenate(self._rows), np.concatenate(self._cols))),
+                               shape=(self._n_rows, self.n_cols))
+        self.con_lb = np.concatenate(self._lb)
+        self.con_ub = np.concatenate(self._ub)
+        self._rows, self._cols, self._data, self._lb, self._ub = [], [], [], [], []
+
+    def value(self, var):
+        """ values of a variable in the solution
+        Args:
+            - var: variable name
+
+        Return:
+            - array with one value per time step
+        """
+        return self.x[self.columns[var]]
+
+
+def _model_parameters(ems_local):
+    """ collect the forecasts and device parameters of the ems model as arrays over the optimization horizon
+    Args:
+        - ems_local: ems model which has been parameterized
+
+    Return:
+        - dict with scalar device parameters and time series
+    """
+    devices = ems_local['devices']
+    timesteps = np.arange(ems_local['time_data']['isteps'], ems_local['time_data']['nsteps'])
+    time_series = pd.DataFrame.from_dict(ems_local['fcst']).loc[timesteps]
+    hp_elec_pow, hp_cop = get_hp_performance(devices['hp'], time_series['temperature'])
+    chp_param = devices['chp']
+    chp_elec_effic, chp_ther_effic = float(chp_param['eta'][0]), float(chp_param['eta'][1])
+    chp_elec_run = float(chp_param['maxpow'])
+    ev_param = devices['ev']
+    n = len(timesteps)
+
+    param = {'p2e': ems_local['time_data']['t_inval'] / 60,
+             'sto_max_cont': devices['sto']['stocap'], 'SOC_init': devices['sto']['initSOC'],
+             'bat_cont_max': devices['bat']['stocap'], 'bat_SOC_init': devices['bat']['initSOC'],
+             'bat_power_max': devices['bat']['maxpow'], 'bat_eta': devices['bat']['eta'],
+             'bat_pow_lim': min(devices['bat']['maxpow'], devices['bat']['stocap']),
+             'hp_elec_pow': hp_elec_pow, 'hp_COP': hp_cop, 'hp_ther_pow': hp_elec_pow * hp_cop,
+             'ev_min_pow': ev_param['minpow'], 'ev_max_pow': ev_param['maxpow'], 'ev_sto_cap': ev_param['stocap'],
+             'ev_eta': ev_param['eta'], 'ev_soc_init': ev_param['initSOC'][0],
+             'ev_aval': np.asarray(ev_param['aval'], dtype=float)[timesteps],
+             'ev_init_soc_check': np.asarray(ev_param['init_soc_check'], dtype=float)[timesteps],
+             'ev_end_soc_check': np.asarray(ev_param['end_soc_check'], dtype=float)[timesteps],
+             'boiler_max_cap': devices['boiler']['maxpow'], 'boiler_eff': devices['boiler']['eta'],
+             'chp_elec_run': np.full(n, chp_elec_run),
+             'chp_heat_run': np.full(n, chp_elec_run / chp_elec_effic * chp_ther_effic),
+             'chp_gas_run': np.full(n, chp_elec_run / chp_elec_effic),
+             'pv_peak_power': devices['pv']['maxpow'],
+             'solar': time_series['solar_power'].to_numpy(dtype=float),
+             'solar_act': time_series['solar_power'].to_numpy(dtype=float),
+             'ele_price_in': time_series['ele_price_in'].to_numpy(dtype=float),
+             'ele_price_out': time_series['ele_price_out'].to_numpy(dtype=float),
+             'gas_price': time_series['gas_price'].to_numpy(dtype=float),
+             'lastprofil_heat': time_series['load_heat'].to_numpy(dtype=float),
+             'lastprofil_elec': time_series['load_elec'].to_numpy(dtype=float),
+             'flex_type': np.zeros(n)}
+
+    # flexibility offer of the re-optimization
+    if 'type_flex' in ems_local['reoptim'] and 'grid_export' in ems_local['optplan']:
+        param['flex_type'] = np.asarray(ems_local['reoptim']['type_flex'], dtype=float)[timesteps]
+        param['grid_export'] = np.asarray(ems_local['optplan']['grid_export'], dtype=float)[timesteps]
+        param['flex_value'] = np.asarray(ems_local['reoptim']['flex_value'], dtype=float)[timesteps]
+
+    return param
+
+
+def create_sparse_model(ems_local):
+    """ create the optimization problem of create_model() as sparse matrices
+    Args:
+        - ems_local: ems model which has been parameterized
+
+    Return:
+        - sm: SparseModel instance created according to ems model
+    """
+    p = _model_parameters(ems_local)
+    active = active_devices(ems_local)
+    n = ems_local['time_data']['nsteps'] - ems_local['time_data']['isteps']
+    p2e = p['p2e']
+    first = np.zeros(n)
+    first[0] = 1
+    sm = SparseModel(n)
+    sm.param = p
+
+    # variable types and bounds
+    for var in BINARIES:
+        sm.integrality[sm.columns[var]] = 1
+        sm.set_bounds(var, ub=1)
+    for var in FREE_VARIABLES:
+        sm.set_bounds(var, lb=-np.inf)
+    sm.set_bounds('ev_power', lb=p['ev_min_pow'], ub=p['ev_max_pow'])
+    sm.set_bounds('boiler_cap', ub=p['boiler_max_cap'])
+    sm.set_bounds('PV_cap', ub=p['pv_peak_power'])
+    sm.set_bounds('sto_e_pow', lb=-p['sto_max_cont'], ub=p['sto_max_cont'])
+    if p['sto_max_cont'] > 0:
+        sm.set_bounds('sto_e_cont', lb=0.1 * p['sto_max_cont'], ub=0.9 * p['sto_max_cont'])
+    if p['bat_cont_max'] > 0:
+        sm.set_bounds('bat_cont', lb=0.1 * p['bat_cont_max'], ub=0.9 * p['bat_cont_max'])
+
+    # battery power, fixed by the re-optimized flexibility offer (type 3: charging, type 4: discharging)
+    pos_lb, pos_ub = np.zeros(n), np.full(n, float(p['bat_pow_lim']))
+    neg_lb, neg_ub = np.zeros(n), np.full(n, float(p['bat_pow_lim']))
+    charge, discharge = p['flex_type'] == 3, p['flex_type'] == 4
+    pos_lb[charge] = pos_ub[charge] = p['bat_power_max']
+    neg_ub[charge] = 0
+    pos_ub[discharge] = 0
+    neg_lb[discharge] = neg_ub[discharge] = p['bat_power_max']
+    sm.set_bounds('bat_pow_pos', lb=pos_lb, ub=pos_ub)
+    sm.set_bounds('bat_pow_neg', lb=neg_lb, ub=neg_ub)
+
+    # electricity import/export, fixed by the re-optimized flexibility offer (type 1: neg, type 2: pos)
+    exp_lb, exp_ub = np.zeros(n), np.full(n, 50 * 5000.)
+    for flex_type, sign in [(1, -1), (2, 1)]:
+        sel = p['flex_type'] == flex_type
+        if not sel.any():
+            continue
+        exp_ub[sel] = p['grid_export'][sel] + sign * p['flex_value'][sel]
+        # a negative export keeps the lower bound of 0 and leaves the problem infeasible, as in create_model()
+        exp_lb[sel] = np.maximum(exp_ub[sel], 0)
+    sm.set_bounds('elec_export', lb=exp_lb, ub=exp_ub)
+    sm.set_bounds('elec_import', ub=50 * 5000)
+
+    # end state of storage and battery
+    sm.var_lb[sm.columns['sto_e_cont'].stop - 1] = max(sm.var_lb[sm.columns['sto_e_cont'].stop - 1],
+                                                       0.5 * p['sto_max_cont'])
+    sm.var_lb[sm.columns['bat_cont'].stop - 1] = max(sm.var_lb[sm.columns['bat_cont'].stop - 1],
+                                                     0.5 * p['bat_cont_max'])
+
+    # heat storage balance
+    if active['sto']:
+        sto_init = first * p['sto_max_cont'] * p['SOC_init'] / 100
+        sm.add_rows([('sto_e_cont', 1, 0), ('sto_e_cont', -1, 1), ('sto_e_pow', -p2e, 0)], sto_init, sto_init)
+
+    # heat balance
+    sm.add_rows([('boiler_cap', 1, 0), ('CHP_run', p['chp_heat_run'], 0), ('hp_run', p['hp_ther_pow'], 0),
+                 ('sto_e_pow', -1, 0)], p['lastprofil_heat'], p['lastprofil_heat'])
+
+    # battery balance
+    if active['bat']:
+        bat_init = first * p['bat_cont_max'] * p['bat_SOC_init'] / 100
+        sm.add_rows([('bat_cont', 1, 0), ('bat_cont', -1, 1), ('bat_pow_pos', -p2e * p['bat_eta'], 0),
+                     ('bat_pow_neg', p2e / p['bat_eta'], 0)], bat_init, bat_init)
+
+    # electricity balance
+    sm.add_rows([('elec_import', 1, 0), ('CHP_run', p['chp_elec_run'], 0), ('PV_cap', p['solar_act'], 0),
+                 ('elec_export', -1, 0), ('hp_run', -p['hp_elec_pow'], 0), ('bat_pow_pos', -1, 0),
+                 ('bat_pow_neg', 1, 0), ('ev_power', -1, 0)], p['lastprofil_elec'], p['lastprofil_elec'])
+
+    # costs
+    sm.add_rows([('costs', 1, 0), ('boiler_cap', -p2e * p['gas_price'] / p['boiler_eff'], 0),
+                 ('CHP_run', -p2e * p['chp_gas_run'] * p['gas_price'], 0),
+                 ('elec_import', -p2e * p['ele_price_in'], 0), ('elec_export', p2e * p['ele_price_out'], 0),
+                 ('soc_diff', -1000, 0)], 0, 0)
+
+    # ev battery balance
+    if active['ev']:
+        ev_init = first * p['ev_sto_cap'] * p['ev_soc_init'] / 100
+        sm.add_rows([('ev_cont', 1, 0), ('ev_cont', -1, 1), ('ev_power', -p2e * p['ev_eta'], 0),
+                     ('ev_var_pow', 1 - first, 0)], ev_init, ev_init)
+
+        # ev state of charge and availability
+        sm.add_rows([('ev_cont', 1, 0), ('soc_diff', 1, 0)], p['ev_sto_cap'] * p['ev_end_soc_check'] / 100, np.inf)
+        sm.add_rows([('ev_cont', 1, 0)], -np.inf, p['ev_sto_cap'] * p['ev_init_soc_check'] / 100)
+        sm.add_rows([('ev_power', 1, 0)], -np.inf, p['ev_aval'] * p['ev_max_pow'])
+
+    # the variables of absent devices are fixed to 0 (absent heat pump and CHP make the problem an LP)
+    for device, var_names in DEVICE_VARIABLES.items():
+        if not active[device]:
+            for var in var_names:
+                sm.set_bounds(var, lb=0, ub=0)
+                sm.integrality[sm.columns[var]] = 0
+
+    # objective: sum of the costs
+    sm.c[sm.columns['costs']] = 1
+    sm.finalize()
+
+    return sm
+
+
+def solve_sparse_model(sm, time_limit=100, min_gap=0.001, troubleshooting=True):
+    """ solve the sparse optimization problem with HiGHS and save the results in sm.x
+    Args:
+        - sm: SparseModel instance
+        - time_limit: time limit (in seconds) terminating the optimization
+        - min_gap: relative gap between the lower and upper objective bound to terminate the optimization
+        - troubleshooting: show the solver log
+
+    Return:
+        - sm: SparseModel instance with results
+    """
+    try:
+        from scipy.optimize import milp, Bounds, LinearConstraint
+    except ImportError:
+        raise ImportError('the sparse model requires scipy>=1.9 (scipy.optimize.milp with HiGHS)')
+
+    res = milp(sm.c, integrality=sm.integrality, bounds=Bounds(sm.var_lb, sm.var_ub),
+               constraints=LinearConstraint(sm.A, sm.con_lb, sm.con_ub),
+               options={'time_limit': time_limit, 'mip_rel_gap': min_gap, 'disp': troubleshooting})
+    sm.status, sm.message = res.status, res.message
+    sm.x = res.x
+    if sm.x is not None:
+        # remove the numerical noise of the binary variables
+        binary = sm.integrality == 1
+        sm.x[binary] = np.round(sm.x[binary])
+
+    return sm
+
+
+def extract_sparse_res(sm, ems, as_arrays=False):
+    """ extract the results from the solved SparseModel and save them into ems model with the same layout as
+    extract_res()
+    Args:
+        - sm: SparseModel instance with results
+        - ems: ems model to be filled with optimization results
+        - as_arrays: if True, the columns of ems['optplan'] are NumPy arrays instead of lists
+
+    """
+    if sm.x is None:
+        print(sm.message)
+        raise NoSolutionError(
+            'the solver can not find a solution, try to change the device parameters to fulfill the requirements')
+
+    res = {name: sm.value(name) if name in sm.columns else sm.param[name] for name in RESULT_COMPONENTS}
+    res.update({'ev_sto_cap': sm.param['ev_sto_cap'], 'bat_cont_max': sm.param['bat_cont_max'],
+                'sto_max_cont': sm.param['sto_max_cont']})
+
+    ems['optplan'] = compose_optplan(res, as_arrays)
+
+    return ems
+
+
+if __name__ == '__main__':
+    # benchmark: time to build the sparse model against the length of the horizon
+    from opentumflex.configuration.set_time import initialize_time_setting
+    from opentumflex.scenarios.scenarios import scenario_apartment
+
+    for n_days in [1, 3, 7, 14]:
+        end_time = pd.Timestamp('2019-12-18 00:00') + pd.Timedelta(days=n_days) - pd.Timedelta('15min')
+        bench_ems = initialize_time_setting(0, t_inval=15, start_time='2019-12-18 00:00',
+                                            end_time=end_time.strftime('%Y-%m-%d %H:%M'))
+        n_steps = bench_ems['time_data']['nsteps']
+        bench_ems['fcst'] = {'temperature': list(np.random.rand(n_steps) * 10),
+                             'solar_power': list(np.random.rand(n_steps) * 5),
+                             'load_heat': list(np.random.rand(n_steps) * 2),
+                             'load_elec': list(np.random.rand(n_steps)),
+                             'ele_price_in': list(np.random.rand(n_steps) * 0.1 + 0.25),
+                             'gas_price': [0.07] * n_steps,
+                             'ele_price_out': [0.11] * n_steps}
+        bench_ems = scenario_apartment(bench_ems)
+        t_build = tm.time()
+        create_sparse_model(bench_ems)
+        print('{} days ({} time steps): sparse model built in {:.4f} s'.format(n_days, n_steps,
+                                                                              tm.time() - t_build))
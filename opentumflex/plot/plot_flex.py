@@ -17,6 +17,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import gridspec
 
+from opentumflex.flexibility.flex_table import flex_frame
+
 
 def plot_flex(my_ems, device):  
     """
@@ -42,7 +44,7 @@ def plot_flex(my_ems, device):
         isteps = my_ems['time_data']['isteps']
         nsteps = my_ems['time_data']['nsteps']
         ntsteps = my_ems['time_data']['ntsteps']
-        dat1 = pd.DataFrame.from_dict(my_ems['flexopts'][device])
+        dat1 = flex_frame(my_ems['flexopts'][device])
         ts_raw = my_ems['time_data']['time_slots'][isteps:nsteps]
         ts_hr = pd.to_datetime(ts_raw).strftime('%H:%M').to_list()
         ts_date = pd.to_datetime(ts_raw).strftime('%d %b %Y')
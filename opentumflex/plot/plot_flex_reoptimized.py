@@ -7,6 +7,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib import gridspec
 
+from opentumflex.flexibility.flex_table import flex_frame
+
 def plot_cumm_energy_reoptimized(my_ems):
     """
     
@@ -27,8 +29,8 @@ def plot_cumm_energy_reoptimized(my_ems):
     device=my_ems['reoptim']['device']
     nsteps = my_ems['time_data']['nsteps']
     ntsteps = my_ems['time_data']['ntsteps']
-    dat1 = pd.DataFrame.from_dict(my_ems['flexopts'][device])
-    dat2 =  pd.DataFrame.from_dict(my_ems['reoptim']['flexopts'][device])
+    dat1 = flex_frame(my_ems['flexopts'][device])
+    dat2 = flex_frame(my_ems['reoptim']['flexopts'][device])
     index_re=my_ems['time_data']['isteps']
     ts = my_ems['time_data']['time_slots']
       
@@ -206,8 +208,8 @@ def plot_compare_optim_reoptim(my_ems):
     device=my_ems['reoptim']['device']
     nsteps = my_ems['time_data']['nsteps']
     ntsteps = my_ems['time_data']['ntsteps']
-    dat1 = pd.DataFrame.from_dict(my_ems['flexopts'][device])
-    dat2 =  pd.DataFrame.from_dict(my_ems['reoptim']['flexopts'][device])
+    dat1 = flex_frame(my_ems['flexopts'][device])
+    dat2 = flex_frame(my_ems['reoptim']['flexopts'][device])
     index_re=my_ems['time_data']['isteps']
     ts = my_ems['time_data']['time_slots']
       
@@ -374,8 +376,8 @@ def plot_flex_reoptimized(my_ems):
     device=my_ems['reoptim']['device']
     nsteps = my_ems['time_data']['nsteps']
     ntsteps = my_ems['time_data']['ntsteps']
-    dat1 = pd.DataFrame.from_dict(my_ems['flexopts'][device])
-    dat2 =  pd.DataFrame.from_dict(my_ems['reoptim']['flexopts'][device])
+    dat1 = flex_frame(my_ems['flexopts'][device])
+    dat2 = flex_frame(my_ems['reoptim']['flexopts'][device])
     index_re=my_ems['time_data']['isteps']
     ts = my_ems['time_data']['time_slots']
     cum_data_reopt=my_ems['reoptim']['cum_data_reopt']
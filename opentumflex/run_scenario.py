@@ -23,7 +23,7 @@ import pandas as pd
 def run_scenario(scenario, path_input, path_results, solver='glpk', time_limit=30, troubleshooting=True,
                  show_opt_balance=True, show_opt_soc=True, show_flex_res=True,
                  save_opt_res=True, show_aggregated_flex=True, save_flex_offers=False,
-                 convert_input_tocsv=True, show_aggregated_flex_price='bar'):
+                 convert_input_tocsv=True, show_aggregated_flex_price='bar', flex_executor=None, flex_workers=None):
     """ run an OpenTUMFlex model for given scenario
 
     Args:
@@ -34,6 +34,9 @@ def run_scenario(scenario, path_input, path_results, solver='glpk', time_limit=3
         - fcst_only: if true, read_data() will only read forecasting data from input file, otherwise it will also read
           device parameters
         - time_limit: determine the maximum duration of optimization in seconds
+        - flex_executor: None to calculate the flexibility of the devices sequentially, 'thread' or 'process' to
+          calculate it concurrently for all devices of both opentumflex objects in a thread or process pool
+        - flex_workers: maximum number of workers of the flex_executor pool
 
     Returns:
         opentumflex dictionary with optimization results and flexibility offers
@@ -101,11 +104,15 @@ def run_scenario(scenario, path_input, path_results, solver='glpk', time_limit=3
                  opentumflex.calc_flex_bat: 'bat',
                  opentumflex.calc_flex_pv: 'pv'}
 
-    # iterate through all the flexibility functions
-    for function, device_name in calc_flex.items():
-        if my_ems['devices'][device_name]['maxpow'] != 0:
-            function(my_ems, reopt=False)
-            function(full_ems, reopt=False)
+    # calculate the flexibility of all active devices for both opentumflex objects
+    active_flex = {function: device_name for function, device_name in calc_flex.items()
+                   if my_ems['devices'][device_name]['maxpow'] != 0}
+    flex_timings = opentumflex.calc_flex_devices([my_ems, full_ems], active_flex, executor=flex_executor,
+                                                 max_workers=flex_workers)
+    for ems_name, timings in zip(['my_ems', 'full_ems'], flex_timings):
+        print('### Flexibility calculation of ' + ems_name + ' (' + str(flex_executor) + '):',
+              ', '.join('{} {:.3f} s'.format(device_name, duration) for device_name, duration in timings.items()),
+              '###')
 
     # plot the results of flexibility calculation
     if show_flex_res:
@@ -136,8 +143,8 @@ def run_scenario(scenario, path_input, path_results, solver='glpk', time_limit=3
     
     key_list = list(my_ems['flexopts'])
     for comp in key_list:
-        
-        A = pd.concat([A, my_ems['flexopts'][comp]['Pos_P'], my_ems['flexopts'][comp]['Neg_P']],axis=1)
+        flex = opentumflex.flex_frame(my_ems['flexopts'][comp])
+        A = pd.concat([A, flex['Pos_P'], flex['Neg_P']],axis=1)
     
     
     print(A)
@@ -76,7 +76,7 @@ def run_scenario_reopt(scenario, old_ems,full_ems, path_results,reopt_data=[0 ,
     key_list = list(old_ems['flexopts'])
     for ind_para in key_list:
         my_ems['flexopts'][ind_para] = full_ems['flexopts'][ind_para][full_ems_start_step:full_ems_start_step+96]
-        my_ems['flexopts'][ind_para].reset_index(drop=True, inplace=True )
+        my_ems['flexopts'][ind_para] = my_ems['flexopts'][ind_para].reset_index(drop=True)
     key_list = list(old_ems['fcst'])
     my_ems['fcst'] ={}
     for ind_para in key_list:
@@ -0,0 +1,73 @@
+"""
+Parity test of the battery flexibility against the outputs of calc_flex_bat before its vectorization. The reference
+data/flex_bat_reference.npz holds the optimal plans of the bundled scenarios that solve with the input data (ev,
+simple house, residential house, mini apartment) and of seeded random plans, and the seven flexibility columns
+calculated from them. The random plans have powers in tenths of a kW, few distinct prices and states of charge exactly
+at the bounds, so energies tie with the flexibility energy up to the rounding of their sums (random_150 changes with a
+differently rounded sum).
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from opentumflex.flexibility.flex_bat import calc_flex_bat, calc_flex_bat_batch
+from opentumflex.flexibility.flex_table import FLEX_COLUMNS
+
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'flex_bat_reference.npz')
+SCENARIOS = ['scenario_ev', 'scenario_simple_house', 'scenario_residential_house', 'scenario_mini_apartment'] + \
+            ['random_{}'.format(seed) for seed in list(range(10)) + [150]]
+
+
+@pytest.fixture(scope='module')
+def reference():
+    with np.load(REFERENCE_PATH) as data:
+        return {name: data[name] for name in data.files}
+
+
+def reference_ems(reference, scenario):
+    maxpow, minpow, stocap, ntsteps = reference[scenario + '/device']
+    return {'optplan': {key: list(reference[scenario + '/' + key])
+                        for key in ('bat_grid2bat', 'bat_input_power', 'bat_output_power', 'bat_SOC')},
+            'fcst': {'ele_price_in': list(reference[scenario + '/ele_price_in'])},
+            'time_data': {'ntsteps': int(ntsteps)},
+            'devices': {'bat': {'maxpow': maxpow, 'minpow': minpow, 'stocap': stocap}},
+            'flexopts': {}}
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_calc_flex_bat_matches_reference(reference, scenario):
+    bat_flex = calc_flex_bat(reference_ems(reference, scenario), reopt=0)['flexopts']['bat']
+    for column in FLEX_COLUMNS:
+        np.testing.assert_allclose(np.asarray(bat_flex[column], dtype=float), reference[scenario + '/' + column],
+                                   rtol=1e-12, atol=1e-12, err_msg=scenario + ' ' + column)
+
+
+def test_calc_flex_bat_batch_matches_reference(reference):
+    ems = [reference_ems(reference, scenario) for scenario in SCENARIOS]
+    devices = [my_ems['devices']['bat'] for my_ems in ems]
+    bat_flex = calc_flex_bat_batch(*([my_ems['optplan'][key] for my_ems in ems]
+                                     for key in ('bat_grid2bat', 'bat_input_power', 'bat_output_power', 'bat_SOC')),
+                                   [my_ems['fcst']['ele_price_in'] for my_ems in ems],
+                                   [device['maxpow'] for device in devices], [device['minpow'] for device in devices],
+                                   [device['stocap'] for device in devices], ems[0]['time_data']['ntsteps'])
+    for u, scenario in enumerate(SCENARIOS):
+        for column in FLEX_COLUMNS:
+            np.testing.assert_allclose(bat_flex[column][u], reference[scenario + '/' + column], rtol=1e-12,
+                                       atol=1e-12, err_msg=scenario + ' ' + column)
+
+
+def test_calc_flex_bat_batch_matches_calc_flex_bat(reference):
+    # the units are calculated at once like every unit alone
+    ems = [reference_ems(reference, scenario) for scenario in SCENARIOS if scenario.startswith('random_')]
+    devices = [my_ems['devices']['bat'] for my_ems in ems]
+    bat_flex = calc_flex_bat_batch(*([my_ems['optplan'][key] for my_ems in ems]
+                                     for key in ('bat_grid2bat', 'bat_input_power', 'bat_output_power', 'bat_SOC')),
+                                   [my_ems['fcst']['ele_price_in'] for my_ems in ems],
+                                   [device['maxpow'] for device in devices], [device['minpow'] for device in devices],
+                                   [device['stocap'] for device in devices], ems[0]['time_data']['ntsteps'])
+    for u, my_ems in enumerate(ems):
+        unit_flex = calc_flex_bat(my_ems, reopt=0)['flexopts']['bat']
+        for column in FLEX_COLUMNS:
+            np.testing.assert_array_equal(bat_flex[column][u], unit_flex[column])
@@ -0,0 +1,116 @@
+"""
+Test of the flexibility durations against the loops of flex_hp and flex_chp before flex_duration.py, which are kept
+here as reference. The random operations have the values of a solver, i.e. close to but not exactly 0 or 1, and the
+states of charge change in tenths of a percent from values on a tenth, so many of them reach a bound exactly up to the
+rounding of their sum.
+"""
+
+import numpy as np
+import pytest
+
+from opentumflex.flexibility.flex_duration import dur_max_operation, dur_max_regeneration, dur_max_storage, \
+    next_smaller, suffix_sums
+
+SEEDS = range(40)
+
+
+def old_dur_max_operation(operation):
+    timesteps = len(operation)
+    dur_max_opt = np.zeros(timesteps)
+    for i in range(timesteps):
+        if operation[i] > 0:
+            dur_max_opt[i] = next((x for x, val in enumerate(operation[i:]) if val == 0), timesteps - i) + i - 1
+        else:
+            dur_max_opt[i] = next((x for x, val in enumerate(operation[i:]) if val > 0), timesteps - i) + i - 1
+    return dur_max_opt
+
+
+def old_dur_max_regeneration(operation):
+    timesteps = len(operation)
+    dur_max_reg = np.zeros(timesteps)
+    for i in range(timesteps):
+        if operation[i] > 0:
+            dur_max_reg[i] = min(i + sum(1 - operation[i:]) - 1, timesteps)
+        else:
+            dur_max_reg[i] = min(i + sum(operation[i:]) - 1, timesteps)
+    return dur_max_reg
+
+
+def old_dur_max_storage(soc_heat, soc_change, soc_min):
+    timesteps = len(soc_heat)
+    dur_max_sto = np.zeros(timesteps)
+    for i in range(timesteps):
+        soc = soc_heat[i]
+        idx = i
+        while soc_min < soc < 100:
+            idx += 1
+            if idx > timesteps:
+                break
+            soc += soc_change[idx - 1]
+        dur_max_sto[i] = idx - 2
+    return dur_max_sto
+
+
+def random_operation(seed, timesteps=96):
+    rng = np.random.RandomState(seed)
+    operation = np.repeat(rng.rand(timesteps // 4) > 0.5, 4)[:timesteps].astype(float)
+    # values of a solver: slightly below 1 or above 0
+    noise = rng.choice([0, 0, 1e-10, 3e-9], timesteps)
+    return np.abs(operation - noise)
+
+
+def random_soc(seed, timesteps=96):
+    rng = np.random.RandomState(seed + 1000)
+    soc = np.round(rng.choice([0, 20, 50, 80, 99.9, 100], timesteps) + rng.randint(-3, 4, timesteps) * 0.1, 1)
+    soc_change = rng.choice([-2, -1, 1, 2], timesteps) * rng.choice([0.1, 0.3, 2.5], timesteps)
+    return np.clip(soc, 0, 100), soc_change
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_dur_max_operation_matches_loop(seed):
+    operation = random_operation(seed)
+    np.testing.assert_array_equal(dur_max_operation(operation), old_dur_max_operation(operation))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_dur_max_regeneration_matches_loop(seed):
+    operation = random_operation(seed)
+    np.testing.assert_array_equal(dur_max_regeneration(operation), old_dur_max_regeneration(operation))
+    # the durations are truncated to integers in flex_hp and flex_chp
+    np.testing.assert_array_equal(dur_max_regeneration(operation).astype(int),
+                                  old_dur_max_regeneration(operation).astype(int))
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('soc_min', [0, 20])
+def test_dur_max_storage_matches_loop(seed, soc_min):
+    soc, soc_change = random_soc(seed)
+    np.testing.assert_array_equal(dur_max_storage(soc, soc_change, soc_min),
+                                  old_dur_max_storage(list(soc), list(soc_change), soc_min))
+
+
+def test_dur_max_storage_bounds():
+    # in the order of the loop 99.6 + 0.2 + 0.2 reaches 100 at the third time step, the difference of the changes
+    # cumulated from the first time step (0.1 - 0.3 + 0.2 + 0.2) - (0.1 - 0.3) stays below it
+    soc = [99.7, 0.5, 99.6, 99.6]
+    soc_change = [0.1, -0.3, 0.2, 0.2]
+    np.testing.assert_array_equal(dur_max_storage(soc, soc_change, 0), [3, 3, 2, 3])
+    np.testing.assert_array_equal(dur_max_storage(soc, soc_change, 0), old_dur_max_storage(soc, soc_change, 0))
+
+
+def test_suffix_sums_add_like_loop():
+    values = np.random.RandomState(0).choice([0.1, 0.2, 0.3, 1 / 3], (3, 50))
+    expected = [[sum(row[i:].tolist()) for i in range(len(row))] for row in values]
+    np.testing.assert_array_equal(suffix_sums(values), expected)
+    np.testing.assert_array_equal(suffix_sums(values[0]), expected[0])
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_next_smaller_matches_scan(seed):
+    # one row per length around the powers of two of the binary lifting
+    lengths = [1, 2, 3, 7, 8, 9, 63, 64, 65, 96]
+    values = np.random.RandomState(seed).choice([0, 1.3, 2.5, 2.5, 10], (len(lengths), 96))
+    for row, length in zip(values, lengths):
+        expected = [next((k for k in range(i + 1, length) if row[k] < row[i]), length) for i in range(length)]
+        np.testing.assert_array_equal(next_smaller(row[:length]), expected)
+        np.testing.assert_array_equal(next_smaller(values[:, :length])[lengths.index(length)], expected)
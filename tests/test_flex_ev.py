@@ -0,0 +1,81 @@
+"""
+Parity test of the ev flexibility against the outputs of calc_flex_ev before it was calculated on integer-indexed
+arrays. The reference data/flex_ev_reference.npz holds the charging schedules of the bundled scenarios and of seeded
+random schedules with one or two availability periods, quantized powers and few distinct prices, and the eight
+flexibility columns calculated from them (random_10 has negative offers at maximum power which are reduced to the
+remaining energy). Random schedules on which the old calc_flex_ev raised an IndexError are left out.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from opentumflex.flexibility.flex_ev import calc_flex_ev, calc_flex_ev_batch, EV_FLEX_COLUMNS
+
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'flex_ev_reference.npz')
+CASES = ['scenario_ev', 'scenario_simple_house', 'scenario_residential_house', 'scenario_mini_apartment'] + \
+        ['random_{}'.format(seed) for seed in range(15)]
+
+
+@pytest.fixture(scope='module')
+def reference():
+    with np.load(REFERENCE_PATH) as data:
+        return {name: data[name] for name in data.files}
+
+
+def reference_ems(reference, case):
+    time_slots = pd.Index([str(t) for t in reference[case + '/time_slots']])
+    n_periods = len(reference[case + '/aval_init'])
+    return {'time_data': {'nsteps': len(time_slots), 't_inval': 15, 'ntsteps': 4, 'time_slots': time_slots},
+            'devices': {'ev': {'maxpow': float(reference[case + '/maxpow']), 'aval': [1] * len(time_slots),
+                               'initSOC': [20] * n_periods,
+                               'aval_init': [str(t) for t in reference[case + '/aval_init']],
+                               'aval_end': [str(t) for t in reference[case + '/aval_end']]}},
+            'optplan': {'EV_power': list(reference[case + '/EV_power'])},
+            'fcst': {'ele_price_in': list(reference[case + '/ele_price_in'])},
+            'flexopts': {}}
+
+
+def reference_avail(ems):
+    """ availability periods numbered from 1 on the time steps """
+    ev = ems['devices']['ev']
+    avail = np.zeros(ems['time_data']['nsteps'], dtype=int)
+    for j, (init, end) in enumerate(zip(ev['aval_init'], ev['aval_end'])):
+        avail[ems['time_data']['time_slots'].get_loc(init):ems['time_data']['time_slots'].get_loc(end) + 1] = j + 1
+    return avail
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_calc_flex_ev_matches_reference(reference, case):
+    ev_flex = calc_flex_ev(reference_ems(reference, case))['flexopts']['ev']
+    for column in EV_FLEX_COLUMNS:
+        np.testing.assert_allclose(np.asarray(ev_flex[column], dtype=float), reference[case + '/' + column],
+                                   rtol=1e-12, atol=1e-12, err_msg=case + ' ' + column)
+
+
+def test_calc_flex_ev_batch_matches_reference(reference):
+    ems = [reference_ems(reference, case) for case in CASES]
+    ev_flex = calc_flex_ev_batch([my_ems['optplan']['EV_power'] for my_ems in ems],
+                                 [my_ems['fcst']['ele_price_in'] for my_ems in ems],
+                                 [my_ems['devices']['ev']['maxpow'] for my_ems in ems],
+                                 [reference_avail(my_ems) for my_ems in ems])
+    for u, case in enumerate(CASES):
+        for column in EV_FLEX_COLUMNS:
+            np.testing.assert_allclose(ev_flex[column][u], reference[case + '/' + column], rtol=1e-12, atol=1e-12,
+                                       err_msg=case + ' ' + column)
+
+
+def test_calc_flex_ev_batch_matches_calc_flex_ev(reference):
+    # the periods of all units are calculated at once like the periods of every unit alone, with enough periods to
+    # price them in one step (MIN_ROWS_AT_ONCE)
+    ems = [reference_ems(reference, case) for case in CASES if case.startswith('random_')] * 4
+    ev_flex = calc_flex_ev_batch([my_ems['optplan']['EV_power'] for my_ems in ems],
+                                 [my_ems['fcst']['ele_price_in'] for my_ems in ems],
+                                 [my_ems['devices']['ev']['maxpow'] for my_ems in ems],
+                                 [reference_avail(my_ems) for my_ems in ems])
+    for u, my_ems in enumerate(ems):
+        unit_flex = calc_flex_ev(my_ems)['flexopts']['ev']
+        for column in EV_FLEX_COLUMNS:
+            np.testing.assert_array_equal(ev_flex[column][u], unit_flex[column])
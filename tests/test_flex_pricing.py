@@ -0,0 +1,82 @@
+"""
+Test of the bulk order-statistics queries of the flexibility pricing against the per time step selections they
+replaced, heapq.nsmallest/nlargest in flex_hp and flex_chp and Series.nsmallest/nlargest(k).mean() in flex_ev. The
+random prices take few distinct values so that many of them tie, the windows start up to past the end of the horizon
+and the counts exceed the length of many windows.
+"""
+
+import heapq
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from opentumflex.flexibility.flex_pricing import sum_k_smallest, sum_k_largest, mean_k_smallest, mean_k_largest, \
+    MIN_ROWS_AT_ONCE
+
+SEEDS = range(20)
+
+
+def random_queries(seed, nvalues=96, nqueries=200):
+    rng = np.random.RandomState(seed)
+    values = rng.choice([0.21, 0.25, 0.25, 0.3, 1 / 3, -0.1], nvalues)
+    starts = rng.randint(0, nvalues + 3, nqueries)
+    counts = rng.randint(0, 24, nqueries)
+    return values, starts, counts
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_sum_k_matches_heapq(seed):
+    values, starts, counts = random_queries(seed)
+    sums, taken = sum_k_smallest(values, starts, counts)
+    expected = [heapq.nsmallest(k, list(values[a:])) for a, k in zip(starts, counts)]
+    np.testing.assert_allclose(sums, [sum(x) for x in expected], rtol=1e-12, atol=1e-12)
+    np.testing.assert_array_equal(taken, [len(x) for x in expected])
+
+    sums, taken = sum_k_largest(values, starts, counts)
+    expected = [heapq.nlargest(k, list(values[a:])) for a, k in zip(starts, counts)]
+    np.testing.assert_allclose(sums, [sum(x) for x in expected], rtol=1e-12, atol=1e-12)
+    np.testing.assert_array_equal(taken, [len(x) for x in expected])
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_mean_k_matches_series(seed):
+    values, starts, counts = random_queries(seed)
+    # an empty window gives NaN as the mean of an empty selection of the series
+    prices = pd.Series(values)
+    np.testing.assert_allclose(mean_k_smallest(values, starts, counts),
+                               [prices[a:].nsmallest(k).mean() for a, k in zip(starts, counts)],
+                               rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(mean_k_largest(values, starts, counts),
+                               [prices[a:].nlargest(k).mean() for a, k in zip(starts, counts)],
+                               rtol=1e-12, atol=1e-12)
+
+
+def test_ties_windows_and_empty_windows():
+    values = [0.3, 0.2, 0.2, 0.3, 0.2]
+    starts = [0, 1, 3, 3, 5, 7]
+    counts = [2, 4, 1, 5, 2, 1]
+    sums, taken = sum_k_smallest(values, starts, counts)
+    np.testing.assert_allclose(sums, [0.4, 0.9, 0.2, 0.5, 0, 0])
+    np.testing.assert_array_equal(taken, [2, 4, 1, 2, 0, 0])
+    sums, taken = sum_k_largest(values, starts, counts)
+    np.testing.assert_allclose(sums, [0.6, 0.9, 0.3, 0.5, 0, 0])
+    np.testing.assert_array_equal(taken, [2, 4, 1, 2, 0, 0])
+    np.testing.assert_allclose(mean_k_smallest(values, starts, counts), [0.2, 0.225, 0.2, 0.25, np.nan, np.nan])
+    np.testing.assert_allclose(mean_k_largest(values, starts, counts), [0.3, 0.225, 0.3, 0.25, np.nan, np.nan])
+
+
+@pytest.mark.parametrize('seed', SEEDS)
+@pytest.mark.parametrize('n_rows', [5, MIN_ROWS_AT_ONCE])
+def test_rows_match_single_rows(seed, n_rows):
+    # rows of different lengths, e.g. the availability periods of many evs, are summed like every row alone
+    values, starts, counts = random_queries(seed)
+    lengths = np.resize([96, 30, 1, 0, 65], n_rows)
+    rows = np.random.RandomState(seed).randint(0, len(lengths), len(starts))
+    values = np.array([np.roll(values, row) for row in range(len(lengths))])
+    for function in (sum_k_smallest, sum_k_largest, mean_k_smallest, mean_k_largest):
+        result = function(values, starts, counts, rows, lengths)
+        for row, length in enumerate(lengths):
+            query = rows == row
+            np.testing.assert_array_equal(np.asarray(result)[..., query],
+                                          np.asarray(function(values[row, :length], starts[query], counts[query])))
@@ -0,0 +1,56 @@
+"""
+Parity test of the PV flexibility against the outputs of calc_flex_pv before it was calculated on arrays. The reference
+data/flex_pv_reference.npz holds the optimal plans of the bundled scenarios with PV that solve with the input data (ev,
+simple house, residential house, mini apartment) and of seeded random plans, and the seven flexibility columns
+calculated from them. The random plans have flat plateaus of the PV power and powers in tenths of a kW, so the powers
+fed into the grid and into the battery are equal over several time steps. The old calc_flex_pv didn't read
+pv_pv2demand of the re-optimization (NameError), the re-optimized plan gives the flexibility of the same plan.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from opentumflex.flexibility.flex_pv import calc_flex_pv
+
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'flex_pv_reference.npz')
+CASES = ['scenario_ev', 'scenario_simple_house', 'scenario_residential_house', 'scenario_mini_apartment'] + \
+        ['random_{}'.format(seed) for seed in range(15)]
+PV_FLEX_COLUMNS = ['Sch_P', 'Neg_P', 'Pos_P', 'Neg_E', 'Pos_E', 'Neg_Pr', 'Pos_Pr']
+
+
+@pytest.fixture(scope='module')
+def reference():
+    with np.load(REFERENCE_PATH) as data:
+        return {name: data[name] for name in data.files}
+
+
+def reference_ems(reference, case, reopt=0):
+    optplan = {key: list(reference[case + '/' + key]) for key in ('pv_pv2grid', 'PV_power', 'pv_pv2demand')}
+    ems = {'optplan': optplan,
+           'fcst': {'ele_price_out': list(reference[case + '/ele_price_out'])},
+           'time_data': {'ntsteps': int(reference[case + '/ntsteps'])},
+           'reoptim': {},
+           'flexopts': {}}
+    if reopt == 1:
+        # the plan of the re-optimization differs from the plan of the optimization
+        ems['reoptim']['optplan'] = optplan
+        ems['optplan'] = {key: [0.0] * len(values) for key, values in optplan.items()}
+    return ems
+
+
+@pytest.mark.parametrize('reopt', [0, 1])
+@pytest.mark.parametrize('case', CASES)
+def test_calc_flex_pv_matches_reference(reference, case, reopt):
+    pv_flex = calc_flex_pv(reference_ems(reference, case, reopt), reopt=reopt)['flexopts']['pv']
+    for column in PV_FLEX_COLUMNS:
+        np.testing.assert_array_equal(np.asarray(pv_flex[column], dtype=float), reference[case + '/' + column],
+                                      err_msg=case + ' ' + column)
+
+
+def test_reference_has_plateaus(reference):
+    # the durations end at the first smaller power, not at the first different power
+    for case in CASES[4:]:
+        grid = reference[case + '/pv_pv2grid']
+        assert (np.diff(grid) == 0).any() and (reference[case + '/Neg_E'] != 0).any(), case
@@ -0,0 +1,155 @@
+"""
+Test of read_data with the cache of the parsed input files against the slicing of the input file before the cache,
+which is kept here as reference: the forecasting data of the csv files are the time series rows of the first
+end_step + len(prop) rows of the file from init_time_step on, the csv export of an excel file holds nsteps rows of the
+time series (behind a blank block of device parameters if only the forecasting data are read).
+"""
+
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from opentumflex.configuration import init_ems
+from opentumflex.configuration.init_ems import read_data
+from opentumflex.configuration.set_time import initialize_time_setting
+
+INPUT_PATH = os.path.join(os.path.dirname(__file__), '..', 'input')
+CSV_PATH = os.path.join(INPUT_PATH, 'input_data.csv')
+XLSX_PATH = os.path.join(INPUT_PATH, 'input_data.xlsx')
+WINDOWS = [(0, -1), (0, 96), (10, 96), (0, 0), (0, 5), (95, 96), (3, 40), (0, 10000)]
+
+
+def old_read_csv(path, init_time_step, end_step):
+    csv_data = pd.read_csv(path, sep=';', index_col=0)
+    prop = csv_data.iloc[:, 0:2].dropna(how='all')
+    if end_step == -1:
+        ts = csv_data.iloc[:, 2:].dropna(how='all')
+    else:
+        ts = csv_data.iloc[:end_step + len(prop), 2:].dropna(how='all')
+    ts = ts.iloc[init_time_step:, :]
+    return {key: list(values.values()) for key, values in ts.to_dict('dict').items()}
+
+
+def new_ems():
+    return initialize_time_setting(0, t_inval=15, start_time='2019-12-18 00:00', end_time='2019-12-18 23:45')
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    """ input file with a blank row within the time series """
+    path = str(tmp_path / 'input.csv')
+    lines = open(CSV_PATH).read().splitlines()
+    lines = [line for line in lines if line]
+    first_ts = next(i for i, line in enumerate(lines) if i > 0 and line.split(';')[1:3] == ['', ''])
+    lines.insert(first_ts + 20, ';;;;;;;;;;')
+    with open(path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return path
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    init_ems._input_cache.clear()
+    yield
+    init_ems._input_cache.clear()
+
+
+@pytest.mark.parametrize('path_name', ['bundled', 'blank_row'])
+@pytest.mark.parametrize('init_time_step, end_step', WINDOWS)
+def test_read_data_window_matches_slicing(csv_path, path_name, init_time_step, end_step):
+    path = CSV_PATH if path_name == 'bundled' else csv_path
+    expected = old_read_csv(path, init_time_step, end_step)
+    # the first call parses the file, the second one reads the cache
+    for i in range(2):
+        fcst = read_data(new_ems(), init_time_step, end_step, path)['fcst']
+        assert list(fcst) == list(expected)
+        for key in expected:
+            np.testing.assert_array_equal(fcst[key], expected[key], err_msg=key)
+
+
+def test_read_data_device_parameters(csv_path):
+    ems = read_data(new_ems(), 0, 96, csv_path, fcst_only=False)
+    assert ems['devices']['pv']['maxpow'] == 5.0
+    assert ems['devices']['sto']['stocap'] == 15.0
+    assert isinstance(ems['devices']['ev']['initSOC'], list)
+
+
+def test_read_data_reparses_modified_file(csv_path):
+    load_elec = read_data(new_ems(), 0, 96, csv_path)['fcst']['load_elec']
+    # other content with another size
+    csv_data = open(csv_path).read()
+    with open(csv_path, 'w') as f:
+        f.write(csv_data.replace(';' + str(load_elec[0]) + ';', ';12345.5;', 1))
+    assert read_data(new_ems(), 0, 96, csv_path)['fcst']['load_elec'][0] == 12345.5
+    # other content with the same size, only the time of the modification changes
+    stat = os.stat(csv_path)
+    same_size = '2.' + '5' * (len(str(load_elec[0])) - 2)
+    with open(csv_path, 'w') as f:
+        f.write(csv_data.replace(';' + str(load_elec[0]) + ';', ';' + same_size + ';', 1))
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert os.stat(csv_path).st_size == len(csv_data)
+    assert read_data(new_ems(), 0, 96, csv_path)['fcst']['load_elec'][0] == float(same_size)
+
+
+def test_read_data_sidecar_round_trip(csv_path, monkeypatch):
+    ems = read_data(new_ems(), 0, 96, csv_path, fcst_only=False, sidecar=True)
+    assert os.path.exists(csv_path + '.npz')
+
+    # a new process loads the parsed data from the sidecar instead of parsing the file
+    init_ems._input_cache.clear()
+    with monkeypatch.context() as m:
+        m.setattr(pd, 'read_csv', lambda *args, **kwargs: pytest.fail('the input file is parsed again'))
+        sidecar_ems = read_data(new_ems(), 0, 96, csv_path, fcst_only=False, sidecar=True)
+    assert sidecar_ems['fcst'] == ems['fcst']
+    assert sidecar_ems['devices'] == ems['devices']
+
+    # the sidecar of an older version of the file is ignored
+    init_ems._input_cache.clear()
+    csv_data = open(csv_path).read()
+    with open(csv_path, 'w') as f:
+        f.write(csv_data.replace(';' + str(ems['fcst']['load_elec'][0]) + ';', ';12345.5;', 1))
+    assert read_data(new_ems(), 0, 96, csv_path, sidecar=True)['fcst']['load_elec'][0] == 12345.5
+
+
+def test_read_data_lists_by_default(csv_path):
+    ems = read_data(new_ems(), 0, 96, csv_path)
+    other_ems = read_data(new_ems(), 0, 96, csv_path)
+    assert all(type(values) == list for values in ems['fcst'].values())
+    expected = copy.deepcopy(other_ems['fcst'])
+    ems['fcst']['load_elec'][0] = -1
+    ems['fcst']['load_elec'].append(0)
+    assert other_ems['fcst'] == expected
+    assert read_data(new_ems(), 0, 96, csv_path)['fcst'] == expected
+
+
+def test_read_data_as_array(csv_path):
+    fcst = read_data(new_ems(), 0, 96, csv_path, as_array=True)['fcst']
+    assert all(isinstance(values, np.ndarray) and not values.flags.writeable for values in fcst.values())
+    assert {key: values.tolist() for key, values in fcst.items()} == read_data(new_ems(), 0, 96, csv_path)['fcst']
+
+
+@pytest.mark.parametrize('fcst_only', [True, False])
+@pytest.mark.parametrize('end_time', ['2019-12-18 23:45', '2019-12-19 11:45'])
+def test_read_data_xlsx_export(tmp_path, monkeypatch, fcst_only, end_time):
+    try:
+        ts = pd.read_excel(XLSX_PATH, sheet_name='time_series', usecols='B:I')
+    except ImportError:
+        pytest.skip('no reader of excel files')
+    prop = pd.read_excel(XLSX_PATH, sheet_name='properties', index_col=0, usecols=range(0, 3))
+    monkeypatch.chdir(tmp_path)
+    ems = initialize_time_setting(0, t_inval=15, start_time='2019-12-18 00:00', end_time=end_time)
+    ts = ts.iloc[:ems['time_data']['nsteps']]
+    if fcst_only:
+        prop = pd.DataFrame(index=range(len(ts)), columns=range(0, 2))
+    expected = pd.concat([prop, ts], sort=False).to_csv(sep=';')
+
+    csv_path = os.path.join('input', 'input_data.csv')
+    os.mkdir('input')
+    with open(csv_path, 'w') as f:
+        f.write('newer than the excel file')
+    ems = read_data(ems, 0, -1, XLSX_PATH, to_csv=True, fcst_only=fcst_only)
+    assert len(ems['fcst']['load_elec']) == ems['time_data']['nsteps']
+    assert open(csv_path).read() == expected
@@ -0,0 +1,122 @@
+"""
+Test of load_ems_js against init_ems_js on ems objects saved by save_ems. The ems objects hold strings with brackets,
+braces, escaped quotes and backslashes, which end a container early if they are not skipped as strings, and the
+flexibility offers of several devices, which are objects of objects.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from opentumflex.configuration.init_ems import init_ems_js, save_ems
+from opentumflex.configuration.load_ems import load_ems_js
+from opentumflex.configuration.set_time import initialize_time_setting
+from opentumflex.flexibility.flex_table import FlexTable, flex_frame
+
+COLUMNS = [['time_data'],
+           ['optplan/EV_power'],
+           ['optplan/EV_power', 'optplan/label', 'fcst/ele_price_in'],
+           ['devices/ev/aval_init', 'devices/pv'],
+           ['devices/ev/note', 'devices/bat'],
+           ['time_data', 'time_data/nsteps', 'optplan'],
+           ['flexopts/ev/Pos_P', 'flexopts/ev/Neg_E'],
+           ['flexopts/bat'],
+           ['flexopts'],
+           ['flexopts/pv/Sch_P', 'optplan/bat_SOC', 'reoptim'],
+           ['optplan/missing', 'missing/column', 'flexopts/ev/missing']]
+STRINGS = ['a]b', 'c}d', '[{', 'e"f]', 'g\\h', '"]}', '', 'ü ]"']
+
+
+def saved_ems(tmp_path):
+    ems = initialize_time_setting(0, t_inval=15, start_time='2019-12-18 00:00', end_time='2019-12-18 05:45')
+    nsteps = ems['time_data']['nsteps']
+    rng = np.random.RandomState(0)
+    # an escaped quote makes the number of quotes before the bracket in the string even
+    ems['devices'] = {'ev': {'maxpow': 11, 'tags': ['k"]', 'm'], 'aval_init': ['2019-12-18 01:00'],
+                             'note': 'x]y{z"w\\'},
+                      'pv': {'maxpow': 5.0, 'eta': [0.2, [0.1, {'a': '}]'}]]},
+                      'bat': {'stocap': 10, 'note': STRINGS}}
+    ems['fcst'] = {'ele_price_in': list(rng.rand(nsteps)), 'comment': STRINGS}
+    ems['optplan'] = {'label': STRINGS, 'EV_power': list(rng.rand(nsteps) * 11), 'nested': {'k]': ['{', [1, 2]]},
+                      'bat_SOC': rng.rand(nsteps) * 100}
+    ems['reoptim']['note'] = 'r"]'
+    columns = ['Sch_P', 'Neg_P', 'Pos_P', 'Neg_E', 'Pos_E', 'Neg_Pr', 'Pos_Pr']
+    ems['flexopts'] = {
+        # index of the time steps
+        'ev': pd.DataFrame(rng.rand(nsteps, 7), columns=columns),
+        # index of time labels
+        'bat': pd.DataFrame(rng.rand(nsteps, 7), columns=columns, index=list(ems['time_data']['time_slots'])),
+        'pv': FlexTable({column: rng.rand(nsteps) for column in columns})}
+    path = str(tmp_path / 'ems.txt')
+    save_ems(copy.deepcopy(ems), path)
+    return path
+
+
+def select(ems, column):
+    """ value of a column path in the ems object, None if it doesn't exist """
+    value = ems
+    for key in column.split('/'):
+        if not isinstance(value, (dict, pd.DataFrame)) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def assert_flex_equal(loaded, expected):
+    loaded = flex_frame(loaded)
+    assert list(loaded.columns) == list(expected.columns)
+    assert [str(label) for label in loaded.index] == [str(label) for label in expected.index]
+    np.testing.assert_array_equal(loaded.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+
+@pytest.mark.parametrize('columns', COLUMNS, ids=[','.join(columns) for columns in COLUMNS])
+def test_load_ems_js_matches_init_ems_js(tmp_path, columns):
+    path = saved_ems(tmp_path)
+    ems = init_ems_js(path)
+    loaded = load_ems_js(path, columns)
+
+    for column in columns:
+        expected = select(ems, column)
+        keys = column.split('/')
+        if expected is None:
+            assert select(loaded, column) is None, column
+        elif keys[0] == 'flexopts' and len(keys) == 1:
+            assert list(loaded['flexopts']) == list(expected)
+            for device in expected:
+                assert_flex_equal(loaded['flexopts'][device], expected[device])
+        elif keys[0] == 'flexopts' and len(keys) == 2:
+            assert_flex_equal(loaded['flexopts'][keys[1]], expected)
+        elif keys[0] == 'flexopts':
+            np.testing.assert_array_equal(loaded['flexopts'][keys[1]][keys[2]], expected.to_numpy(dtype=float))
+        else:
+            assert select(loaded, column) == expected, column
+
+    # nothing but the requested columns is loaded
+    requested = {tuple(column.split('/')) for column in columns}
+    for section, values in loaded.items():
+        if (section,) in requested:
+            continue
+        for key in values:
+            assert (section, key) in requested or any(column[:2] == (section, key) for column in requested)
+
+
+def test_load_ems_js_strings(tmp_path):
+    path = saved_ems(tmp_path)
+    loaded = load_ems_js(path, ['devices/bat/note', 'optplan/label', 'optplan/nested', 'devices/pv/eta',
+                                'reoptim/note'])
+    assert loaded['devices']['bat']['note'] == STRINGS
+    assert loaded['optplan']['label'] == STRINGS
+    assert loaded['optplan']['nested'] == {'k]': ['{', [1, 2]]}
+    assert loaded['devices']['pv']['eta'] == [0.2, [0.1, {'a': '}]'}]]
+    assert loaded['reoptim']['note'] == 'r"]'
+
+
+def test_load_ems_js_flex_table(tmp_path):
+    path = saved_ems(tmp_path)
+    flexopts = load_ems_js(path, ['flexopts'])['flexopts']
+    assert all(isinstance(table, FlexTable) for table in flexopts.values())
+    # the labels of the time steps are kept unless they are the range of the time steps
+    assert flexopts['ev'].index.equals(pd.RangeIndex(len(flexopts['ev'])))
+    assert list(flexopts['bat'].index) == list(init_ems_js(path)['time_data']['time_slots'])
@@ -0,0 +1,140 @@
+"""
+Round trip of ResultStore against save_ems/init_ems_js: the ems objects loaded from the result store hold the same
+values as the json files of save_ems, also if only some columns are loaded, only the keys with a prefix are read or
+several writers append to one result store folder.
+"""
+
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from opentumflex.configuration.init_ems import init_ems_js, save_ems
+from opentumflex.configuration.result_store import ResultStore
+from opentumflex.configuration.set_time import initialize_time_setting
+from opentumflex.flexibility.flex_table import FlexTable, flex_frame
+
+FLEX_COLUMNS = ['Sch_P', 'Neg_P', 'Pos_P', 'Neg_E', 'Pos_E', 'Neg_Pr', 'Pos_Pr']
+KEYS = ['{}/{}/ev_avail_{}'.format(power, pricing, i) for power in (3.7, 11) for pricing in ('ToU', 'RTP')
+        for i in range(3)]
+
+
+def new_ems(seed):
+    ems = initialize_time_setting(0, t_inval=15, start_time='2019-12-18 08:00', end_time='2019-12-18 13:45')
+    nsteps = ems['time_data']['nsteps']
+    rng = np.random.RandomState(seed)
+    ems['devices'] = {'ev': {'maxpow': 11, 'stocap': 40, 'aval_init': ['2019-12-18 09:00'], 'note': 'a]"b'}}
+    ems['fcst'] = {'ele_price_in': list(rng.rand(nsteps)), 'ele_price_out': [0.0] * nsteps}
+    ems['optplan'] = {'EV_power': list(rng.rand(nsteps) * 11), 'EV_SOC': list(rng.rand(nsteps) * 100)}
+    ems['flexopts'] = {
+        # index of the time steps
+        'ev': pd.DataFrame(rng.rand(nsteps, 7), columns=FLEX_COLUMNS),
+        # index of the time slots
+        'bat': pd.DataFrame(rng.rand(nsteps, 7), columns=FLEX_COLUMNS, index=list(ems['time_data']['time_slots'])),
+        # own index
+        'pv': FlexTable({column: rng.rand(nsteps // 2) for column in FLEX_COLUMNS},
+                        index=['slot_{}'.format(i) for i in range(nsteps // 2)])}
+    return ems
+
+
+def json_ems(tmp_path, ems, name='ems'):
+    """ ems object written by save_ems and read by init_ems_js """
+    path = str(tmp_path / (name + '.txt'))
+    save_ems(copy.deepcopy(ems), path)
+    return init_ems_js(path)
+
+
+def assert_ems_equal(loaded, expected, columns=None):
+    """ compare an ems object of the result store with an ems object of init_ems_js, only the given columns of the
+    column sections if columns is not None """
+    for section in ('devices', 'reoptim'):
+        assert loaded[section] == expected[section]
+    assert {key: value for key, value in loaded['time_data'].items() if key != 'time_slots'} == \
+           {key: value for key, value in expected['time_data'].items() if key != 'time_slots'}
+    for section in ('fcst', 'optplan'):
+        names = [name for name in expected[section]
+                 if columns is None or section + '/' + name in columns]
+        assert sorted(loaded[section]) == sorted(names)
+        for name in names:
+            np.testing.assert_array_equal(loaded[section][name], expected[section][name], err_msg=name)
+    devices = [device for device in expected['flexopts']
+               if columns is None or any(column.startswith('flexopts/' + device + '/') for column in columns)]
+    assert sorted(loaded['flexopts']) == sorted(devices)
+    for device in devices:
+        table = loaded['flexopts'][device]
+        assert isinstance(table, FlexTable)
+        frame = flex_frame(expected['flexopts'][device])
+        names = [name for name in frame.columns
+                 if columns is None or 'flexopts/' + device + '/' + name in columns]
+        assert list(table.columns) == names
+        assert [str(label) for label in table.index] == [str(label) for label in frame.index]
+        for name in names:
+            np.testing.assert_array_equal(table[name], frame[name].to_numpy(dtype=float), err_msg=name)
+
+
+@pytest.mark.parametrize('compressed', [False, True])
+def test_result_store_round_trip(tmp_path, compressed):
+    store = ResultStore(str(tmp_path / 'store'), shard_size=4, compressed=compressed)
+    for i, key in enumerate(KEYS):
+        store.save_ems(new_ems(i), key)
+    # the full shards are written, the remaining ems objects are buffered until flush
+    assert len(store.shards()) == len(KEYS) // 4
+    store.flush()
+    assert len(store.shards()) == -(-len(KEYS) // 4)
+    assert not any(path.suffix == '.tmp' for path in (tmp_path / 'store').iterdir())
+
+    store = ResultStore(str(tmp_path / 'store'))
+    assert sorted(store.keys()) == sorted(KEYS)
+    for i, key in enumerate(KEYS):
+        assert_ems_equal(store.load_ems(key), json_ems(tmp_path, new_ems(i)))
+        np.testing.assert_array_equal(store.load_ems(key)['time_data']['time_slots'],
+                                      new_ems(i)['time_data']['time_slots'])
+
+
+@pytest.mark.parametrize('columns', [['optplan/EV_power'],
+                                     ['fcst/ele_price_in', 'optplan/EV_SOC'],
+                                     ['flexopts/ev/Pos_P', 'flexopts/bat/Neg_E'],
+                                     ['flexopts/pv/Sch_P', 'optplan/EV_power'],
+                                     ['optplan/missing', 'flexopts/missing/Pos_P']])
+def test_result_store_load_columns(tmp_path, columns):
+    with ResultStore(str(tmp_path / 'store')) as store:
+        for i, key in enumerate(KEYS):
+            store.save_ems(new_ems(i), key)
+    store = ResultStore(str(tmp_path / 'store'))
+    for i, key in enumerate(KEYS):
+        assert_ems_equal(store.load_ems(key, columns=columns), json_ems(tmp_path, new_ems(i)), columns)
+
+
+def test_result_store_iter_prefix(tmp_path):
+    with ResultStore(str(tmp_path / 'store'), shard_size=5) as store:
+        for i, key in enumerate(KEYS):
+            store.save_ems(new_ems(i), key)
+    store = ResultStore(str(tmp_path / 'store'))
+    prefix = '11/ToU/'
+    assert sorted(store.keys(prefix)) == [key for key in sorted(KEYS) if key.startswith(prefix)]
+    loaded = dict(store.iter_ems(columns=['optplan/EV_power'], prefix=prefix))
+    assert sorted(loaded) == store.keys(prefix)
+    for key, ems in loaded.items():
+        assert_ems_equal(ems, json_ems(tmp_path, new_ems(KEYS.index(key))), ['optplan/EV_power'])
+    # the shards can be split among several readers
+    shards = store.shards()
+    assert sorted(key for part in (shards[:1], shards[1:]) for key, _ in store.iter_ems(shards=part)) == sorted(KEYS)
+
+
+def test_result_store_several_writers(tmp_path):
+    path = str(tmp_path / 'store')
+    writers = [ResultStore(path, shard_size=2) for _ in range(3)]
+    # the writers append their results to the same folder in turns
+    for i, key in enumerate(KEYS):
+        writers[i % 3].save_ems(new_ems(i), key)
+    for writer in writers:
+        writer.flush()
+    assert len(set(ResultStore(path).shards())) == len(KEYS) // 2
+
+    store = ResultStore(path)
+    assert sorted(store.keys()) == sorted(KEYS)
+    loaded = dict(store.iter_ems())
+    assert sorted(loaded) == sorted(KEYS)
+    for i, key in enumerate(KEYS):
+        assert_ems_equal(loaded[key], json_ems(tmp_path, new_ems(i)))
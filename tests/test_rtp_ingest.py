@@ -0,0 +1,65 @@
+"""
+Test of the offline ingestion of ComEd real time prices. The raw dumps in data/ hold 5 minute prices around the end of
+daylight saving time on 2019-11-03, when the local times from 01:00 to 01:55 occur twice. The price of the k-th raw
+time step after 00:00 CDT is k ct/kWh. rtp_5min_dst_part1.json ends at 01:50 CST, rtp_5min_dst_part2.csv overlaps it
+from 01:30 CST and ends at 03:00 CST.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from forecast.rtp_ingest import ingest_rtp, read_rtp_dump
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+PART1 = os.path.join(DATA_PATH, 'rtp_5min_dst_part1.json')
+PART2 = os.path.join(DATA_PATH, 'rtp_5min_dst_part2.csv')
+
+
+def quarter_hours(start, periods):
+    return pd.date_range(start='2019-11-03 ' + start, periods=periods, freq='15Min', name='timesteps')
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / 'rtp_15min.h5')
+
+
+def test_read_rtp_dump_merges_dumps():
+    rtp_5min = read_rtp_dump([PART1, PART2])
+    np.testing.assert_array_equal(rtp_5min.to_numpy(), np.arange(49) / 100)
+    # The local times of the repeated hour are kept twice, once per UTC time step
+    assert rtp_5min.index.duplicated().sum() == 12
+    assert rtp_5min.index[0] == pd.Timestamp('2019-11-03 00:00')
+    assert rtp_5min.index[-1] == pd.Timestamp('2019-11-03 03:00')
+
+
+def test_ingest_single_dump(store_path):
+    new_15min = ingest_rtp(PART1, store_path, avg_price=0.19)
+    # The quarter hour 01:45 lacks its raw price at 01:55 CST and is left for the next dumps, the repeated quarter
+    # hours average the raw prices of both occurrences
+    raw_15min = np.array([1, 4, 7, 10, (13 + 25) / 2, (16 + 28) / 2, (19 + 31) / 2]) / 100
+    pd.testing.assert_index_equal(new_15min.index, quarter_hours('00:00', 7))
+    np.testing.assert_allclose(new_15min['price'] - raw_15min, 0.19 - raw_15min.mean())
+    assert new_15min['price'].mean() == pytest.approx(0.19)
+    assert list(new_15min['Daytime_ID'][:2]) == ['Sunday, 00:00', 'Sunday, 00:15']
+    pd.testing.assert_frame_equal(pd.read_hdf(store_path, key='df'), new_15min, check_freq=False)
+
+
+def test_ingest_appends_after_store(store_path):
+    first_15min = ingest_rtp(PART1, store_path, avg_price=0.19)
+    price_adder = first_15min['price'][0] - 0.01
+    new_15min = ingest_rtp([PART1, PART2], store_path)
+    # Only the quarter hours after 01:30 are appended with the taxes and fees of the store, 03:00 is incomplete
+    raw_15min = np.array([(22 + 34) / 2, 37, 40, 43, 46]) / 100
+    pd.testing.assert_index_equal(new_15min.index, quarter_hours('01:45', 5))
+    np.testing.assert_allclose(new_15min['price'], raw_15min + price_adder)
+    rtp_15min = pd.read_hdf(store_path, key='df')
+    pd.testing.assert_index_equal(rtp_15min.index, quarter_hours('00:00', 12), check_names=False)
+    pd.testing.assert_frame_equal(rtp_15min[:7], first_15min, check_freq=False)
+
+    # Ingesting the same dumps again appends nothing and keeps the store
+    assert ingest_rtp([PART1, PART2], store_path).empty
+    pd.testing.assert_frame_equal(pd.read_hdf(store_path, key='df'), rtp_15min)
@@ -0,0 +1,93 @@
+"""
+Test of the Monte-Carlo scenarios of ScenarioGenerator on rtp files of two synthetic years. The prices of every day are
+random, except for the first hour of the day, which has the same price on all days (no standard deviation).
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from forecast.rtp_store import RtpStore
+from forecast.scenario_gen import ScenarioGenerator, SCENARIO_BLOCK
+
+T_START = pd.Timestamp('2019-07-05 18:00')
+N_STEPS = 2 * 96
+
+
+@pytest.fixture(scope='module')
+def rtp_store(tmp_path_factory):
+    path = tmp_path_factory.mktemp('rtp')
+    rng = np.random.RandomState(0)
+    for year in (2018, 2019):
+        index = pd.date_range(start=pd.Timestamp(year=year, month=1, day=1),
+                              end=pd.Timestamp(year=year, month=12, day=31, hour=23, minute=45), freq='15Min')
+        prices = rng.rand(len(index)) * 0.1 + 0.02
+        prices[index.hour == 0] = 0.03
+        pd.DataFrame({'price': prices}, index=index).to_hdf(
+            str(path / 'rtp_15min_{}01010000-{}12312345.h5'.format(year, year)), key='df')
+    return RtpStore(str(path) + '/')
+
+
+@pytest.fixture(scope='module')
+def load():
+    return 0.5 + 0.3 * np.sin(np.linspace(0, 4 * np.pi, N_STEPS))
+
+
+def test_scenarios_shapes(rtp_store, load):
+    generator = ScenarioGenerator(seed=1, rtp_store=rtp_store)
+    scenarios = generator.scenarios(T_START, N_STEPS, 10, load=load)
+    assert scenarios['price'].shape == (10, N_STEPS)
+    assert scenarios['load'].shape == (10, N_STEPS)
+    assert set(generator.scenarios(T_START, N_STEPS, 10)) == {'price'}
+    assert generator.scenarios(T_START, N_STEPS, 0, load=load)['price'].shape == (0, N_STEPS)
+
+
+def test_scenarios_same_seed(rtp_store, load):
+    scenarios = ScenarioGenerator(seed=1, rtp_store=rtp_store).scenarios(T_START, N_STEPS, 100, load=load)
+    same_seed = ScenarioGenerator(seed=1, rtp_store=rtp_store).scenarios(T_START, N_STEPS, 100, load=load)
+    other_seed = ScenarioGenerator(seed=2, rtp_store=rtp_store).scenarios(T_START, N_STEPS, 100, load=load)
+    np.testing.assert_array_equal(scenarios['price'], same_seed['price'])
+    np.testing.assert_array_equal(scenarios['load'], same_seed['load'])
+    assert not np.array_equal(scenarios['price'], other_seed['price'])
+
+
+@pytest.mark.parametrize('start_scenario, n_scenarios', [(0, 1), (5, 20), (60, 10), (64, 64), (70, 130)])
+def test_scenarios_start_scenario(rtp_store, load, start_scenario, n_scenarios):
+    generator = ScenarioGenerator(seed=3, rtp_store=rtp_store)
+    scenarios = generator.scenarios(T_START, N_STEPS, 3 * SCENARIO_BLOCK + 20, load=load)
+    part = generator.scenarios(T_START, N_STEPS, n_scenarios, start_scenario=start_scenario, load=load)
+    for key in ('price', 'load'):
+        np.testing.assert_array_equal(part[key], scenarios[key][start_scenario:start_scenario + n_scenarios])
+
+
+@pytest.mark.parametrize('chunk_size', [1, 50, SCENARIO_BLOCK, 1000])
+def test_iter_scenarios_equal_scenarios(rtp_store, load, chunk_size):
+    generator = ScenarioGenerator(seed=4, rtp_store=rtp_store)
+    scenarios = generator.scenarios(T_START, N_STEPS, 150, load=load)
+    chunks = list(generator.iter_scenarios(T_START, N_STEPS, 150, chunk_size=chunk_size, load=load))
+    assert len(chunks) == -(-150 // chunk_size)
+    for key in ('price', 'load'):
+        np.testing.assert_array_equal(np.concatenate([chunk[key] for chunk in chunks]), scenarios[key])
+
+
+def test_scenarios_historical_days(rtp_store):
+    # every day of a scenario is a historical day of the same month and day type (weekday or weekend)
+    generator = ScenarioGenerator(seed=5, rtp_store=rtp_store)
+    prices = generator.scenarios(pd.Timestamp('2019-07-05 00:00'), 3 * 96, 50)['price']
+    for day, date in enumerate(pd.date_range('2019-07-05', periods=3, freq='1d')):
+        dates = pd.date_range('2018-01-01', '2019-12-31', freq='1d')
+        pool = generator.days[(dates.month == date.month) & ((dates.weekday >= 5) == (date.weekday() >= 5))]
+        day_prices = prices[:, day * 96:(day + 1) * 96]
+        assert all((pool == row).all(axis=1).any() for row in day_prices)
+
+
+def test_scenarios_load_without_price_deviation(rtp_store, load):
+    # the times of day with equal prices on all days have no price deviation instead of a division by 0
+    generator = ScenarioGenerator(seed=6, rtp_store=rtp_store)
+    assert (generator.day_std[:4] == 0).all()
+    with np.errstate(divide='raise', invalid='raise'):
+        scenarios = generator.scenarios(T_START, N_STEPS, 2 * SCENARIO_BLOCK, load=load, correlation=1)
+    assert np.isfinite(scenarios['load']).all()
+    first_hour = (np.arange(N_STEPS) + 72) % 96 < 4
+    expected = load[first_hour] * np.exp(-0.1 ** 2 / 2)
+    np.testing.assert_allclose(scenarios['load'][:, first_hour], np.broadcast_to(expected, (2 * SCENARIO_BLOCK, len(expected))))
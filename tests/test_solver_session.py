@@ -0,0 +1,76 @@
+"""
+Test of the in-process (appsi) branch of SolverSession on a small mixed-integer problem with a mutable parameter: the
+solution is only loaded if the solver found one, otherwise NoSolutionError is raised, further solves use the changed
+parameters and the relative gap of the session is passed to the solver. The tests are skipped without an appsi solver
+(Pyomo >= 6 with highspy or cbc).
+"""
+
+import pyomo.environ as pyen
+import pytest
+from pyomo.environ import SolverFactory, value
+
+from opentumflex.optimization.model import NoSolutionError, SolverSession, _APPSI_GAP_OPTIONS
+
+APPSI_SOLVERS = ['highs', 'cbc']
+
+
+def appsi_available(solver):
+    try:
+        return 'appsi_' + solver in SolverFactory and \
+               SolverFactory('appsi_' + solver).available(exception_flag=False)
+    except Exception:
+        return False
+
+
+@pytest.fixture(params=APPSI_SOLVERS)
+def solver(request):
+    if not appsi_available(request.param):
+        pytest.skip('appsi_' + request.param + ' is not available')
+    return request.param
+
+
+def small_model(demand=7):
+    """ cover the demand by units of 3 (cost 4) and 5 (cost 6), at most 2 units each """
+    m = pyen.ConcreteModel()
+    m.demand = pyen.Param(initialize=demand, mutable=True)
+    m.small = pyen.Var(within=pyen.NonNegativeIntegers, bounds=(0, 2))
+    m.large = pyen.Var(within=pyen.NonNegativeIntegers, bounds=(0, 2))
+    m.cover = pyen.Constraint(expr=3 * m.small + 5 * m.large >= m.demand)
+    m.obj = pyen.Objective(expr=4 * m.small + 6 * m.large, sense=pyen.minimize)
+    return m
+
+
+def test_solver_session_appsi_loads_solution(solver):
+    session = SolverSession(solver, time_limit=10, troubleshooting=False)
+    assert session.interface == 'appsi'
+    m = session.solve(small_model())
+    assert (value(m.small), value(m.large)) == (1, 1)
+    assert value(m.obj) == 10
+    # the changed parameter is pushed to the solver for the next solve
+    m.demand = 3
+    m = session.solve(m)
+    assert (value(m.small), value(m.large)) == (1, 0)
+    assert session.summary()['n_solves'] == 2
+    assert all(timing['interface'] == 'appsi' for timing in session.timings)
+
+
+def test_solver_session_appsi_no_solution(solver):
+    session = SolverSession(solver, time_limit=10, troubleshooting=False)
+    m = small_model(demand=100)
+    with pytest.raises(NoSolutionError):
+        session.solve(m)
+    # no solution is loaded into the model
+    assert m.small.value is None and m.large.value is None
+    assert session.timings == []
+    # the session can be used further
+    m.demand = 5
+    m = session.solve(m)
+    assert value(m.obj) == 6
+
+
+def test_solver_session_appsi_gap(solver):
+    session = SolverSession(solver, min_gap=0.05, troubleshooting=False)
+    if 'mip_gap' in session.optimizer.config:
+        assert session.optimizer.config.mip_gap == 0.05
+    else:
+        assert session.optimizer.options[_APPSI_GAP_OPTIONS[solver]] == 0.05
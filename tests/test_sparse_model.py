@@ -0,0 +1,208 @@
+"""
+Parity test of the sparse model (create_sparse_model, solve_sparse_model, extract_sparse_res) against the Pyomo model
+(create_model, extract_res) on the bundled scenarios with the input data, and on re-optimizations of the simple house
+with the flexibility offers of type 1 to 4 (PV negative/positive, battery charging/discharging). Both models are solved
+to the same relative gap: the objectives agree within the gap, and the sparse solution written into the Pyomo model
+satisfies all its constraints and gives the same ems['optplan'] with extract_res. The plans of both solvers are not
+compared directly, they differ where the optimum is not unique (e.g. the battery and the ev away from home).
+scenario_apartment is left out, neither model reaches the gap within minutes. Scenarios which are infeasible with the
+input data (pv, bat) are infeasible in both models.
+"""
+
+import copy
+import os
+import warnings
+
+import numpy as np
+import pytest
+from pyomo.environ import Constraint, SolverFactory, value
+
+import opentumflex
+from opentumflex.optimization.model import NoSolutionError
+from opentumflex.optimization.sparse_model import VARIABLES
+
+try:
+    from scipy.optimize import milp
+except ImportError:
+    milp = None
+
+INPUT_PATH = os.path.join(os.path.dirname(__file__), '..', 'input', 'input_data.csv')
+SCENARIOS = ['scenario_hp', 'scenario_ev', 'scenario_simple_house', 'scenario_residential_house',
+             'scenario_mini_apartment']
+INFEASIBLE_SCENARIOS = ['scenario_pv', 'scenario_bat']
+MIN_GAP = 0.001
+TIME_LIMIT = 30
+# solvers of the Pyomo model in the order of preference, with their options of the gap and time limit
+REFERENCE_SOLVERS = [('appsi_highs', None), ('cbc', {'ratioGap': MIN_GAP, 'sec': TIME_LIMIT}),
+                     ('glpk', {'mipgap': MIN_GAP, 'tmlim': TIME_LIMIT})]
+
+pytestmark = pytest.mark.skipif(milp is None, reason='the sparse model requires scipy>=1.9')
+
+
+def available_solver():
+    for name, options in REFERENCE_SOLVERS:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                optimizer = SolverFactory(name)
+                if optimizer is not None and optimizer.available(exception_flag=False):
+                    return name, optimizer, options
+        except Exception:
+            continue
+    return None
+
+
+@pytest.fixture(scope='module')
+def solver():
+    reference_solver = available_solver()
+    if reference_solver is None:
+        pytest.skip('no solver for the Pyomo model available')
+    return reference_solver
+
+
+def scenario_ems(scenario):
+    ems = opentumflex.initialize_time_setting(0, t_inval=15, start_time='2019-12-18 00:00',
+                                              end_time='2019-12-18 23:45')
+    ems = opentumflex.read_data(ems, 0, 96, INPUT_PATH, fcst_only=False, to_csv=False)
+    return getattr(opentumflex, scenario)(ems)
+
+
+def solve_pyomo(ems, solver):
+    """ solve the Pyomo model to MIN_GAP, the objective is None if the model is infeasible """
+    name, optimizer, options = solver
+    m = opentumflex.create_model(ems)
+    if options is None:
+        optimizer.config.mip_gap = MIN_GAP
+        optimizer.config.time_limit = TIME_LIMIT
+        results = optimizer.solve(m, load_solutions=False)
+    else:
+        results = optimizer.solve(m, load_solutions=False, options=options)
+    termination = str(results.solver.termination_condition)
+    if termination in ('infeasible', 'infeasibleOrUnbounded'):
+        return m, None
+    if termination != 'optimal' or len(results.solution) == 0:
+        pytest.skip('{} does not reach the gap within {} s ({})'.format(name, TIME_LIMIT, termination))
+    m.solutions.load_from(results)
+    return m, value(m.obj)
+
+
+def solve_sparse(ems):
+    sm = opentumflex.solve_sparse_model(opentumflex.create_sparse_model(ems), time_limit=TIME_LIMIT,
+                                        min_gap=MIN_GAP, troubleshooting=False)
+    if sm.x is not None:
+        assert sm.status == 0, sm.message
+    return sm
+
+
+def assert_sparse_solution_fits_pyomo(sm, ems):
+    """ write the sparse solution into the Pyomo model, check its constraints and the extracted optimal plan """
+    m = opentumflex.create_model(ems)
+    timesteps = list(m.t)
+    for var in VARIABLES:
+        component = getattr(m, var)
+        for t, x in zip(timesteps, sm.value(var)):
+            # the solver tolerates a violation of the bounds in the order of 1e-14
+            lower, upper = component[t].lb, component[t].ub
+            x = x if lower is None else max(x, lower)
+            component[t].set_value(x if upper is None else min(x, upper))
+    for var in ('roomtemp', 'heatextra'):
+        for t in timesteps:
+            getattr(m, var)[t].set_value(0)
+
+    for constraint in m.component_data_objects(Constraint, active=True):
+        body = value(constraint.body)
+        tolerance = 1e-6 * max(1, abs(body))
+        if constraint.has_lb():
+            assert body >= value(constraint.lower) - tolerance, constraint.name
+        if constraint.has_ub():
+            assert body <= value(constraint.upper) + tolerance, constraint.name
+    np.testing.assert_allclose(value(m.obj), sm.c @ sm.x, rtol=1e-9)
+
+    optplan = opentumflex.extract_res(m, copy.deepcopy(ems))['optplan']
+    sparse_optplan = opentumflex.extract_sparse_res(sm, copy.deepcopy(ems))['optplan']
+    assert list(sparse_optplan) == list(optplan)
+    for key in optplan:
+        np.testing.assert_allclose(np.asarray(sparse_optplan[key], dtype=float),
+                                   np.asarray(optplan[key], dtype=float), rtol=1e-9, atol=1e-9, err_msg=key)
+
+
+def assert_parity(ems, solver):
+    m, objective = solve_pyomo(copy.deepcopy(ems), solver)
+    sm = solve_sparse(copy.deepcopy(ems))
+    assert sm.x is not None, sm.message
+    sparse_objective = sm.c @ sm.x
+    assert abs(sparse_objective - objective) <= MIN_GAP * max(abs(objective), abs(sparse_objective)) + 1e-6
+    assert_sparse_solution_fits_pyomo(sm, ems)
+    return sm
+
+
+@pytest.mark.parametrize('scenario', SCENARIOS)
+def test_sparse_model_matches_pyomo(solver, scenario):
+    assert_parity(scenario_ems(scenario), solver)
+
+
+@pytest.mark.parametrize('scenario', INFEASIBLE_SCENARIOS)
+def test_sparse_model_infeasible_like_pyomo(solver, scenario):
+    ems = scenario_ems(scenario)
+    assert solve_pyomo(copy.deepcopy(ems), solver)[1] is None
+    sm = solve_sparse(copy.deepcopy(ems))
+    with pytest.raises(NoSolutionError):
+        opentumflex.extract_sparse_res(sm, ems)
+
+
+@pytest.fixture(scope='module')
+def simple_house(solver):
+    """ simple house with its optimal plan as the plan of the re-optimization """
+    ems = scenario_ems('scenario_simple_house')
+    sm = solve_sparse(copy.deepcopy(ems))
+    ems['optplan'] = opentumflex.extract_sparse_res(sm, copy.deepcopy(ems))['optplan']
+    return ems
+
+
+def reopt_ems(ems, flex_type):
+    """ re-optimization with an offer of flex_type for the first time steps at which the plan allows it """
+    ems = copy.deepcopy(ems)
+    nsteps = ems['time_data']['nsteps']
+    grid_export = np.asarray(ems['optplan']['grid_export'])
+    bat_soc = np.asarray(ems['optplan']['bat_SOC'])
+    if flex_type == 1:
+        # less export of PV power
+        steps = np.flatnonzero(grid_export > 0.5)[:4]
+        flex_value = 0.5
+    elif flex_type == 2:
+        # more export from the battery
+        steps = np.flatnonzero(bat_soc > 50)[:2]
+        flex_value = 0.5
+    elif flex_type == 3:
+        # charging of the battery at maximum power
+        steps = np.flatnonzero(bat_soc < 50)[:2]
+        flex_value = 0
+    else:
+        # discharging of the battery at maximum power
+        steps = np.flatnonzero(bat_soc > 50)[:2]
+        flex_value = 0
+    assert len(steps) > 0
+    ems['reoptim']['type_flex'] = [0] * nsteps
+    ems['reoptim']['flex_value'] = [0] * nsteps
+    for step in steps:
+        ems['reoptim']['type_flex'][step] = flex_type
+        ems['reoptim']['flex_value'][step] = flex_value
+    return ems, steps
+
+
+@pytest.mark.parametrize('flex_type', [1, 2, 3, 4])
+def test_sparse_model_matches_pyomo_reopt(solver, simple_house, flex_type):
+    ems, steps = reopt_ems(simple_house, flex_type)
+    sm = assert_parity(ems, solver)
+    grid_export = np.asarray(ems['optplan']['grid_export'])[steps]
+    bat_pow_lim = ems['devices']['bat']['maxpow']
+    if flex_type == 1:
+        np.testing.assert_allclose(sm.value('elec_export')[steps], grid_export - 0.5, atol=1e-6)
+    elif flex_type == 2:
+        np.testing.assert_allclose(sm.value('elec_export')[steps], grid_export + 0.5, atol=1e-6)
+    elif flex_type == 3:
+        np.testing.assert_allclose(sm.value('bat_pow_pos')[steps], bat_pow_lim, atol=1e-6)
+        np.testing.assert_allclose(sm.value('bat_pow_neg')[steps], 0, atol=1e-6)
+    else:
+        np.testing.assert_allclose(sm.value('bat_pow_pos')[steps], 0, atol=1e-6)
+        np.testing.assert_allclose(sm.value('bat_pow_neg')[steps], bat_pow_lim, atol=1e-6)
@@ -0,0 +1,169 @@
+"""
+Test of the manifest of calc_ev_flex_offers_sweep: the last line of a key in the manifest is its state, the line of an
+interrupted write is skipped, a resumed sweep only calculates the combinations which are not done and solves without a
+solution are retried with a doubled time limit. The combinations are solved with the first available solver of
+appsi_highs, cbc and glpk.
+"""
+
+import importlib
+import json
+import os
+
+import pandas as pd
+import pytest
+from pyomo.environ import SolverFactory
+
+import opentumflex
+from opentumflex.configuration.result_store import ResultStore
+
+# the package exports the function calc_ev_flex_offers under the name of its module
+calc_ev_flex_offers = importlib.import_module('analysis.ev_case_study.calc_ev_flex_offers')
+SweepManifest = calc_ev_flex_offers.SweepManifest
+
+ANALYSIS_PATH = os.path.join(os.path.dirname(__file__), '..', 'analysis')
+POWER_LEVELS = [3.7, 11]
+PRICING = ['ToU', 'RTP']
+
+
+def available_solver():
+    try:
+        if SolverFactory('appsi_highs').available(exception_flag=False):
+            return 'highs'
+    except Exception:
+        pass
+    for solver in ('cbc', 'glpk'):
+        if SolverFactory(solver).available(exception_flag=False):
+            return solver
+    return None
+
+
+@pytest.fixture(scope='module')
+def solver():
+    solver = available_solver()
+    if solver is None:
+        pytest.skip('no solver of the sweep is available')
+    return solver
+
+
+@pytest.fixture(scope='module')
+def veh_availability():
+    veh_availabilities = pd.read_csv(os.path.join(ANALYSIS_PATH, 'input', 'chts_veh_availability.csv'))
+    return veh_availabilities[:1].reset_index().values.tolist()[0]
+
+
+@pytest.fixture
+def param_fix(tmp_path, solver):
+    return {'conversion_distance_2_km': 1.61,
+            'conversion_km_2_kwh': 0.2,
+            'rtp_input_data_path': os.path.join(ANALYSIS_PATH, 'input', 'RTP') + '/',
+            'output_path': str(tmp_path) + '/',
+            'result_store': str(tmp_path / 'results'),
+            'pricing_strategies': PRICING,
+            'solver': solver,
+            'info': False}
+
+
+def keys(veh_availability):
+    return [calc_ev_flex_offers._sweep_key(power, price, veh_availability) for price in PRICING
+            for power in POWER_LEVELS]
+
+
+def test_manifest_last_state(tmp_path):
+    manifest = SweepManifest(str(tmp_path / 'manifest.jsonl'))
+    assert manifest.states() == {}
+    manifest.record('a', 'failed', time_limit=30, error='no solution')
+    manifest.record('b', 'done', time_limit=30)
+    manifest.record('a', 'done', time_limit=60)
+    manifest.record('c', 'done', time_limit=30)
+    manifest.record('c', 'failed', time_limit=30, error='no solution')
+    assert manifest.completed() == {'a', 'b'}
+    assert set(manifest.failed()) == {'c'}
+    assert manifest.failed()['c']['error'] == 'no solution'
+    assert manifest.states()['a']['time_limit'] == 60
+
+
+def test_manifest_truncated_line(tmp_path):
+    path = str(tmp_path / 'manifest.jsonl')
+    manifest = SweepManifest(path)
+    manifest.record('a', 'done')
+    manifest.record('b', 'failed')
+    # the write of the last line was interrupted
+    with open(path, 'a') as f:
+        f.write(json.dumps({'key': 'b', 'status': 'done'})[:-5])
+    assert manifest.completed() == {'a'}
+    assert set(manifest.failed()) == {'b'}
+    # the next record starts a new line
+    manifest.record('c', 'done')
+    assert manifest.completed() == {'a', 'c'}
+    assert len(open(path).read().splitlines()) == 4
+
+
+@pytest.mark.parametrize('resume', [True, False])
+def test_sweep_resume(tmp_path, param_fix, veh_availability, resume):
+    done, failed, failed_then_done, remaining = keys(veh_availability)
+    manifest = SweepManifest(str(tmp_path / 'manifest.jsonl'))
+    manifest.record(done, 'done', time_limit=30)
+    manifest.record(failed, 'failed', time_limit=30, error='no solution')
+    manifest.record(failed_then_done, 'failed', time_limit=30, error='no solution')
+    manifest.record(failed_then_done, 'done', time_limit=60)
+
+    calc_ev_flex_offers.calc_ev_flex_offers_sweep([veh_availability], param_fix, power_levels=POWER_LEVELS,
+                                                  n_workers=1, resume=resume)
+
+    calculated = [failed, remaining] if resume else keys(veh_availability)
+    assert sorted(ResultStore(param_fix['result_store']).keys()) == sorted(calculated)
+    assert manifest.completed() == set(keys(veh_availability))
+    # the done combination is only recorded again without resume
+    records = [json.loads(line) for line in open(manifest.path)]
+    assert sum(record['key'] == done for record in records) == (1 if resume else 2)
+
+
+def flaky_session(attempts, solved_time_limit, error=opentumflex.NoSolutionError):
+    """ solver session without a solution below solved_time_limit seconds """
+
+    class FlakySession(opentumflex.SolverSession):
+
+        def solve(self, m):
+            attempts.append(self.time_limit)
+            if self.time_limit < solved_time_limit:
+                raise error('no solution within {} s'.format(self.time_limit))
+            return super().solve(m)
+
+    return FlakySession
+
+
+@pytest.fixture
+def sweep_worker(monkeypatch):
+    # the state of the worker process is kept in the test process
+    monkeypatch.setattr(calc_ev_flex_offers, '_sweep_worker', {})
+
+
+@pytest.mark.parametrize('max_retries, solved', [(2, True), (1, False)])
+def test_sweep_retry_doubles_time_limit(tmp_path, monkeypatch, sweep_worker, param_fix, veh_availability,
+                                        max_retries, solved):
+    attempts = []
+    monkeypatch.setattr(opentumflex, 'SolverSession', flaky_session(attempts, 20))
+    key = keys(veh_availability)[0]
+    manifest = SweepManifest(str(tmp_path / 'manifest.jsonl'))
+    calc_ev_flex_offers._init_sweep_worker(dict(param_fix, time_limit=5, max_retries=max_retries), manifest.path)
+
+    n_completed = calc_ev_flex_offers._calc_ev_flex_vehicle((veh_availability, [(POWER_LEVELS[0], PRICING[0])]))
+
+    assert attempts == [5, 10, 20][:max_retries + 1]
+    records = [json.loads(line) for line in open(manifest.path)]
+    assert [(record['key'], record['status'], record['time_limit']) for record in records] == \
+           [(key, 'failed', 5), (key, 'failed', 10)] + ([(key, 'done', 20)] if solved else [])
+    assert n_completed == int(solved)
+    assert ResultStore(param_fix['result_store']).keys() == ([key] if solved else [])
+
+
+def test_sweep_other_errors_stop(tmp_path, monkeypatch, sweep_worker, param_fix, veh_availability):
+    attempts = []
+    monkeypatch.setattr(opentumflex, 'SolverSession', flaky_session(attempts, 20, error=RuntimeError))
+    manifest = SweepManifest(str(tmp_path / 'manifest.jsonl'))
+    calc_ev_flex_offers._init_sweep_worker(dict(param_fix, time_limit=5), manifest.path)
+
+    with pytest.raises(RuntimeError):
+        calc_ev_flex_offers._calc_ev_flex_vehicle((veh_availability, [(POWER_LEVELS[0], PRICING[0])]))
+    assert attempts == [5]
+    assert manifest.states() == {}
@@ -0,0 +1,46 @@
+"""
+Parity test of the time-of-use tariffs against the prices of the former per-slot loop of simulate_elect_price_fcst. The
+reference data/tou_reference.npz holds the 'ToU' prices of the loop for a full year, the season boundaries in June and
+October with their weekends, the turn of the year and a leap day.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from forecast.price_fcst_sim import simulate_elect_price_fcst
+from forecast.tou_tariffs import tou_prices
+
+REFERENCE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'tou_reference.npz')
+PERIODS = ['full_year_2019', 'summer_start_2019', 'summer_end_2019', 'new_year_2013', 'leap_day_2020']
+
+
+@pytest.fixture(scope='module')
+def reference():
+    with np.load(REFERENCE_PATH) as data:
+        return {name: data[name] for name in data.files}
+
+
+@pytest.mark.parametrize('period', PERIODS)
+def test_tou_prices_match_reference(reference, period):
+    t_start, t_end = (pd.Timestamp(str(t)) for t in reference[period + '/period'])
+    np.testing.assert_array_equal(tou_prices('TOU-D-PRIME', t_start, t_end), reference[period])
+
+
+@pytest.mark.parametrize('period', ['summer_start_2019', 'summer_end_2019'])
+def test_price_fcst_tou_matches_reference(reference, period):
+    t_start, t_end = (pd.Timestamp(str(t)) for t in reference[period + '/period'])
+    price_fcst = simulate_elect_price_fcst(t_start=t_start, t_end=t_end, pricing={'ToU', 'ToU_mi'})
+    # the set of pricing strategies gives the columns in a fixed order
+    assert list(price_fcst.columns) == ['ToU', 'ToU_mi']
+    np.testing.assert_array_equal(price_fcst['ToU'].to_numpy(), reference[period])
+    np.testing.assert_allclose(price_fcst['ToU_mi'].to_numpy() - reference[period],
+                               np.linspace(0.00001, 0.00002, len(price_fcst)), rtol=0, atol=1e-15)
+
+
+def test_tou_prices_are_independent_copies():
+    prices = tou_prices('TOU-D-PRIME', pd.Timestamp('2019-06-01'), pd.Timestamp('2019-06-01 23:45'))
+    prices[:] = 0
+    assert (tou_prices('TOU-D-PRIME', pd.Timestamp('2019-06-01'), pd.Timestamp('2019-06-01 23:45')) > 0).all()